@@ -0,0 +1,131 @@
+import argparse
+import datetime
+import pathlib
+import queue
+import sys
+import time
+import tracemalloc
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ors.camera.datatypes import CapturingContext
+from ors.common.color import BGR
+from ors.feature_extraction.datatypes import FeatureExtractor
+from ors.pipeline import RecognitionPipeline
+from ors.preprocessing.config import PreprocessingConfig
+from ors.preprocessing.preprocessing import ImagePreprocessing
+from ors.printjobdata.datatypes import Printjob
+from ors.printjobdata.repository import InMemoryPrintjobRepository
+
+
+class ThumbnailExtractor(FeatureExtractor):
+    # allocation-free apart from its tiny output, so the measured allocations
+    # are the ones of the recognition path around the extractor
+    def __init__(self, size: int = 16) -> None:
+        self.size = size
+
+    def extract_features(self, image: np.ndarray) -> np.ndarray:
+        features = cv2.resize(image, (self.size, self.size)).astype(np.float32).ravel()
+        return features / np.linalg.norm(features)
+
+
+def synthetic_frames(count: int, shape=(1080, 1920)) -> List[np.ndarray]:
+    rng = np.random.default_rng(0)
+    frames = []
+    for i in range(count):
+        frame = np.full((*shape, 3), 40, dtype=np.uint8)
+        corners = cv2.boxPoints(
+            ((shape[1] / 2, shape[0] / 2), (shape[0] * 0.55, shape[0] * 0.75), rng.uniform(-20, 20))
+        )
+        cv2.fillPoly(frame, [corners.astype(np.int32)], (230, 230, 230))
+        frames.append(frame)
+    return frames
+
+
+def create_pipeline(
+    rectification: str, rectified_size: Optional[Tuple[int, int]], frames: List[np.ndarray]
+) -> Tuple[RecognitionPipeline, queue.Queue]:
+    # the classical detection, the allocations of the segmentation model are not measured
+    extractor = ThumbnailExtractor()
+    jobdatabase = InMemoryPrintjobRepository()
+    jobdatabase.add(Printjob(1, None, "jpg", extractor.extract_features(frames[0])))
+    jobdatabase.add(Printjob(2, None, "jpg", extractor.extract_features(frames[-1])))
+    results = queue.Queue()
+    pipeline = RecognitionPipeline(
+        jobdatabase=jobdatabase,
+        result_consumer=results,
+        feature_extractor=extractor,
+        preprocessing=ImagePreprocessing(
+            PreprocessingConfig(
+                use_ml=False,
+                ml_fallback=False,
+                rectification=rectification,
+                rectified_size=rectified_size,
+            )
+        ),
+    )
+    return pipeline, results
+
+
+def measure_allocations(
+    pipeline: RecognitionPipeline, results: queue.Queue, frames: List[np.ndarray]
+) -> np.ndarray:
+    # peak of the memory allocated while consuming a frame, in frame sizes
+    pipeline.consume(frames[0], CapturingContext(datetime.datetime.now(), BGR))  # warm-up
+    results.get()
+    frame_copies = np.empty(len(frames))
+    tracemalloc.start()
+    for i, frame in enumerate(frames):
+        context = CapturingContext(datetime.datetime.now(), BGR)
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        pipeline.consume(frame, context)
+        _, peak = tracemalloc.get_traced_memory()
+        frame_copies[i] = (peak - before) / frame.nbytes
+        results.get()
+    tracemalloc.stop()
+    return frame_copies
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Memory allocated per frame on the recognition path (without the "
+        "segmentation model), exits with an error above --max-frame-copies"
+    )
+    parser.add_argument("--recordings-directory", help="synthetic frames if not set")
+    parser.add_argument("--frames", type=int, default=20)
+    # rotate_crop rotates the whole frame into a larger image, the other modes
+    # allocate less than one frame
+    parser.add_argument("--max-frame-copies", type=float, default=2.5)
+    args = parser.parse_args()
+
+    if args.recordings_directory is None:
+        frames = synthetic_frames(args.frames)
+    else:
+        paths = sorted(pathlib.Path(args.recordings_directory).rglob("*.jpg"))
+        frames = [cv2.imread(str(path)) for path in paths[: args.frames]]
+
+    failed = False
+    for rectification, rectified_size in (
+        ("rotate_crop", None),
+        ("perspective", None),
+        ("perspective", (224, 224)),
+    ):
+        pipeline, results = create_pipeline(rectification, rectified_size, frames)
+        start_time = time.perf_counter()
+        frame_copies = measure_allocations(pipeline, results, frames)
+        elapsed_ms = (time.perf_counter() - start_time) * 1000 / len(frames)
+        name = rectification if rectified_size is None else f"{rectification} {rectified_size}"
+        print(
+            f"{name:<26} peak allocation mean {frame_copies.mean():5.2f} "
+            f"max {frame_copies.max():5.2f} frames  ({elapsed_ms:.1f}ms per frame, traced)"
+        )
+        if frame_copies.max() > args.max_frame_copies:
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
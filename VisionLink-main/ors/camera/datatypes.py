@@ -6,11 +6,14 @@ import threading
 import numpy as np
 
 from ors.camera.config import CameraConfig
+from ors.common.color import BGR
 
 
 @dataclass
 class CapturingContext:
     timestamp: datetime.datetime
+    # channel order of the frame, see ors.common.color
+    color_order: str = BGR
 
 
 class FrameConsumer(ABC):
@@ -0,0 +1,31 @@
+from typing import Optional
+
+import cv2
+import numpy as np
+
+# channel order of a frame, cameras and cv2.imread deliver BGR, the feature
+# extractors expect RGB
+BGR = "BGR"
+RGB = "RGB"
+
+_CONVERSIONS = {(BGR, RGB): cv2.COLOR_BGR2RGB, (RGB, BGR): cv2.COLOR_RGB2BGR}
+_GREY_CONVERSIONS = {BGR: cv2.COLOR_BGR2GRAY, RGB: cv2.COLOR_RGB2GRAY}
+
+
+def convert_color(
+    image: np.ndarray, source: str, target: str, dst: Optional[np.ndarray] = None
+) -> np.ndarray:
+    # returns the image itself if the order already matches, dst is written
+    # to instead of allocating when it has the right shape
+    if source == target:
+        return image
+    code = _CONVERSIONS[(source, target)]
+    if dst is not None and dst.shape == image.shape and dst.dtype == image.dtype:
+        return cv2.cvtColor(image, code, dst=dst)
+    return cv2.cvtColor(image, code)
+
+
+def to_grey(image: np.ndarray, color_order: str) -> np.ndarray:
+    if image.ndim == 2:
+        return image
+    return cv2.cvtColor(image, _GREY_CONVERSIONS[color_order])
@@ -0,0 +1,31 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def threaded_map(
+    function: Callable[[T], R],
+    items: Iterable[T],
+    num_threads: int,
+    max_pending: Optional[int] = None,
+) -> Iterator[R]:
+    # Like map(), but the calls run on a thread pool. Results are yielded in
+    # input order as soon as they are ready and at most max_pending calls are
+    # submitted ahead of the consumer, so memory stays bounded.
+    if num_threads <= 1:
+        yield from map(function, items)
+        return
+    max_pending = max_pending or 2 * num_threads
+    with ThreadPoolExecutor(
+        max_workers=num_threads, thread_name_prefix="loader-thread"
+    ) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -7,6 +7,8 @@ from ors.camera.config import OAKCameraConfig, MockCameraConfig
 from ors.printjobdata.config import PrintjobdataConfig
 from ors.preprocessing.config import PreprocessingConfig
 from ors.feature_extraction.config import FeatureExtractorConfig
+from ors.scene_change.config import SceneChangeConfig
+from ors.similarity.config import SimilarityConfig
 
 
 
@@ -28,6 +30,8 @@ class Config(BaseSettings):
     printjobdata: Optional[PrintjobdataConfig]
     featureextractor: Optional[FeatureExtractorConfig]
     preprocessing: Optional[PreprocessingConfig]
+    similarity: Optional[SimilarityConfig]
+    scene_change: Optional[SceneChangeConfig]
 
     class Config:
         @classmethod
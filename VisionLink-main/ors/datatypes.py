@@ -1,6 +1,7 @@
 import numpy as np
 
 from dataclasses import dataclass
+from typing import Optional
 from abc import ABC, abstractmethod
 from ors.camera.datatypes import CapturingContext
 from ors.printjobdata.datatypes import Printjob
@@ -8,11 +9,17 @@ from ors.printjobdata.datatypes import Printjob
 
 @dataclass
 class RecognitionResult:
-    job: Printjob
+    # None if the catalog had no match, e.g. because it is empty
+    job: Optional[Printjob]
     captured_image: np.ndarray
     capturing_context: CapturingContext
     preprocessed_image: np.ndarray
     calculated_distance: float
+    # distance gap to the second best printjob, small values mean an ambiguous match
+    calculated_margin: Optional[float] = None
+    feature_extraction_ms: Optional[float] = None
+    # taken over from the previous frame by the scene change gate
+    reused: bool = False
 
 
 class RecognitionResultConsumer(ABC):
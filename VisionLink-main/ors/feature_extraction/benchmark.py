@@ -0,0 +1,141 @@
+import argparse
+import time
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+from ors.feature_extraction.config import FeatureExtractorConfig
+from ors.feature_extraction.datatypes import FeatureExtractor
+from ors.feature_extraction.factory import create_feature_extractor
+
+
+def load_printjob_images(
+    printjobs_directory: str, printjobs_filetype: str
+) -> List[np.ndarray]:
+    from ors.printjobdata.config import PrintjobLoaderConfig
+    from ors.printjobdata.loader import FileSystemPrintjobProvider
+
+    provider = FileSystemPrintjobProvider(
+        PrintjobLoaderConfig(
+            printjobs_directory=printjobs_directory,
+            printjobs_filetype=printjobs_filetype,
+        )
+    )
+    images = []
+    for job in provider.get_all_printjobs(load_files=True):
+        image = cv2.imdecode(np.frombuffer(job.image_file, dtype=np.uint8), cv2.IMREAD_COLOR)
+        images.append(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    return images
+
+
+def benchmark_batch_sizes(
+    extractor: FeatureExtractor, images: List[np.ndarray], batch_sizes: List[int]
+) -> None:
+    extractor.extract_features(images[0])  # warm-up
+    start_time = time.perf_counter()
+    for image in images:
+        extractor.extract_features(image)
+    elapsed = time.perf_counter() - start_time
+    print(f"{'extract_features':<24} {len(images) / elapsed:8.1f} images/s")
+
+    for batch_size in batch_sizes:
+        extractor.config.batch_size = batch_size
+        extractor.extract_features_batch(images[:batch_size])  # warm-up
+        start_time = time.perf_counter()
+        extractor.extract_features_batch(images)
+        elapsed = time.perf_counter() - start_time
+        print(
+            f"{'batch size ' + str(batch_size):<24} {len(images) / elapsed:8.1f} images/s"
+        )
+
+
+def backend_config(backend: str) -> FeatureExtractorConfig:
+    # keras-predict is the former model.predict call path
+    return FeatureExtractorConfig(
+        backend="openvino" if backend == "openvino" else "keras",
+        low_latency=backend != "keras-predict",
+    )
+
+
+def compare_backends(
+    extractors: Dict[str, FeatureExtractor], images: List[np.ndarray], batch_size: int
+) -> None:
+    reference = None
+    for name, extractor in extractors.items():
+        extractor.extract_features(images[0])  # warm-up
+        latencies = np.empty(len(images))
+        features = []
+        for i, image in enumerate(images):
+            start_time = time.perf_counter()
+            features.append(extractor.extract_features(image))
+            latencies[i] = time.perf_counter() - start_time
+        latencies *= 1000
+        features = np.stack(features)
+
+        extractor.config.batch_size = batch_size
+        start_time = time.perf_counter()
+        extractor.extract_features_batch(images)
+        throughput = len(images) / (time.perf_counter() - start_time)
+
+        print(
+            f"{name:<10} latency mean {latencies.mean():8.2f}ms  "
+            f"p50 {np.percentile(latencies, 50):8.2f}ms  p99 {np.percentile(latencies, 99):8.2f}ms  "
+            f"batch {batch_size} {throughput:8.1f} images/s"
+        )
+        if reference is None:
+            reference_name, reference = name, features
+        else:
+            cosine = np.einsum("ij,ij->i", features, reference)
+            print(
+                f"{'':<10} vs {reference_name}: max abs diff {np.abs(features - reference).max():.2e}  "
+                f"min cosine {cosine.min():.6f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Feature extraction throughput for different batch sizes, or "
+        "latency, throughput and agreement of several backends"
+    )
+    parser.add_argument("--printjobs-directory", default="testdata/printjobs_png")
+    parser.add_argument("--printjobs-filetype", default="png")
+    parser.add_argument(
+        "--synthetic", action="store_true", help="use random images instead of printjobs"
+    )
+    parser.add_argument("--images", type=int, default=128)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        choices=["keras", "keras-predict", "openvino"],
+        help="compare these backends instead of measuring batch sizes",
+    )
+    args = parser.parse_args()
+
+    if args.synthetic:
+        rng = np.random.default_rng(0)
+        images = [
+            rng.integers(0, 256, (1080, 760, 3), dtype=np.uint8)
+            for _ in range(min(args.images, 16))
+        ]
+    else:
+        images = load_printjob_images(args.printjobs_directory, args.printjobs_filetype)
+    images = [images[i % len(images)] for i in range(args.images)]
+
+    if args.backends:
+        print(f"{len(images)} images")
+        extractors = {
+            backend: create_feature_extractor(backend_config(backend))
+            for backend in args.backends
+        }
+        compare_backends(extractors, images, max(args.batch_sizes))
+        return
+
+    extractor = create_feature_extractor(backend_config("keras"))
+    print(f"{type(extractor).__name__}, {len(images)} images")
+    benchmark_batch_sizes(extractor, images, args.batch_sizes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from typing import Optional
+
+import numpy as np
+
+from ors.common import logger
+
+logger = logger.get_logger(__name__)
+
+IDENTITY_FILE = "model_identity.txt"
+
+
+class FeatureCache:
+    # On-disk cache of extracted features. Entries are keyed by the SHA-256 of
+    # the image bytes and live in one directory per model identity, so features
+    # of another model are never returned. Files are written to a temporary name
+    # and renamed into place, readers in other processes never see partial files.
+    #
+    # Processes with other models may share the directory, so the directories
+    # of other models are only removed if prune_after_s is set and they were
+    # neither opened nor written to for that long.
+    def __init__(
+        self, directory: str, model_identity: str, prune_after_s: Optional[float] = None
+    ) -> None:
+        self.root_directory = directory
+        self.model_identity = model_identity
+        identity_hash = hashlib.sha256(model_identity.encode("utf-8")).hexdigest()
+        self.directory = os.path.join(directory, identity_hash[:16])
+        os.makedirs(self.directory, exist_ok=True)
+        self._write_identity()
+        if prune_after_s is not None:
+            self._prune_stale_models(prune_after_s)
+
+    def get(self, image_file: bytes) -> Optional[np.ndarray]:
+        path = self._path(self.key(image_file))
+        try:
+            return np.load(path, allow_pickle=False)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            logger.warning(f"Ignoring unreadable feature cache entry '{path}'")
+            return None
+
+    def put(self, image_file: bytes, features: np.ndarray) -> None:
+        path = self._path(self.key(image_file))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        file_descriptor, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), suffix=".tmp"
+        )
+        try:
+            with os.fdopen(file_descriptor, "wb") as tmp_file:
+                np.save(tmp_file, np.asarray(features), allow_pickle=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._touch_identity()
+
+    @staticmethod
+    def key(image_file: bytes) -> str:
+        return hashlib.sha256(image_file).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.npy")
+
+    def _write_identity(self) -> None:
+        identity_path = os.path.join(self.directory, IDENTITY_FILE)
+        if not os.path.exists(identity_path):
+            with open(identity_path, "w") as identity_file:
+                identity_file.write(self.model_identity)
+        self._touch_identity()
+
+    def _touch_identity(self) -> None:
+        # the modification time of the identity file is the last use of the model
+        try:
+            os.utime(os.path.join(self.directory, IDENTITY_FILE))
+        except OSError:
+            pass
+
+    def _prune_stale_models(self, prune_after_s: float) -> None:
+        now = time.time()
+        for entry in os.scandir(self.root_directory):
+            if not entry.is_dir() or entry.path == self.directory:
+                continue
+            try:
+                last_used = os.stat(os.path.join(entry.path, IDENTITY_FILE)).st_mtime
+            except FileNotFoundError:
+                continue
+            if now - last_used < prune_after_s:
+                continue
+            logger.info(f"Removing feature cache of unused model '{entry.path}'")
+            shutil.rmtree(entry.path, ignore_errors=True)
@@ -1,5 +1,29 @@
+from typing import Optional
+
 from pydantic import BaseSettings
 
 
 class FeatureExtractorConfig(BaseSettings):
-    pass
+    # directory of the persistent feature cache, disabled if not set
+    cache_directory: Optional[str] = None
+    # remove cached features of other models that were unused for this many
+    # days, other processes may share the cache directory; never if not set
+    cache_prune_after_days: Optional[float] = None
+    # images per forward pass when extracting features of many images
+    batch_size: int = 16
+    # keras: single frames go through a compiled tf.function instead of model.predict
+    low_latency: bool = True
+    warmup_runs: int = 3
+    # TensorFlow thread pools, None keeps the TensorFlow defaults
+    intra_op_threads: Optional[int] = None
+    inter_op_threads: Optional[int] = None
+    # "keras" (ResNetExtractor) or "openvino" (OpenVinoExtractor on an exported model)
+    backend: str = "keras"
+    # keras: "resnet50" or one of the lightweight backbones in keras_backbones.BACKBONES
+    backbone: str = "resnet50"
+    openvino_model_path: str = "models/resnet50_avg_pool.xml"
+    openvino_device: str = "CPU"
+    # PCA projection of the features fitted on the catalog, disabled if not set
+    projection_dimension: Optional[int] = None
+    projection_whiten: bool = False
+    projection_path: str = "models/feature_projection.npz"
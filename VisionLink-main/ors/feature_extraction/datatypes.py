@@ -1,9 +1,24 @@
 from abc import ABC, abstractmethod
+from typing import Sequence
 
 import numpy as np
 
 
 class FeatureExtractor(ABC):
+    @property
+    def model_identity(self) -> str:
+        # identifies model and weights, cached features are only reused for the same identity
+        return type(self).__name__
+
+    def initialize(self) -> None:
+        # called once before the first frame, e.g. to warm up the model
+        pass
+
+    # images are RGB, see ors.common.color
     @abstractmethod
     def extract_features(self, image: np.ndarray) -> np.ndarray:
         pass
+
+    def extract_features_batch(self, images: Sequence[np.ndarray]) -> np.ndarray:
+        # (N, D) features, extractors with a batched forward pass override this
+        return np.stack([self.extract_features(image) for image in images])
@@ -0,0 +1,24 @@
+from ors.feature_extraction.config import FeatureExtractorConfig
+from ors.feature_extraction.datatypes import FeatureExtractor
+
+
+def create_feature_extractor(config: FeatureExtractorConfig) -> FeatureExtractor:
+    # the only place that maps the config to an extractor, the system and the
+    # benchmarks get initialised extractors from here
+    if config.backend == "keras" and config.backbone == "resnet50":
+        # imported on demand, the OpenVINO backend runs without TensorFlow
+        from ors.feature_extraction.resnet50 import ResNetExtractor
+
+        feature_extractor = ResNetExtractor(config)
+    elif config.backend == "keras":
+        from ors.feature_extraction.keras_backbones import KerasBackboneExtractor
+
+        feature_extractor = KerasBackboneExtractor(config)
+    elif config.backend == "openvino":
+        from ors.feature_extraction.openvino_extractor import OpenVinoExtractor
+
+        feature_extractor = OpenVinoExtractor(config)
+    else:
+        raise ValueError(f"Unknown feature extractor backend '{config.backend}'")
+    feature_extractor.initialize()
+    return feature_extractor
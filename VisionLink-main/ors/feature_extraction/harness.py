@@ -0,0 +1,135 @@
+import argparse
+import glob
+import os
+import time
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+from ors.feature_extraction.config import FeatureExtractorConfig
+from ors.feature_extraction.factory import create_feature_extractor
+from ors.printjobdata.catalog import PrintjobFeatureLoader
+from ors.printjobdata.config import PrintjobLoaderConfig
+from ors.printjobdata.datatypes import ExternalPrintjob
+from ors.printjobdata.loader import FileSystemPrintjobProvider
+from ors.similarity.exact import ExactFeatureIndex
+
+
+def resident_memory_bytes() -> int:
+    with open("/proc/self/statm", "r") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def load_recordings(
+    recordings_directory: str, preprocess=None
+) -> Tuple[np.ndarray, List[np.ndarray]]:
+    # recordings_directory/<printjob number>/*.jpg, the directory names the expected job
+    expected, frames = [], []
+    for job_directory in sorted(os.listdir(recordings_directory)):
+        if not job_directory.isdigit():
+            continue
+        for path in sorted(glob.glob(os.path.join(recordings_directory, job_directory, "*.jpg"))):
+            # the frame as the camera delivers it, the printjobs are compared in RGB
+            frame = cv2.imread(path)
+            if preprocess is not None:
+                frame = preprocess(frame)
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            expected.append(int(job_directory))
+            frames.append(frame)
+    return np.array(expected, dtype=np.int64), frames
+
+
+def evaluate(
+    backbone: str,
+    external_printjobs: List[ExternalPrintjob],
+    expected: np.ndarray,
+    frames: List[np.ndarray],
+) -> None:
+    memory_before = resident_memory_bytes()
+    config = FeatureExtractorConfig(backbone=backbone)
+    extractor = create_feature_extractor(config)
+    memory_mb = (resident_memory_bytes() - memory_before) / 2**20
+
+    # the catalog is loaded like the system loads it
+    printjobs = PrintjobFeatureLoader(extractor, batch_size=config.batch_size).load(
+        external_printjobs
+    )
+    index = ExactFeatureIndex()
+    index.add(
+        [job.printjob_number for job in printjobs],
+        np.stack([job.features for job in printjobs]),
+    )
+
+    found = np.empty(len(frames), dtype=np.int64)
+    latencies = np.empty(len(frames))
+    for i, frame in enumerate(frames):
+        start_time = time.perf_counter()
+        features = extractor.extract_features(frame)
+        latencies[i] = time.perf_counter() - start_time
+        found[i], _ = index.find_best_match(features)
+    latencies *= 1000
+
+    print(
+        f"{backbone:<20} top-1 {np.mean(found == expected):6.3f}  "
+        f"latency mean {latencies.mean():7.2f}ms  p99 {np.percentile(latencies, 99):7.2f}ms  "
+        f"memory +{memory_mb:7.1f}MiB  embedding {index.matrix.shape[1]:5d}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Top-1 accuracy, latency, memory and embedding size of the feature "
+        "extraction backbones on the recorded frames"
+    )
+    parser.add_argument(
+        "--backbones",
+        nargs="+",
+        default=[
+            "resnet50",
+            "mobilenet_v2",
+            "mobilenet_v3_small",
+            "mobilenet_v3_large",
+            "efficientnet_b0",
+        ],
+    )
+    parser.add_argument("--printjobs-directory", default="testdata/printjobs_png")
+    parser.add_argument("--printjobs-filetype", default="png")
+    parser.add_argument("--recordings-directory", default="testdata/recordings")
+    parser.add_argument(
+        "--preprocessing-cfg-file",
+        help="segment the recorded frames like the pipeline does, needs detectron2",
+    )
+    parser.add_argument("--preprocessing-weights-file")
+    args = parser.parse_args()
+
+    preprocess = None
+    if args.preprocessing_cfg_file is not None:
+        from ors.preprocessing.config import PreprocessingConfig
+        from ors.preprocessing.preprocessing import ImagePreprocessing
+
+        preprocessing = ImagePreprocessing(
+            PreprocessingConfig(
+                use_ml=True,
+                cfg_file=args.preprocessing_cfg_file,
+                weights_file=args.preprocessing_weights_file,
+            )
+        )
+        preprocess = preprocessing.preprocess
+
+    provider = FileSystemPrintjobProvider(
+        PrintjobLoaderConfig(
+            printjobs_directory=args.printjobs_directory,
+            printjobs_filetype=args.printjobs_filetype,
+        )
+    )
+    external_printjobs = provider.get_all_printjobs(load_files=False)
+    expected, frames = load_recordings(args.recordings_directory, preprocess)
+    print(f"{len(external_printjobs)} printjobs, {len(frames)} recorded frames")
+
+    for backbone in args.backbones:
+        evaluate(backbone, external_printjobs, expected, frames)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Sequence
+
+import cv2
+import keras
+import numpy as np
+import tensorflow as tf
+
+from ors.common import logger
+from ors.feature_extraction.config import FeatureExtractorConfig
+from ors.feature_extraction.datatypes import FeatureExtractor
+from ors.feature_extraction.resnet50 import configure_threads
+
+logger = logger.get_logger(__name__)
+
+
+@dataclass
+class KerasBackbone:
+    # builds the model without classification head and with global average pooling
+    build: Callable[[], keras.Model]
+    # applied to a float32 RGB batch in 0..255
+    preprocess: Callable[[np.ndarray], np.ndarray]
+    input_size: int = 224
+
+
+def _identity(x: np.ndarray) -> np.ndarray:
+    # MobileNetV3 and EfficientNet rescale inside the model
+    return x
+
+
+BACKBONES: Dict[str, KerasBackbone] = {
+    "mobilenet_v2": KerasBackbone(
+        build=lambda: tf.keras.applications.MobileNetV2(
+            include_top=False, weights="imagenet", pooling="avg"
+        ),
+        preprocess=tf.keras.applications.mobilenet_v2.preprocess_input,
+    ),
+    "mobilenet_v3_small": KerasBackbone(
+        build=lambda: tf.keras.applications.MobileNetV3Small(
+            include_top=False, weights="imagenet", pooling="avg"
+        ),
+        preprocess=_identity,
+    ),
+    "mobilenet_v3_large": KerasBackbone(
+        build=lambda: tf.keras.applications.MobileNetV3Large(
+            include_top=False, weights="imagenet", pooling="avg"
+        ),
+        preprocess=_identity,
+    ),
+    "efficientnet_b0": KerasBackbone(
+        build=lambda: tf.keras.applications.EfficientNetB0(
+            include_top=False, weights="imagenet", pooling="avg"
+        ),
+        preprocess=_identity,
+    ),
+}
+
+
+class KerasBackboneExtractor(FeatureExtractor):
+    # Pooled embeddings of a lightweight ImageNet backbone, call paths as in
+    # ResNetExtractor
+    def __init__(self, config: Optional[FeatureExtractorConfig] = None):
+        self.config = config or FeatureExtractorConfig()
+        if self.config.backbone not in BACKBONES:
+            raise ValueError(f"Unknown backbone '{self.config.backbone}'")
+        self.backbone = BACKBONES[self.config.backbone]
+        configure_threads(self.config)
+        self.model = self.backbone.build()
+        size = self.backbone.input_size
+        self._infer = tf.function(
+            lambda x: self.model(x, training=False),
+            input_signature=[tf.TensorSpec([None, size, size, 3], tf.float32)],
+        )
+
+    @property
+    def model_identity(self) -> str:
+        return (
+            f"{self.config.backbone}-imagenet-avg_pool-{self.backbone.input_size}"
+            f"-keras{keras.__version__}"
+        )
+
+    @property
+    def embedding_size(self) -> int:
+        return int(self.model.output_shape[-1])
+
+    def initialize(self) -> None:
+        if not self.config.low_latency:
+            return
+        size = self.backbone.input_size
+        x = np.zeros((1, size, size, 3), dtype=np.float32)
+        for _ in range(self.config.warmup_runs):
+            start_time = time.perf_counter()
+            self._infer(x)
+            logger.info(f"Warm-up took {(time.perf_counter() - start_time) * 1000:.1f}ms")
+
+    def extract_features(self, input_image: np.ndarray) -> np.ndarray:
+        return self.extract_features_batch([input_image])[0]
+
+    def extract_features_batch(self, images: Sequence[np.ndarray]) -> np.ndarray:
+        size = self.backbone.input_size
+        features = []
+        for start in range(0, len(images), self.config.batch_size):
+            batch = np.stack(
+                [
+                    cv2.resize(image, (size, size))
+                    for image in images[start : start + self.config.batch_size]
+                ]
+            )
+            x = self.backbone.preprocess(batch.astype(np.float32))
+            if self.config.low_latency:
+                features.append(self._infer(x).numpy())
+            else:
+                features.append(self.model.predict_on_batch(x))
+        features = np.concatenate(features)
+        return features / np.linalg.norm(features, axis=1, keepdims=True)
@@ -0,0 +1,106 @@
+import argparse
+import os
+import threading
+from typing import Optional, Sequence
+
+import cv2
+import numpy as np
+from openvino.runtime import Core, get_version
+
+from ors.feature_extraction.config import FeatureExtractorConfig
+from ors.feature_extraction.datatypes import FeatureExtractor
+
+# keras.applications.resnet.preprocess_input ("caffe" mode): RGB -> BGR and
+# subtraction of the ImageNet channel means, the exported model expects it done
+IMAGENET_BGR_MEAN = np.array([103.939, 116.779, 123.68], dtype=np.float32)
+
+
+def preprocess_input(images: np.ndarray) -> np.ndarray:
+    return images[..., ::-1].astype(np.float32) - IMAGENET_BGR_MEAN
+
+
+class OpenVinoExtractor(FeatureExtractor):
+    # Runs the avg_pool output of the Keras ResNet50 exported to OpenVINO IR
+    # (see export_resnet50), TensorFlow is not needed at runtime.
+    def __init__(self, config: Optional[FeatureExtractorConfig] = None):
+        self.config = config or FeatureExtractorConfig()
+        if not os.path.exists(self.config.openvino_model_path):
+            raise FileNotFoundError(
+                f"OpenVINO model '{self.config.openvino_model_path}' not found, export it "
+                f"with 'python -m ors.feature_extraction.openvino_extractor'"
+            )
+        core = Core()
+        model = core.read_model(self.config.openvino_model_path)
+        self.compiled_model = core.compile_model(
+            model, self.config.openvino_device, {"PERFORMANCE_HINT": "LATENCY"}
+        )
+        self.output = self.compiled_model.output(0)
+        # an InferRequest is not thread-safe, the pipeline and the catalog
+        # updater extract concurrently with a request each
+        self._thread_local = threading.local()
+
+    @property
+    def infer_request(self):
+        infer_request = getattr(self._thread_local, "infer_request", None)
+        if infer_request is None:
+            infer_request = self.compiled_model.create_infer_request()
+            self._thread_local.infer_request = infer_request
+        return infer_request
+
+    @property
+    def model_identity(self) -> str:
+        return f"resnet50-imagenet-avg_pool-224-openvino{get_version()}"
+
+    def extract_features(self, input_image: np.ndarray) -> np.ndarray:
+        if input_image.shape[:2] != (224, 224):
+            input_image = cv2.resize(input_image, (224, 224))
+        x = preprocess_input(input_image[np.newaxis])
+        feature = self.infer_request.infer([x])[self.output][0]
+        return feature / np.linalg.norm(feature)
+
+    def extract_features_batch(self, images: Sequence[np.ndarray]) -> np.ndarray:
+        infer_request = self.infer_request
+        features = []
+        for start in range(0, len(images), self.config.batch_size):
+            batch = np.stack(
+                [
+                    cv2.resize(image, (224, 224))
+                    for image in images[start : start + self.config.batch_size]
+                ]
+            )
+            features.append(infer_request.infer([preprocess_input(batch)])[self.output])
+        features = np.concatenate(features)
+        return features / np.linalg.norm(features, axis=1, keepdims=True)
+
+
+def export_resnet50(model_path: str, compress_to_fp16: bool = False) -> None:
+    # Same conversion as notebooks/OpenVinoFeatureExtractor.ipynb, but with a
+    # dynamic batch dimension and FP32 weights by default so that the vectors
+    # match ResNetExtractor
+    import tensorflow as tf
+    from keras.models import Model
+    from openvino.runtime import serialize
+    from openvino.tools.mo import convert_model
+
+    base_model = tf.keras.applications.ResNet50(include_top=True, weights="imagenet")
+    model = Model(inputs=base_model.input, outputs=base_model.get_layer("avg_pool").output)
+    ov_model = convert_model(
+        model, input_shape=[-1, 224, 224, 3], compress_to_fp16=compress_to_fp16
+    )
+    os.makedirs(os.path.dirname(model_path) or ".", exist_ok=True)
+    serialize(ov_model, model_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the ResNet50 feature extractor to OpenVINO IR"
+    )
+    parser.add_argument("--model-path", default=FeatureExtractorConfig().openvino_model_path)
+    parser.add_argument("--compress-to-fp16", action="store_true")
+    args = parser.parse_args()
+    export_resnet50(args.model_path, args.compress_to_fp16)
+    print(f"Exported to {args.model_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import hashlib
+import os
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+
+from ors.common import logger
+from ors.feature_extraction.datatypes import FeatureExtractor
+
+logger = logger.get_logger(__name__)
+
+
+class FeatureProjection:
+    # PCA projection fitted on the catalog features, optionally whitened.
+    # Projected features are L2 normalised again, so distances stay comparable
+    # to the unprojected ones.
+    def __init__(
+        self,
+        mean: np.ndarray,
+        components: np.ndarray,
+        model_identity: str,
+        whiten: bool = False,
+        requested_dimension: Optional[int] = None,
+    ) -> None:
+        self.mean = np.asarray(mean, dtype=np.float32)
+        # (D, d), columns sorted by explained variance
+        self.components = np.ascontiguousarray(components, dtype=np.float32)
+        self.model_identity = model_identity
+        self.whiten = whiten
+        # the configured dimension, the fit keeps fewer components on small catalogs
+        self.requested_dimension = (
+            self.dimension if requested_dimension is None else requested_dimension
+        )
+
+    @property
+    def dimension(self) -> int:
+        return self.components.shape[1]
+
+    @property
+    def identity(self) -> str:
+        # changes with every fit, features projected by another fit are not reused
+        fingerprint = hashlib.sha256(self.components.tobytes()).hexdigest()[:12]
+        kind = "pca-whiten" if self.whiten else "pca"
+        return f"{self.model_identity}+{kind}{self.dimension}-{fingerprint}"
+
+    @classmethod
+    def fit(
+        cls,
+        features: np.ndarray,
+        dimension: int,
+        model_identity: str,
+        whiten: bool = False,
+        eps: float = 1e-6,
+    ) -> "FeatureProjection":
+        features = np.asarray(features, dtype=np.float64)
+        mean = features.mean(axis=0)
+        centered = features - mean
+        # the (D, D) covariance is small compared to the catalog for large catalogs
+        covariance = centered.T @ centered / max(len(features) - 1, 1)
+        variances, vectors = np.linalg.eigh(covariance)
+        order = np.argsort(variances)[::-1][:dimension]
+        # N features span at most N - 1 directions, whitening the others would
+        # scale noise up by ~1/eps
+        kept = variances[order] > eps * max(variances.max(), 0)
+        kept[0] = True
+        order = order[kept]
+        if len(order) < dimension:
+            logger.warning(
+                f"Only {len(order)} of the {dimension} projection components have variance "
+                f"on {len(features)} features, the projection keeps {len(order)}"
+            )
+        components = vectors[:, order]
+        if whiten:
+            deviations = np.sqrt(np.maximum(variances[order], 0))
+            components /= np.where(deviations > 0, deviations, 1)
+        explained = variances[order].sum() / max(variances.sum(), eps)
+        logger.info(
+            f"Fitted {len(order)}-d projection on {len(features)} features, "
+            f"explained variance {explained:.3f}"
+        )
+        return cls(mean, components, model_identity, whiten, dimension)
+
+    def apply(self, features: np.ndarray) -> np.ndarray:
+        projected = (np.asarray(features, dtype=np.float32) - self.mean) @ self.components
+        return projected / np.linalg.norm(projected, axis=-1, keepdims=True)
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as tmp_file:
+            np.savez(
+                tmp_file,
+                mean=self.mean,
+                components=self.components,
+                model_identity=np.array(self.model_identity),
+                whiten=np.array(self.whiten),
+                requested_dimension=np.array(self.requested_dimension),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "FeatureProjection":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["mean"],
+                data["components"],
+                str(data["model_identity"]),
+                bool(data["whiten"]),
+                int(data["requested_dimension"]) if "requested_dimension" in data else None,
+            )
+
+
+def load_feature_projection(
+    path: str, model_identity: str, dimension: int, whiten: bool
+) -> Optional[FeatureProjection]:
+    # None if there is no projection for this model and these settings yet
+    try:
+        projection = FeatureProjection.load(path)
+    except FileNotFoundError:
+        return None
+    if (
+        projection.model_identity != model_identity
+        or projection.requested_dimension != dimension
+        or projection.whiten != whiten
+    ):
+        logger.warning(f"Feature projection '{path}' was fitted with other settings")
+        return None
+    return projection
+
+
+def wait_for_feature_projection(
+    path: str, model_identity: str, dimension: int, whiten: bool, timeout_s: float
+) -> Optional[FeatureProjection]:
+    # for processes that use the projection fitted by another process, which
+    # may not have written it yet; the file is only read again once replaced
+    deadline = time.monotonic() + timeout_s
+    checked_mtime = None
+    while True:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime is not None and mtime != checked_mtime:
+            checked_mtime = mtime
+            projection = load_feature_projection(path, model_identity, dimension, whiten)
+            if projection is not None:
+                return projection
+        if time.monotonic() > deadline:
+            return None
+        time.sleep(0.5)
+
+
+class ProjectedFeatureExtractor(FeatureExtractor):
+    def __init__(self, extractor: FeatureExtractor, projection: FeatureProjection) -> None:
+        self.extractor = extractor
+        self.projection = projection
+
+    @property
+    def model_identity(self) -> str:
+        return self.projection.identity
+
+    def initialize(self) -> None:
+        self.extractor.initialize()
+
+    def extract_features(self, image: np.ndarray) -> np.ndarray:
+        return self.projection.apply(self.extractor.extract_features(image))
+
+    def extract_features_batch(self, images: Sequence[np.ndarray]) -> np.ndarray:
+        return self.projection.apply(self.extractor.extract_features_batch(images))
@@ -1,28 +1,86 @@
+import time
+from typing import Optional, Sequence
+
 import cv2
 import numpy as np
+import keras
 import tensorflow as tf
 from keras.applications.resnet import preprocess_input
 from keras.models import Model
 
+from ors.common import logger
+from ors.feature_extraction.config import FeatureExtractorConfig
 from ors.feature_extraction.datatypes import FeatureExtractor
 
+logger = logger.get_logger(__name__)
+
+
+def configure_threads(config: FeatureExtractorConfig) -> None:
+    # only possible before TensorFlow ran its first operation
+    try:
+        if config.intra_op_threads is not None:
+            tf.config.threading.set_intra_op_parallelism_threads(config.intra_op_threads)
+        if config.inter_op_threads is not None:
+            tf.config.threading.set_inter_op_parallelism_threads(config.inter_op_threads)
+    except RuntimeError as e:
+        logger.warning(f"Couldn't configure TensorFlow threads: {e}")
+
 
 class ResNetExtractor(FeatureExtractor):
-    def __init__(self):
+    def __init__(self, config: Optional[FeatureExtractorConfig] = None):
+        self.config = config or FeatureExtractorConfig()
+        configure_threads(self.config)
         base_model = tf.keras.applications.ResNet50(
             include_top=True, weights="imagenet"
         )
         self.model = Model(
             inputs=base_model.input, outputs=base_model.get_layer("avg_pool").output
         )
+        # one trace for any batch size, model.predict sets up a data pipeline per call
+        self._infer = tf.function(
+            lambda x: self.model(x, training=False),
+            input_signature=[tf.TensorSpec([None, 224, 224, 3], tf.float32)],
+        )
+
+    def initialize(self) -> None:
+        if not self.config.low_latency:
+            return
+        x = np.zeros((1, 224, 224, 3), dtype=np.float32)
+        for _ in range(self.config.warmup_runs):
+            start_time = time.perf_counter()
+            self._infer(x)
+            logger.info(f"Warm-up took {(time.perf_counter() - start_time) * 1000:.1f}ms")
+
+    @property
+    def model_identity(self) -> str:
+        return f"resnet50-imagenet-avg_pool-224-keras{keras.__version__}"
 
     def extract_features(self, input_image: np.ndarray) -> np.ndarray:
-        img = cv2.resize(
-            input_image, (224, 224)
-        )  # Resnet must take a 224x224 img as an input
+        img = input_image
+        if img.shape[:2] != (224, 224):
+            img = cv2.resize(
+                input_image, (224, 224)
+            )  # Resnet must take a 224x224 img as an input
         x = np.expand_dims(
             img, axis=0
         )  # (H, W, C)->(1, H, W, C), where the first elem is the number of img
         x = preprocess_input(x)  # Subtracting avg values for each pixel
-        feature = self.model.predict(x)[0]
+        if self.config.low_latency:
+            feature = self._infer(x.astype(np.float32)).numpy()[0]
+        else:
+            feature = self.model.predict(x)[0]
         return feature / np.linalg.norm(feature)
+
+    def extract_features_batch(self, images: Sequence[np.ndarray]) -> np.ndarray:
+        features = []
+        for start in range(0, len(images), self.config.batch_size):
+            batch = np.stack(
+                [
+                    cv2.resize(image, (224, 224))
+                    for image in images[start : start + self.config.batch_size]
+                ]
+            )
+            x = preprocess_input(batch.astype(np.float32))
+            features.append(self.model.predict_on_batch(x))
+        features = np.concatenate(features)
+        return features / np.linalg.norm(features, axis=1, keepdims=True)
@@ -1,5 +1,7 @@
-from typing import Optional
+from typing import List, Optional, Tuple
+import os
 import queue
+import threading
 
 import cv2
 import numpy as np
@@ -9,19 +11,45 @@ from ors.camera.mock_camera import MockCamera
 from ors.camera.oak_lite import OAKLiteCamera
 from ors.config import Config
 from ors.datatypes import RecognitionResultConsumer, RecognitionResult
+from ors.feature_extraction.cache import FeatureCache
+from ors.feature_extraction.config import FeatureExtractorConfig
 from ors.feature_extraction.datatypes import FeatureExtractor
-from ors.feature_extraction.resnet50 import ResNetExtractor
+from ors.feature_extraction.factory import create_feature_extractor
+from ors.feature_extraction.projection import (
+    FeatureProjection,
+    ProjectedFeatureExtractor,
+    load_feature_projection,
+    wait_for_feature_projection,
+)
 from ors.pipeline import RecognitionPipeline
-from ors.printjobdata.datatypes import PrintjobRepository, Printjob
+from ors.printjobdata.catalog import PrintjobCatalogUpdater, PrintjobFeatureLoader
+from ors.printjobdata.datatypes import Printjob, PrintjobRepository
+from ors.printjobdata.images import PrintjobImageStore
 from ors.printjobdata.loader import FileSystemPrintjobProvider
+from ors.printjobdata.memmap_repository import MemmapPrintjobRepository
 from ors.printjobdata.repository import InMemoryPrintjobRepository
+from ors.printjobdata.shared_repository import SharedMemoryPrintjobRepository
+from ors.printjobdata.sqlite_repository import SQLitePrintjobRepository
+from ors.printjobdata.watcher import PrintjobDirectoryWatcher
 from ors.preprocessing.preprocessing import ImagePreprocessing
+from ors.scene_change.gate import SceneChangeGate
+from ors.similarity.compressed import CompressedFeatureIndex
+from ors.similarity.config import SimilarityConfig
+from ors.similarity.datatypes import FeatureIndex
+from ors.similarity.exact import ExactFeatureIndex
+from ors.similarity.ivf import IVFFeatureIndex
+from ors.similarity.quantization import create_codec
+from ors.similarity.sharded import ShardedFeatureIndex
+from ors.similarity.shared import SharedFeatureIndex, SharedFeatureIndexPublisher
 
 class ObjectRecognitionSystem:
     def __init__(self, config: Config) -> None:
         self.config = config
         self.initialized = False
         self.resultQueue = queue.Queue(maxsize=10)
+        self.catalog_lock = threading.RLock()
+        self.printjob_watcher = None
+        self.catalog_publisher = None
 
 
     def initialize(self, consumer: Optional[RecognitionResultConsumer] = None) -> None:
@@ -30,6 +58,7 @@ class ObjectRecognitionSystem:
 
         self.feature_extractor = self._initialize_feature_extractor()
         self.preprocessing = self._initialize_preprocessing()
+        self.image_store = self._initialize_image_store()
         self.jobdatabase = self._initialize_printjobdata(self.feature_extractor)
 
         pipeline = RecognitionPipeline(
@@ -37,6 +66,8 @@ class ObjectRecognitionSystem:
             preprocessing=self.preprocessing,
             result_consumer=result_consumer,
             feature_extractor=self.feature_extractor,
+            catalog_lock=self.catalog_lock,
+            scene_change_gate=self._initialize_scene_change_gate(),
         )
 
         self.camera = self._initialize_camera(frame_consumer=pipeline)
@@ -44,8 +75,18 @@ class ObjectRecognitionSystem:
         self.initialized = True
 
 
+    def _initialize_scene_change_gate(self) -> Optional[SceneChangeGate]:
+        # triggered captures are always recognised
+        if self.config.scene_change is None or not self.config.camera.config.stream:
+            return None
+        return SceneChangeGate(self.config.scene_change)
+
     def _initialize_preprocessing(self) -> ImagePreprocessing:
-        preprocessing = ImagePreprocessing(self.config.preprocessing)
+        config = self.config.preprocessing
+        # triggered captures are unrelated frames, there is nothing to track
+        if config.tracking and not self.config.camera.config.stream:
+            config = config.copy(update={"tracking": False})
+        preprocessing = ImagePreprocessing(config)
         return preprocessing
     def _initialize_camera(self, frame_consumer: FrameConsumer) -> Camera:
         if self.config.camera.type == "MockCamera":
@@ -60,41 +101,253 @@ class ObjectRecognitionSystem:
         return camera
 
     def _initialize_feature_extractor(self) -> FeatureExtractor:
-        feature_extractor = ResNetExtractor()
-        return feature_extractor
+        return create_feature_extractor(self.config.featureextractor or FeatureExtractorConfig())
+
+    def _initialize_feature_index(self) -> FeatureIndex:
+        config = self.config.similarity or SimilarityConfig()
+        codec = create_codec(config.encoding, pq_subvectors=config.pq_subvectors)
+        if config.index_type == "exact" and config.encoding == "float32":
+            return ExactFeatureIndex()
+        elif config.index_type == "exact":
+            return CompressedFeatureIndex(codec, train_size=config.encoding_train_size)
+        elif config.index_type == "ivf":
+            return IVFFeatureIndex(
+                nlist=config.ivf_nlist,
+                nprobe=config.ivf_nprobe,
+                min_train_size=config.ivf_min_train_size,
+                kmeans_iterations=config.ivf_kmeans_iterations,
+                codec=codec,
+            )
+        elif config.index_type == "sharded":
+            return ShardedFeatureIndex(
+                num_shards=config.num_shards, timeout_s=config.shard_timeout_s
+            )
+        raise ValueError(f"Unknown similarity index type '{config.index_type}'")
+
+    def _initialize_image_store(self) -> PrintjobImageStore:
+        config = self.config.printjobdata
+        return PrintjobImageStore(
+            max_cache_bytes=config.image_cache_bytes,
+            thumbnail_directory=config.thumbnail_directory,
+            thumbnail_size=config.thumbnail_size,
+        )
+
+    def _initialize_repository(
+        self,
+        feature_extractor: FeatureExtractor,
+        printjobprovider: FileSystemPrintjobProvider,
+    ) -> PrintjobRepository:
+        config = self.config.printjobdata
+        similarity_config = self.config.similarity or SimilarityConfig()
+        default_index = (
+            similarity_config.index_type == "exact"
+            and similarity_config.encoding == "float32"
+        )
+        if config.repository == "memory":
+            return InMemoryPrintjobRepository(
+                index=self._initialize_feature_index(),
+                # compressed encodings only pay off if the float32 copy is dropped,
+                # the sharded index restores crashed workers from it
+                keep_features=similarity_config.encoding == "float32"
+                or similarity_config.index_type == "sharded",
+            )
+        elif config.repository == "memmap":
+            return MemmapPrintjobRepository(
+                config.repository_directory,
+                model_identity=feature_extractor.model_identity,
+                file_type=config.printjobloader.printjobs_filetype,
+                image_path_resolver=printjobprovider.get_image_path_by_printjobnumber,
+                # the exact float32 index searches the memory map in place
+                index=None if default_index else self._initialize_feature_index(),
+            )
+        elif config.repository == "sqlite":
+            os.makedirs(config.repository_directory, exist_ok=True)
+            return SQLitePrintjobRepository(
+                os.path.join(config.repository_directory, "printjobs.sqlite3"),
+                model_identity=feature_extractor.model_identity,
+                index=None if default_index else self._initialize_feature_index(),
+            )
+        raise ValueError(f"Unknown printjob repository '{config.repository}'")
 
     def _initialize_printjobdata(
         self, feature_extractor: FeatureExtractor
     ) -> PrintjobRepository:
-        jobdatabase = InMemoryPrintjobRepository()
-        printjobprovider = FileSystemPrintjobProvider(
-            self.config.printjobdata.printjobloader
+        config = self.config.printjobdata
+        similarity_config = self.config.similarity or SimilarityConfig()
+        feature_config = self.config.featureextractor or FeatureExtractorConfig()
+        printjobprovider = FileSystemPrintjobProvider(config.printjobloader)
+        subscriber = (
+            similarity_config.shared_memory_name is not None
+            and similarity_config.shared_memory_role == "subscriber"
+        )
+        feature_cache = None
+        if not subscriber:
+            feature_cache = self._initialize_feature_cache(feature_extractor)
+        feature_loader = PrintjobFeatureLoader(
+            feature_extractor,
+            feature_cache=feature_cache,
+            image_store=self.image_store,
+            num_threads=config.printjobloader.loader_threads,
+            batch_size=feature_config.batch_size,
+        )
+
+        projection, fitted_printjobs = self._initialize_feature_projection(
+            feature_extractor, printjobprovider, feature_loader, fit=not subscriber
         )
-        external_printjobs = printjobprovider.get_all_printjobs(load_files=True)
+        if projection is not None:
+            # queries of the pipeline are projected like the catalog
+            feature_loader.projection = projection
+            feature_extractor = ProjectedFeatureExtractor(feature_extractor, projection)
+            self.feature_extractor = feature_extractor
+
+        if subscriber:
+            # the publishing process extracts and updates the catalog
+            return SharedMemoryPrintjobRepository(
+                SharedFeatureIndex(
+                    similarity_config.shared_memory_name,
+                    timeout_s=similarity_config.shared_memory_timeout_s,
+                ),
+                file_type=config.printjobloader.printjobs_filetype,
+                image_path_resolver=printjobprovider.get_image_path_by_printjobnumber,
+            )
+        jobdatabase = self._initialize_repository(feature_extractor, printjobprovider)
+        feature_index = jobdatabase.get_feature_index()
+        if isinstance(feature_index, ShardedFeatureIndex):
+            # the workers hold the only copy of the index, a crashed one is
+            # restored from the repository
+            feature_index.feature_source = jobdatabase.get_all_printjob_features
+        if similarity_config.shared_memory_name is not None:
+            self.catalog_publisher = SharedFeatureIndexPublisher(
+                similarity_config.shared_memory_name
+            )
 
-        for ext_job in external_printjobs:
-            image_bgr = cv2.imdecode(
-                np.frombuffer(ext_job.image_file, dtype=np.uint8), cv2.IMREAD_COLOR
+        if config.watch_interval_s is not None:
+            self.printjob_watcher = PrintjobDirectoryWatcher(
+                config.printjobloader.printjobs_directory,
+                config.printjobloader.printjobs_filetype,
+                interval_s=config.watch_interval_s,
             )
-            image_rgb = image_bgr[:, :, [2, 1, 0]]
-            features = feature_extractor.extract_features(image_rgb)
-            pj = Printjob(
-                ext_job.printjob_number,
-                image_file=ext_job.image_file,
-                file_type=ext_job.file_type,
-                features=features,
+            self.catalog_updater = PrintjobCatalogUpdater(
+                jobdatabase,
+                feature_loader,
+                self.catalog_lock,
+                on_updated=lambda: self._publish_catalog(jobdatabase),
             )
-            jobdatabase.add(pj)
+
+        known_printjobs = set(jobdatabase.get_all_printjob_numbers())
+        if fitted_printjobs is None:
+            external_printjobs = [
+                ext_job
+                for ext_job in printjobprovider.get_all_printjobs(load_files=False)
+                if ext_job.printjob_number not in known_printjobs
+            ]
+            printjobs = feature_loader.load(external_printjobs)
+        else:
+            # already loaded to fit the projection
+            printjobs = [
+                job for job in fitted_printjobs if job.printjob_number not in known_printjobs
+            ]
+        jobdatabase.add_all(printjobs)
+        if self.printjob_watcher is not None:
+            # jobs added while loading are not in the catalog, the watcher adds them
+            self.printjob_watcher.initialize(jobdatabase.get_all_printjob_numbers())
+        self._publish_catalog(jobdatabase)
+
+        print(
+            f"Loaded {len(known_printjobs)} stored printjobs, "
+            f"extracted {len(printjobs)} new printjobs "
+            f"({feature_loader.cache_hits} from feature cache)"
+        )
 
         return jobdatabase
 
+    def _initialize_feature_projection(
+        self,
+        feature_extractor: FeatureExtractor,
+        printjobprovider: FileSystemPrintjobProvider,
+        feature_loader: PrintjobFeatureLoader,
+        fit: bool,
+    ) -> Tuple[Optional[FeatureProjection], Optional[List[Printjob]]]:
+        config = self.config.featureextractor or FeatureExtractorConfig()
+        if config.projection_dimension is None:
+            return None, None
+        if not fit:
+            # the publishing process may still be fitting it
+            timeout_s = (self.config.similarity or SimilarityConfig()).shared_memory_timeout_s
+            projection = wait_for_feature_projection(
+                config.projection_path,
+                feature_extractor.model_identity,
+                config.projection_dimension,
+                config.projection_whiten,
+                timeout_s,
+            )
+            if projection is None:
+                raise FileNotFoundError(
+                    f"No feature projection in '{config.projection_path}' after {timeout_s}s, "
+                    f"it is fitted by the publishing process"
+                )
+            return projection, None
+        projection = load_feature_projection(
+            config.projection_path,
+            feature_extractor.model_identity,
+            config.projection_dimension,
+            config.projection_whiten,
+        )
+        if projection is not None:
+            return projection, None
+        printjobs = feature_loader.load(printjobprovider.get_all_printjobs(load_files=False))
+        projection = FeatureProjection.fit(
+            np.stack([job.features for job in printjobs]),
+            config.projection_dimension,
+            feature_extractor.model_identity,
+            whiten=config.projection_whiten,
+        )
+        projection.save(config.projection_path)
+        feature_loader.projection = projection
+        feature_loader.apply_projection(printjobs)
+        return projection, printjobs
+
+    def _publish_catalog(self, jobdatabase: PrintjobRepository) -> None:
+        if self.catalog_publisher is None:
+            return
+        # the index has the features also with compressed encodings, where the
+        # repository keeps none; they are copied into shared memory under the lock
+        with self.catalog_lock:
+            printjob_ids, features = jobdatabase.get_feature_index().export_features()
+            self.catalog_publisher.publish(printjob_ids, features)
+
+    def _initialize_feature_cache(
+        self, feature_extractor: FeatureExtractor
+    ) -> Optional[FeatureCache]:
+        config = self.config.featureextractor
+        if config is None or config.cache_directory is None:
+            return None
+        prune_after_s = None
+        if config.cache_prune_after_days is not None:
+            prune_after_s = config.cache_prune_after_days * 24 * 3600
+        return FeatureCache(
+            config.cache_directory, feature_extractor.model_identity, prune_after_s=prune_after_s
+        )
+
     def start_pipeline(self) -> None:
+        if self.printjob_watcher is not None:
+            self.printjob_watcher.start(self.catalog_updater.apply)
         self.camera.start_recording()
 
     def take_picture(self) -> RecognitionResult:
         self.camera.capture_frame()
         return self.resultQueue.get()
 
+    def shutdown(self) -> None:
+        if self.printjob_watcher is not None:
+            self.printjob_watcher.stop()
+        # the catalog updater publishes under the lock, so no publish is running
+        with self.catalog_lock:
+            if self.catalog_publisher is not None:
+                # otherwise the segments stay in /dev/shm
+                self.catalog_publisher.close()
+                self.catalog_publisher = None
+
 
 def add_text_to_image(image: np.ndarray, text: str) -> np.ndarray:
     new_shape = (image.shape[0] + 50, *image.shape[1:])
@@ -118,9 +371,16 @@ def main():
     print(config)
 
     prs = ObjectRecognitionSystem(config=config)
-    prs.initialize()
-    prs.start_pipeline()
+    try:
+        prs.initialize()
+        prs.start_pipeline()
+        show_results(prs, config)
+    finally:
+        prs.shutdown()
+    cv2.destroyAllWindows()
 
+
+def show_results(prs: ObjectRecognitionSystem, config: Config) -> None:
     while True:
         if config.camera.config.stream:
             recognition_result = prs.resultQueue.get()
@@ -131,8 +391,13 @@ def main():
 
             recognition_result = prs.take_picture()
 
+        if recognition_result.reused:
+            # the windows still show the recognised frame of this scene
+            cv2.waitKey(1)
+            continue
         print(
-            f"Image with shape {recognition_result.captured_image.shape} taken at {recognition_result.capturing_context.timestamp}"
+            f"Image with shape {recognition_result.captured_image.shape} taken at {recognition_result.capturing_context.timestamp}, "
+            f"feature extraction took {recognition_result.feature_extraction_ms:.1f}ms"
         )
         captured_image = recognition_result.captured_image
         capture_text = f"Captured Image"
@@ -149,17 +414,26 @@ def main():
             cv2.resize(recognition_result.preprocessed_image, (int(540 * ratio), 540)),
         )
 
-        job_image = cv2.imdecode(
-            np.frombuffer(recognition_result.job.image_file, dtype=np.uint8),
-            cv2.IMREAD_COLOR,
+        job = recognition_result.job
+        job_image = None if job is None else prs.image_store.get_thumbnail(job)
+        if job_image is None:
+            # e.g. the image was deleted meanwhile or isn't readable here
+            size = prs.image_store.thumbnail_size
+            job_image = np.zeros((size, size, 3), dtype=np.uint8)
+            job_image = add_text_to_image(
+                job_image,
+                "No matching printjob"
+                if job is None
+                else f"No image for printjob {job.printjob_number}",
+            )
+        distance_text = (
+            f"Distance: {recognition_result.calculated_distance:.4f} "
+            f"Margin: {recognition_result.calculated_margin:.4f}"
         )
-        distance_text = f"Distance: {recognition_result.calculated_distance:.4f}"
         job_image = add_text_to_image(job_image, distance_text)
         cv2.imshow("job_image", job_image)
 
         cv2.waitKey(1)
 
-    cv2.destroyAllWindows()
-
 if __name__ == "__main__":
     main()
@@ -1,14 +1,19 @@
+import dataclasses
 import queue
+import threading
+import time
 import numpy as np
 
-from typing import Union
+from typing import Optional, Tuple, Union
 
 from ors.camera.datatypes import CapturingContext, FrameConsumer
+from ors.common.color import RGB, convert_color
 from ors.datatypes import RecognitionResult, RecognitionResultConsumer
 from ors.feature_extraction.datatypes import FeatureExtractor
-from ors.printjobdata.datatypes import PrintjobRepository
-from ors.similarity import similarity
+from ors.printjobdata.datatypes import Printjob, PrintjobRepository
 from ors.preprocessing.preprocessing import ImagePreprocessing
+from ors.scene_change.gate import SceneChangeGate
+from ors.similarity.datatypes import TopKMatches
 
 
 
@@ -26,10 +31,17 @@ class RecognitionPipeline(FrameConsumer):
         result_consumer: Union[RecognitionResultConsumer, queue.Queue],
         feature_extractor: FeatureExtractor,
         preprocessing: ImagePreprocessing,
+        catalog_lock: Optional[threading.RLock] = None,
+        scene_change_gate: Optional[SceneChangeGate] = None,
     ) -> None:
         self.jobdatabase = jobdatabase
         self.feature_extractor = feature_extractor
         self.preprocessing = preprocessing
+        # held by catalog updates, keeps the match and the fetched job consistent
+        self.catalog_lock = catalog_lock or threading.RLock()
+        self.scene_change_gate = scene_change_gate
+        self.last_result: Optional[RecognitionResult] = None
+        self._rgb_buffer: Optional[np.ndarray] = None
 
 
         if isinstance(result_consumer, queue.Queue):
@@ -39,21 +51,65 @@ class RecognitionPipeline(FrameConsumer):
 
     def consume(self, frame: np.ndarray, capturing_context: CapturingContext):
 
-        preprocessed_frame = self.preprocessing.preprocess(frame)
-
-        features = self.feature_extractor.extract_features(preprocessed_frame)
-
-        all_jobs_features = self.jobdatabase.get_all_printjob_features()
-
-        job_id, distance = similarity.find_best_match(features, all_jobs_features)
-
-        job = self.jobdatabase.get(job_id)
+        if (
+            self.scene_change_gate is not None
+            and not self.scene_change_gate.should_recognise(
+                frame, capturing_context.color_order
+            )
+            and self.last_result is not None
+        ):
+            # same scene as the last recognised frame, skip segmentation, extraction and matching
+            self.resultConsumer.consume(
+                dataclasses.replace(
+                    self.last_result,
+                    captured_image=frame,
+                    capturing_context=capturing_context,
+                    reused=True,
+                )
+            )
+            return
+
+        color_order = capturing_context.color_order
+        preprocessed_frame = self.preprocessing.preprocess(frame, color_order)
+
+        start_time = time.perf_counter()
+        # the only channel conversion of the frame, into a buffer reused while
+        # the printjob crops keep their size
+        rgb_frame = convert_color(preprocessed_frame, color_order, RGB, dst=self._rgb_buffer)
+        if rgb_frame is not preprocessed_frame:
+            self._rgb_buffer = rgb_frame
+        features = self.feature_extractor.extract_features(rgb_frame)
+        feature_extraction_ms = (time.perf_counter() - start_time) * 1000
+
+        with self.catalog_lock:
+            matches, job = self._match(features)
 
         recognition_result = RecognitionResult(
             job=job,
             captured_image=frame,
             capturing_context=capturing_context,
             preprocessed_image=preprocessed_frame,
-            calculated_distance=distance,
+            calculated_distance=float(matches.distances[0, 0]),
+            calculated_margin=float(matches.margins[0]),
+            feature_extraction_ms=feature_extraction_ms,
         )
+        self.last_result = recognition_result
+        if self.scene_change_gate is not None:
+            self.scene_change_gate.recognised()
         self.resultConsumer.consume(recognition_result)
+
+    def _match(self, features: np.ndarray) -> Tuple[TopKMatches, Optional[Printjob]]:
+        for _ in range(2):
+            matches = self.jobdatabase.get_feature_index().find_top_k(
+                features[np.newaxis], k=2
+            )
+            job_id = int(matches.ids[0, 0])
+            if job_id < 0:
+                return matches, None
+            try:
+                return matches, self.jobdatabase.get(job_id)
+            except KeyError:
+                # a shared catalog can switch to a version without the match
+                # between the search and the lookup, the search is repeated on it
+                continue
+        return matches, None
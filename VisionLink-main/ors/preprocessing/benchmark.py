@@ -0,0 +1,323 @@
+import argparse
+import pathlib
+import time
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+from ors.common.color import BGR
+from ors.preprocessing.config import PreprocessingConfig
+from ors.preprocessing.classical.document_detection import detect_document
+from ors.preprocessing.ml.corner_points import corner_points
+from ors.preprocessing.ml.printjob_extraction import (
+    extract_printjob_from_mask,
+    quadrilateral_from_mask,
+)
+from ors.preprocessing.preprocessing import ImagePreprocessing
+from ors.preprocessing.tracking import CornerTracker
+from ors.preprocessing.utils import (
+    angle_of_quadrilateral,
+    extract_printjob_from_quadrilateral,
+    warp_quadrilateral,
+)
+
+
+def load_recordings(recordings_directory: str, limit: int) -> List[np.ndarray]:
+    paths = sorted(str(path) for path in pathlib.Path(recordings_directory).rglob("*.jpg"))
+    return [cv2.imread(path) for path in paths[:limit]]
+
+
+def quadrilateral_iou(a: list, b: list, image_shape) -> float:
+    canvas_a = np.zeros(image_shape[:2], dtype=np.uint8)
+    canvas_b = np.zeros(image_shape[:2], dtype=np.uint8)
+    cv2.fillPoly(canvas_a, [np.array(a, dtype=np.int32)], 1)
+    cv2.fillPoly(canvas_b, [np.array(b, dtype=np.int32)], 1)
+    union = np.count_nonzero(canvas_a | canvas_b)
+    return np.count_nonzero(canvas_a & canvas_b) / union if union else 1.0
+
+
+def run(
+    config: PreprocessingConfig, images: List[np.ndarray], sizes: List[Optional[int]]
+) -> None:
+    reference = None
+    for size in sizes:
+        preprocessing = ImagePreprocessing(config.copy(update={"inference_size": size}))
+        preprocessing.segment(images[0])  # warm-up
+        latencies = np.empty(len(images))
+        quadrilaterals = []
+        for i, image in enumerate(images):
+            start_time = time.perf_counter()
+            mask = preprocessing.segment(image)
+            if mask is not None:
+                extract_printjob_from_mask(mask=mask, image=image)
+            latencies[i] = time.perf_counter() - start_time
+            quadrilaterals.append(
+                None if mask is None else quadrilateral_from_mask(mask, image.shape)
+            )
+        latencies *= 1000
+
+        if reference is None:
+            # the first size is the reference for the crop quality
+            reference = quadrilaterals
+        ious = [
+            quadrilateral_iou(found, expected, image.shape)
+            for found, expected, image in zip(quadrilaterals, reference, images)
+            if found is not None and expected is not None
+        ]
+        missed = sum(found is None for found in quadrilaterals)
+        print(
+            f"{'config' if size is None else size:>6}  mean {latencies.mean():8.1f}ms  "
+            f"p99 {np.percentile(latencies, 99):8.1f}ms  "
+            f"corner IoU mean {np.mean(ious) if ious else float('nan'):.4f} "
+            f"min {np.min(ious) if ious else float('nan'):.4f}  missed {missed}"
+        )
+
+
+def mask_iou(a: np.ndarray, b: np.ndarray, image_shape) -> float:
+    # the masks of both backends have other resolutions, compared at the frame's
+    size = (image_shape[1], image_shape[0])
+    a = cv2.resize(a.astype(np.uint8), size, interpolation=cv2.INTER_NEAREST)
+    b = cv2.resize(b.astype(np.uint8), size, interpolation=cv2.INTER_NEAREST)
+    union = np.count_nonzero(a | b)
+    return np.count_nonzero(a & b) / union if union else 1.0
+
+
+def run_backends(
+    config: PreprocessingConfig, images: List[np.ndarray], backends: List[str]
+) -> None:
+    # the first backend is the reference for the mask IoU
+    reference = None
+    for backend in backends:
+        preprocessing = ImagePreprocessing(config.copy(update={"segmentation_backend": backend}))
+        preprocessing.segment(images[0])  # warm-up
+        latencies = np.empty(len(images))
+        masks = []
+        for i, image in enumerate(images):
+            start_time = time.perf_counter()
+            masks.append(preprocessing.segment(image))
+            latencies[i] = time.perf_counter() - start_time
+        latencies *= 1000
+
+        if reference is None:
+            reference = masks
+        ious = [
+            mask_iou(found, expected, image.shape)
+            for found, expected, image in zip(masks, reference, images)
+            if found is not None and expected is not None
+        ]
+        missed = sum(found is None for found in masks)
+        print(
+            f"{backend:<12} mean {latencies.mean():8.1f}ms  "
+            f"p99 {np.percentile(latencies, 99):8.1f}ms  "
+            f"mask IoU mean {np.mean(ious) if ious else float('nan'):.4f} "
+            f"min {np.min(ious) if ious else float('nan'):.4f}  missed {missed}"
+        )
+
+
+def run_tracking(config: PreprocessingConfig, images: List[np.ndarray]) -> None:
+    # the images are consecutive stream frames, every frame is also detected to
+    # compare the tracked corners with a fresh detection
+    detector = ImagePreprocessing(config)
+    tracker = CornerTracker(config)
+    tracking_latencies = np.empty(len(images))
+    detection_latencies = np.empty(len(images))
+    ious = []
+    for i, image in enumerate(images):
+        start_time = time.perf_counter()
+        points = tracker.track(image, BGR)
+        tracked = points is not None
+        if not tracked:
+            points = detector.detect(image, BGR)
+            tracker.detected(points)
+        tracking_latencies[i] = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        expected = detector.detect(image, BGR)
+        detection_latencies[i] = time.perf_counter() - start_time
+        if tracked and expected is not None:
+            ious.append(quadrilateral_iou(points, expected, image.shape))
+    tracking_latencies *= 1000
+    detection_latencies *= 1000
+
+    print(
+        f"segmentation skip rate {tracker.skip_rate:.3f}, {tracker.lost} tracks lost, "
+        f"redetect interval {config.tracking_redetect_interval}"
+    )
+    for name, latencies in (("detection", detection_latencies), ("tracking", tracking_latencies)):
+        print(
+            f"{name:<10} mean {latencies.mean():8.2f}ms  p99 {np.percentile(latencies, 99):8.2f}ms"
+        )
+    print(
+        f"tracked corner IoU against detection mean "
+        f"{np.mean(ious) if ious else float('nan'):.4f} "
+        f"min {np.min(ious) if ious else float('nan'):.4f}"
+    )
+
+
+def legacy_corner_points(mask):
+    # the former skimage/shapely implementation, kept for comparison
+    from shapely.geometry import Polygon
+    from skimage.measure import find_contours
+
+    contours = find_contours(mask, 0.5)
+    polygon = Polygon(contours[0])
+
+    # Get the minimum bounding box of the object
+    min_x, min_y, max_x, max_y = polygon.minimum_rotated_rectangle.bounds
+    min_rect_pts = np.array(polygon.minimum_rotated_rectangle.exterior.coords[:-1], dtype=np.int32)
+
+    return [[int(x), int(y)] for y, x in min_rect_pts]
+
+
+def collect_masks(
+    preprocessing: ImagePreprocessing, images: List[np.ndarray]
+) -> List[np.ndarray]:
+    masks = [preprocessing.segment(image) for image in images]
+    return [mask for mask in masks if mask is not None]
+
+
+def run_corners(masks: List[np.ndarray], repeat: int) -> None:
+    results = {}
+    for name, function in (("legacy", legacy_corner_points), ("opencv", corner_points)):
+        function(masks[0])  # warm-up
+        latencies = np.empty(len(masks) * repeat)
+        for i in range(repeat):
+            for j, mask in enumerate(masks):
+                start_time = time.perf_counter()
+                points = function(mask)
+                latencies[i * len(masks) + j] = time.perf_counter() - start_time
+                results.setdefault(name, {})[j] = points
+        latencies *= 1000
+        print(
+            f"{name:<8} mean {latencies.mean():8.3f}ms  p99 {np.percentile(latencies, 99):8.3f}ms"
+        )
+
+    # extract_printjob_from_mask rotates by the angle of the two top corners
+    # and crops the bounding box, so these have to agree
+    corner_distances, angle_differences = [], []
+    for j, mask in enumerate(masks):
+        legacy = np.array(sorted(results["legacy"][j]))
+        opencv = np.array(sorted(results["opencv"][j]))
+        corner_distances.append(np.abs(legacy - opencv).max())
+        angle_differences.append(
+            abs(
+                angle_of_quadrilateral(list(results["legacy"][j]))
+                - angle_of_quadrilateral(list(results["opencv"][j]))
+            )
+        )
+    print(
+        f"{len(masks)} masks, max corner distance {max(corner_distances)}px, "
+        f"max angle difference {max(angle_differences):.2f} degrees"
+    )
+
+
+def run_rectification(images: List[np.ndarray], model_size: int) -> None:
+    # the sheet corners come from the classical detection, the segmentation
+    # model is not needed to compare the rectification steps
+    detections = [(image, detect_document(image)) for image in images]
+    detections = [(image, detection.points) for image, detection in detections if detection]
+    steps = (
+        (
+            "rotate_crop + resize",
+            lambda image, points: cv2.resize(
+                extract_printjob_from_quadrilateral(points, image), (model_size, model_size)
+            ),
+        ),
+        ("perspective", lambda image, points: warp_quadrilateral(image, points)),
+        (
+            f"perspective {model_size}",
+            lambda image, points: warp_quadrilateral(image, points, (model_size, model_size)),
+        ),
+    )
+    print(f"{len(detections)} detected sheets")
+    for name, step in steps:
+        latencies = np.empty(len(detections))
+        for i, (image, points) in enumerate(detections):
+            start_time = time.perf_counter()
+            step(image, [list(point) for point in points])
+            latencies[i] = time.perf_counter() - start_time
+        latencies *= 1000
+        print(
+            f"{name:<24} mean {latencies.mean():8.2f}ms  p99 {np.percentile(latencies, 99):8.2f}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Segmentation latency and crop quality for several inference sizes "
+        "(the crop quality is the IoU of the printjob corners against the first size), "
+        "the latency and agreement of the mask corner point implementations, the "
+        "latency of the rectification steps, or the latency and mask IoU of the "
+        "segmentation backends against the first one, or the segmentation skip rate and "
+        "accuracy of the corner tracking on consecutive frames (classical detection "
+        "without --cfg-file)"
+    )
+    parser.add_argument(
+        "--report",
+        choices=["segmentation", "corners", "rectification", "backends", "tracking"],
+        default="segmentation",
+    )
+    parser.add_argument("--cfg-file", help="segmentation model, not needed for rectification")
+    parser.add_argument("--weights-file")
+    parser.add_argument("--model-size", type=int, default=224)
+    parser.add_argument("--backends", nargs="+", default=["detectron2", "torchscript"])
+    parser.add_argument(
+        "--segmentation-model-path",
+        default=PreprocessingConfig(use_ml=False).segmentation_model_path,
+    )
+    parser.add_argument(
+        "--segmentation-input-size",
+        nargs=2,
+        type=int,
+        default=list(PreprocessingConfig(use_ml=False).segmentation_input_size),
+        metavar=("WIDTH", "HEIGHT"),
+    )
+    parser.add_argument("--threads", type=int, help="torch threads, torch default if not set")
+    parser.add_argument("--redetect-interval", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--recordings-directory", default="testdata/recordings")
+    parser.add_argument("--images", type=int, default=50)
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        default=["config", "800", "640", "512", "384", "256"],
+        help="shorter image side, 'config' for INPUT.MIN_SIZE_TEST of the cfg file, "
+        "a size above the frame size for the full resolution",
+    )
+    args = parser.parse_args()
+    if args.cfg_file is None and (
+        args.report in ("segmentation", "corners")
+        or (args.report == "backends" and "detectron2" in args.backends)
+    ):
+        parser.error(f"the {args.report} report needs --cfg-file")
+
+    config = PreprocessingConfig(
+        use_ml=args.cfg_file is not None,
+        cfg_file=args.cfg_file,
+        weights_file=args.weights_file,
+        segmentation_model_path=args.segmentation_model_path,
+        segmentation_input_size=tuple(args.segmentation_input_size),
+        segmentation_threads=args.threads,
+        tracking_redetect_interval=args.redetect_interval,
+    )
+    images = load_recordings(args.recordings_directory, args.images)
+    print(f"{len(images)} recordings of {images[0].shape[1]}x{images[0].shape[0]}")
+    if args.report == "rectification":
+        run_rectification(images, args.model_size)
+        return
+    if args.report == "tracking":
+        run_tracking(config, images)
+        return
+    if args.report == "backends":
+        run_backends(config, images, args.backends)
+        return
+    if args.report == "corners":
+        run_corners(collect_masks(ImagePreprocessing(config), images), args.repeat)
+        return
+    sizes = [None if size == "config" else int(size) for size in args.sizes]
+    run(config, images, sizes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+from dataclasses import dataclass
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+from ors.common.color import BGR, to_grey
+
+
+@dataclass
+class DocumentDetection:
+    # corner points in image coordinates
+    points: List[List[int]]
+    # how well the contour fills its minimum-area rectangle, 0..1
+    confidence: float
+
+
+def _candidate_masks(grey: np.ndarray) -> List[np.ndarray]:
+    blurred = cv2.GaussianBlur(grey, (5, 5), 0)
+    # closed edges around the sheet
+    edges = cv2.Canny(blurred, 50, 150)
+    edges = cv2.morphologyEx(
+        edges, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
+    )
+    # the sheet is usually brighter than the background
+    _, bright = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return [edges, bright]
+
+
+def detect_document(
+    image: np.ndarray,
+    detection_size: int = 512,
+    min_area_ratio: float = 0.05,
+    max_area_ratio: float = 0.98,
+    color_order: str = BGR,
+) -> Optional[DocumentDetection]:
+    # Finds the printed sheet as the largest contour with a rectangular shape
+    # and returns the minimum-area rectangle around it
+    scale = min(1.0, detection_size / min(image.shape[:2]))
+    small = image
+    if scale < 1:
+        small = cv2.resize(
+            image,
+            (round(image.shape[1] * scale), round(image.shape[0] * scale)),
+            interpolation=cv2.INTER_AREA,
+        )
+    grey = to_grey(small, color_order)
+    frame_area = grey.shape[0] * grey.shape[1]
+
+    best: Optional[DocumentDetection] = None
+    best_area = 0.0
+    for candidate_mask in _candidate_masks(grey):
+        contours, _ = cv2.findContours(
+            candidate_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
+        )
+        for contour in contours:
+            area = cv2.contourArea(contour)
+            if not min_area_ratio * frame_area <= area <= max_area_ratio * frame_area:
+                continue
+            rect = cv2.minAreaRect(contour)
+            rect_area = rect[1][0] * rect[1][1]
+            if rect_area <= 0:
+                continue
+            confidence = area / rect_area
+            # a larger sheet wins over a slightly more rectangular small one
+            if best is None or confidence * area > best.confidence * best_area:
+                points = cv2.boxPoints(rect) / scale
+                best = DocumentDetection(
+                    points=np.round(points).astype(np.int32).tolist(),
+                    confidence=float(confidence),
+                )
+                best_area = area
+    return best
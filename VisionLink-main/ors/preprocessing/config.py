@@ -1,7 +1,51 @@
-from pydantic import BaseSettings
+from typing import Literal, Optional, Tuple
+
+from pydantic import BaseSettings, validator
 
 
 class PreprocessingConfig(BaseSettings):
+    # False detects the sheet with OpenCV contours and only falls back to the
+    # segmentation model for detections below classical_min_confidence
     use_ml: bool
-    cfg_file: str
-    weights_file: str
\ No newline at end of file
+    cfg_file: Optional[str] = None
+    weights_file: Optional[str] = None
+    classical_min_confidence: float = 0.9
+    ml_fallback: bool = True
+    # frames with a longer shorter side are downscaled to it for the
+    # segmentation, the mask is mapped back to the full resolution frame;
+    # None keeps the INPUT.MIN_SIZE_TEST resizing of cfg_file
+    inference_size: Optional[int] = None
+    # "detectron2" runs DefaultPredictor on cfg_file/weights_file, "torchscript"
+    # the traced export of the same weights (python -m ors.preprocessing.ml.segmentation)
+    # at the fixed segmentation_input_size (width, height) the model was exported with.
+    # "torchscript" is experimental: the traced Mask R-CNN has not been compared with
+    # DefaultPredictor yet, check it with python -m ors.preprocessing.benchmark --report backends
+    segmentation_backend: str = "detectron2"
+    segmentation_model_path: str = "models/segmentation.ts"
+    segmentation_input_size: Tuple[int, int] = (928, 512)
+    # torch thread pools of either backend, None keeps the torch defaults
+    segmentation_threads: Optional[int] = None
+    segmentation_interop_threads: Optional[int] = None
+    # "rotate_crop" rotates the whole frame and crops the sheet, "perspective"
+    # warps the sheet corners once into rectified_size (width, height), e.g. the
+    # feature extractor input [224, 224]; None keeps the sheet resolution
+    rectification: Literal["rotate_crop", "perspective"] = "rotate_crop"
+    rectified_size: Optional[Tuple[int, int]] = None
+    # stream mode: follow the corners of the last detection with optical flow
+    # and only detect again every tracking_redetect_interval frames or when the
+    # track is lost (forward-backward error above tracking_max_error pixels at
+    # tracking_size, or the area changed by more than tracking_max_area_change)
+    tracking: bool = False
+    tracking_redetect_interval: int = 30
+    tracking_size: int = 512
+    tracking_window: int = 21
+    tracking_max_error: float = 1.0
+    tracking_max_area_change: float = 1.2
+    # log the segmentation skip rate every this many frames
+    tracking_log_interval: int = 100
+
+    @validator("segmentation_backend", always=True)
+    def _require_cfg_file(cls, value, values):
+        if value == "detectron2" and values.get("use_ml") and values.get("cfg_file") is None:
+            raise ValueError("use_ml with the detectron2 backend needs a cfg_file")
+        return value
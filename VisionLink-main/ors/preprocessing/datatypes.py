@@ -0,0 +1,14 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import numpy as np
+
+from ors.common.color import BGR
+
+
+class Segmenter(ABC):
+    # mask of the most confident printjob instance at the resolution the model
+    # ran at, quadrilateral_from_mask maps it to the frame; None if nothing was found
+    @abstractmethod
+    def segment(self, image: np.ndarray, color_order: str = BGR) -> Optional[np.ndarray]:
+        pass
@@ -1,15 +1,18 @@
+from typing import List, Optional
+
+import cv2
 import numpy as np
-from skimage.measure import find_contours
-from shapely.geometry import Polygon
 
+from ors.preprocessing.utils import order_corners
 
-def corner_points(mask):
 
-    contours = find_contours(mask, 0.5)
-    polygon = Polygon(contours[0])
+def corner_points(mask) -> Optional[List[List[int]]]:
 
-    # Get the minimum bounding box of the object
-    min_x, min_y, max_x, max_y = polygon.minimum_rotated_rectangle.bounds
-    min_rect_pts = np.array(polygon.minimum_rotated_rectangle.exterior.coords[:-1], dtype=np.int32)
+    mask = np.ascontiguousarray(mask > 0.5, dtype=np.uint8)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if len(contours) == 0:
+        return None
+    contour = max(contours, key=cv2.contourArea)
 
-    return [[int(x), int(y)] for y, x in min_rect_pts]
\ No newline at end of file
+    # Get the minimum bounding box of the object
+    return order_corners(cv2.boxPoints(cv2.minAreaRect(contour)))
@@ -1,16 +1,18 @@
+from typing import Optional
+
 import numpy as np
 
 from ors.preprocessing.ml.corner_points import corner_points
-from ors.preprocessing.utils import (
-    angle_of_quadrilateral,
-    rotate_image_and_points,
-    crop_quadrilateral_with_padding,
-)
+from ors.preprocessing.utils import extract_printjob_from_quadrilateral
 
 
-def extract_printjob_from_mask(mask: np.ndarray, image: np.ndarray) -> np.ndarray:
+def quadrilateral_from_mask(mask: np.ndarray, image_shape) -> Optional[list]:
+    # corner points of the mask in coordinates of an image that may have
+    # another resolution than the mask
 
     quadrilateral_points = corner_points(mask=mask)
+    if quadrilateral_points is None:
+        return None
 
     quadrilateral_points = np.array(quadrilateral_points) * [
         1 / mask.shape[1],
@@ -18,19 +20,19 @@ def extract_printjob_from_mask(mask: np.ndarray, image: np.ndarray) -> np.ndarra
     ]
 
     quadrilateral_points = np.array(quadrilateral_points) * [
-        image.shape[1],
-        image.shape[0],
+        image_shape[1],
+        image_shape[0],
     ]
 
-    quadrilateral_points = quadrilateral_points.astype("int32").tolist()
+    return quadrilateral_points.astype("int32").tolist()
+
+
+def extract_printjob_from_mask(mask: np.ndarray, image: np.ndarray) -> np.ndarray:
+
+    quadrilateral_points = quadrilateral_from_mask(mask, image.shape)
 
     if quadrilateral_points is None:
         return None
 
-    angle = angle_of_quadrilateral(quadrilateral_points)
-    rotated_image, rotated_points = rotate_image_and_points(
-        image, angle, quadrilateral_points
-    )
-    cropped_printjob = crop_quadrilateral_with_padding(rotated_image, rotated_points)
+    return extract_printjob_from_quadrilateral(quadrilateral_points, image)
 
-    return cropped_printjob
\ No newline at end of file
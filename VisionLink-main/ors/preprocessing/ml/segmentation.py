@@ -0,0 +1,187 @@
+import argparse
+import os
+from typing import Optional
+
+import cv2
+import numpy as np
+import torch
+
+from ors.common import logger
+from ors.common.color import BGR, convert_color
+from ors.preprocessing.config import PreprocessingConfig
+from ors.preprocessing.datatypes import Segmenter
+from ors.preprocessing.ml.transforms import downscale_shorter_side, fit_to_input, paste_mask
+
+logger = logger.get_logger(__name__)
+
+# stored next to the TorchScript model, the traced graph only runs at this size
+INPUT_SIZE_FILE = "input_size"
+
+
+def configure_threads(config: PreprocessingConfig) -> None:
+    if config.segmentation_threads is not None:
+        torch.set_num_threads(config.segmentation_threads)
+    # only possible before torch ran its first parallel operation
+    try:
+        if config.segmentation_interop_threads is not None:
+            torch.set_num_interop_threads(config.segmentation_interop_threads)
+    except RuntimeError as e:
+        logger.warning(f"Couldn't configure the torch inter-op threads: {e}")
+
+
+def detectron2_cfg(config: PreprocessingConfig):
+    from detectron2.config import get_cfg
+
+    cfg = get_cfg()
+    cfg.merge_from_file(config.cfg_file)
+    cfg.MODEL.WEIGHTS = config.weights_file
+    if config.inference_size is not None:
+        # the frame is already downsized, 0 keeps DefaultPredictor from resizing
+        # it again, which would also scale up frames smaller than inference_size
+        cfg.INPUT.MIN_SIZE_TEST = 0
+    return cfg
+
+
+class DefaultPredictorSegmenter(Segmenter):
+    def __init__(self, config: PreprocessingConfig) -> None:
+        from detectron2.engine import DefaultPredictor
+
+        self.config = config
+        configure_threads(config)
+        self.predictor = DefaultPredictor(detectron2_cfg(config))
+
+    def segment(self, image: np.ndarray, color_order: str = BGR) -> Optional[np.ndarray]:
+        image = downscale_shorter_side(image, self.config.inference_size)
+        # DefaultPredictor takes BGR and converts to the model format itself,
+        # an RGB frame is only converted after downsizing
+        output = self.predictor(convert_color(image, color_order, BGR))
+
+        if output is None:
+            return None
+
+        masks = output["instances"].pred_masks
+        if len(masks) < 1:
+            return None
+
+        return masks[0].cpu().numpy()
+
+
+class TorchScriptSegmenter(Segmenter):
+    # Runs the Mask R-CNN traced by export_torchscript at the fixed
+    # segmentation_input_size, only torch is needed at runtime. The traced
+    # model returns the boxes, scores and mask probabilities of the instances
+    # sorted by score, the best mask is pasted into the frame here.
+    def __init__(self, config: PreprocessingConfig) -> None:
+        self.config = config
+        if not os.path.exists(config.segmentation_model_path):
+            raise FileNotFoundError(
+                f"TorchScript model '{config.segmentation_model_path}' not found, export it "
+                f"with 'python -m ors.preprocessing.ml.segmentation'"
+            )
+        configure_threads(config)
+        extra_files = {INPUT_SIZE_FILE: ""}
+        self.model = torch.jit.load(
+            config.segmentation_model_path, map_location="cpu", _extra_files=extra_files
+        )
+        self.input_size = tuple(
+            int(value) for value in extra_files[INPUT_SIZE_FILE].decode().split("x")
+        )
+        if self.input_size != tuple(config.segmentation_input_size):
+            raise ValueError(
+                f"'{config.segmentation_model_path}' was exported for the input size "
+                f"{self.input_size}, not {tuple(config.segmentation_input_size)}"
+            )
+        width, height = self.input_size
+        self.input = np.zeros((height, width, 3), dtype=np.uint8)
+
+    def segment(self, image: np.ndarray, color_order: str = BGR) -> Optional[np.ndarray]:
+        resized_height, resized_width = fit_to_input(
+            image, self.input_size, color_order, self.input
+        )
+        with torch.inference_mode():
+            boxes, scores, masks = self.model(torch.from_numpy(self.input))
+
+        if len(scores) < 1:
+            return None
+
+        mask = paste_mask(masks[0, 0].numpy(), boxes[0].numpy(), self.input.shape)
+        # the mask of the frame without the padding
+        return mask[:resized_height, :resized_width]
+
+
+class _TraceableMaskRCNN(torch.nn.Module):
+    def __init__(self, model, input_format: str) -> None:
+        super().__init__()
+        self.model = model
+        self.flip_channels = input_format == "RGB"
+
+    def forward(self, image):
+        # (H, W, 3) uint8 BGR like DefaultPredictor takes it
+        image = image.permute(2, 0, 1).float()
+        if self.flip_channels:
+            image = image.flip(0)
+        # without postprocessing the masks stay (N, 1, M, M) probabilities in their boxes
+        instances = self.model.inference([{"image": image}], do_postprocess=False)[0]
+        return instances.pred_boxes.tensor, instances.scores, instances.pred_masks
+
+
+def export_torchscript(
+    config: PreprocessingConfig, model_path: str, sample_image: np.ndarray
+) -> None:
+    from detectron2.checkpoint import DetectionCheckpointer
+    from detectron2.modeling import build_model
+
+    cfg = detectron2_cfg(config)
+    cfg.MODEL.DEVICE = "cpu"
+    model = build_model(cfg)
+    DetectionCheckpointer(model).load(cfg.MODEL.WEIGHTS)
+    model.eval()
+
+    width, height = config.segmentation_input_size
+    sample = np.zeros((height, width, 3), dtype=np.uint8)
+    fit_to_input(sample_image, (width, height), BGR, sample)
+    with torch.no_grad():
+        traced = torch.jit.trace(
+            _TraceableMaskRCNN(model, cfg.INPUT.FORMAT),
+            (torch.from_numpy(sample),),
+            check_trace=False,
+        )
+    traced = torch.jit.freeze(traced.eval())
+
+    os.makedirs(os.path.dirname(model_path) or ".", exist_ok=True)
+    torch.jit.save(traced, model_path, _extra_files={INPUT_SIZE_FILE: f"{width}x{height}"})
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the Mask R-CNN segmentation model to TorchScript"
+    )
+    parser.add_argument("--cfg-file", required=True)
+    parser.add_argument("--weights-file", required=True)
+    parser.add_argument(
+        "--sample-image", required=True, help="recorded frame the model is traced with"
+    )
+    parser.add_argument(
+        "--model-path", default=PreprocessingConfig(use_ml=False).segmentation_model_path
+    )
+    parser.add_argument(
+        "--input-size",
+        nargs=2,
+        type=int,
+        default=list(PreprocessingConfig(use_ml=False).segmentation_input_size),
+        metavar=("WIDTH", "HEIGHT"),
+    )
+    args = parser.parse_args()
+
+    config = PreprocessingConfig(
+        use_ml=True,
+        cfg_file=args.cfg_file,
+        weights_file=args.weights_file,
+        segmentation_input_size=tuple(args.input_size),
+    )
+    export_torchscript(config, args.model_path, cv2.imread(args.sample_image))
+    print(f"Exported to {args.model_path}")
+
+
+if __name__ == "__main__":
+    main()
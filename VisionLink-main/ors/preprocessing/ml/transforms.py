@@ -0,0 +1,59 @@
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ors.common.color import BGR, convert_color
+
+
+def fit_to_input(
+    image: np.ndarray, input_size: Tuple[int, int], color_order: str, out: np.ndarray
+) -> Tuple[int, int]:
+    # resizes the frame into the (width, height) input keeping its aspect ratio,
+    # the rest of out is black; returns the (height, width) covered by the frame
+    width, height = input_size
+    scale = min(width / image.shape[1], height / image.shape[0])
+    resized_height = min(height, round(image.shape[0] * scale))
+    resized_width = min(width, round(image.shape[1] * scale))
+    resized = cv2.resize(image, (resized_width, resized_height), interpolation=cv2.INTER_AREA)
+    out.fill(0)
+    out[:resized_height, :resized_width] = convert_color(resized, color_order, BGR)
+    return resized_height, resized_width
+
+
+def downscale_shorter_side(image: np.ndarray, size: Optional[int]) -> np.ndarray:
+    # frames whose shorter side is already at most size are returned unchanged
+    if size is None or min(image.shape[:2]) <= size:
+        return image
+    scale = size / min(image.shape[:2])
+    return cv2.resize(
+        image,
+        (round(image.shape[1] * scale), round(image.shape[0] * scale)),
+        interpolation=cv2.INTER_AREA,
+    )
+
+
+def paste_mask(
+    mask_probabilities: np.ndarray, box: np.ndarray, image_shape, threshold: float = 0.5
+) -> np.ndarray:
+    # single mask version of detectron2's paste_masks_in_image: scales the
+    # (M, M) mask probabilities into the box and thresholds them
+    x0, y0, x1, y1 = box
+    mask_height, mask_width = mask_probabilities.shape
+    scale_x, scale_y = (x1 - x0) / mask_width, (y1 - y0) / mask_height
+    transform = np.array(
+        [
+            [scale_x, 0, x0 + 0.5 * scale_x - 0.5],
+            [0, scale_y, y0 + 0.5 * scale_y - 0.5],
+        ],
+        dtype=np.float32,
+    )
+    pasted = cv2.warpAffine(
+        mask_probabilities.astype(np.float32),
+        transform,
+        (image_shape[1], image_shape[0]),
+        flags=cv2.INTER_LINEAR,
+        borderMode=cv2.BORDER_CONSTANT,
+        borderValue=0,
+    )
+    return pasted > threshold
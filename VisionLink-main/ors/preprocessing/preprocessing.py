@@ -1,12 +1,18 @@
 import time
+from typing import Optional
 
 import numpy as np
-import cv2
-from detectron2.engine import DefaultPredictor
-from detectron2.config import get_cfg
 
 from ors.common import logger
-from ors.preprocessing.ml.printjob_extraction import extract_printjob_from_mask
+from ors.common.color import BGR
+from ors.preprocessing.classical.document_detection import detect_document
+from ors.preprocessing.datatypes import Segmenter
+from ors.preprocessing.ml.printjob_extraction import quadrilateral_from_mask
+from ors.preprocessing.tracking import CornerTracker
+from ors.preprocessing.utils import (
+    extract_printjob_from_quadrilateral,
+    warp_quadrilateral,
+)
 
 logger = logger.get_logger(__name__)
 
@@ -14,43 +20,60 @@ logger = logger.get_logger(__name__)
 class ImagePreprocessing:
     def __init__(self, config) -> None:
         self.config = config
+        self.segmenter: Optional[Segmenter] = None
+        self.classical_frames = 0
+        self.ml_fallbacks = 0
+        self.tracker = CornerTracker(config) if config.tracking else None
 
-        self._init_ml()
+        # loaded here, loading on the first frame would stall the capture loop
+        if self.config.use_ml or (self.config.ml_fallback and self._segmentation_configured()):
+            self._init_ml()
+
+    def _segmentation_configured(self) -> bool:
+        return (
+            self.config.segmentation_backend == "torchscript" or self.config.cfg_file is not None
+        )
 
     def _init_ml(self):
-        # load model
-        cfg = get_cfg()
-        cfg.merge_from_file(self.config.cfg_file)
-        cfg.MODEL.WEIGHTS = self.config.weights_file
+        # torch and detectron2 are only imported once the model is needed
+        from ors.preprocessing.ml.segmentation import (
+            DefaultPredictorSegmenter,
+            TorchScriptSegmenter,
+        )
+
+        if self.config.segmentation_backend == "detectron2":
+            self.segmenter = DefaultPredictorSegmenter(self.config)
+        elif self.config.segmentation_backend == "torchscript":
+            logger.warning("The torchscript segmentation backend is experimental")
+            self.segmenter = TorchScriptSegmenter(self.config)
+        else:
+            raise ValueError(
+                f"Unknown segmentation backend '{self.config.segmentation_backend}'"
+            )
 
-        self.predictor = DefaultPredictor(cfg)
+    def segment(self, image: np.ndarray, color_order: str = BGR) -> Optional[np.ndarray]:
+        if self.segmenter is None:
+            logger.info("Loading the segmentation model")
+            self._init_ml()
+        return self.segmenter.segment(image, color_order)
 
-    def preprocess(self, image: np.ndarray) -> np.ndarray:
+    def preprocess(self, image: np.ndarray, color_order: str = BGR) -> np.ndarray:
+        # returns the rectified printjob in the channel order of the frame, or
+        # the frame itself if no printjob was found
 
         start_time = time.time()
 
-        bgr_image = image[:, :, [2, 1, 0]]
-
-        ## INFERENCE
-        bgr_image_shape = bgr_image.shape
-        ratio = bgr_image_shape[0] / bgr_image_shape[1]
-        downsized_image = cv2.resize(bgr_image, (int(512 * ratio), 512))
-        downsized_image = bgr_image
-        output = self.predictor(downsized_image)
-
-        if output is None:
-            return image
-
-        masks = output["instances"].pred_masks
-        if len(masks) < 1:
-            return image
-
-        mask = masks[0].cpu().numpy()
-
-        if mask is None:
-            return image
+        quadrilateral_points = None
+        if self.tracker is not None:
+            quadrilateral_points = self.tracker.track(image, color_order)
+        if quadrilateral_points is None:
+            quadrilateral_points = self.detect(image, color_order)
+            if self.tracker is not None:
+                self.tracker.detected(quadrilateral_points)
 
-        preprocessed_image = extract_printjob_from_mask(mask=mask, image=bgr_image)
+        preprocessed_image = None
+        if quadrilateral_points is not None:
+            preprocessed_image = self._rectify(quadrilateral_points, image)
 
         end_time = time.time()
         elapsed_time_ms = (end_time - start_time) * 1000
@@ -59,4 +82,43 @@ class ImagePreprocessing:
         if preprocessed_image is None:
             return image
         else:
-            return preprocessed_image[:, :, [2, 1, 0]]
\ No newline at end of file
+            return preprocessed_image
+
+    def detect(self, image: np.ndarray, color_order: str = BGR) -> Optional[list]:
+        # corner points of the printjob in image coordinates, None if none was found
+        if self.config.use_ml:
+            return self._detect_with_ml(image, color_order)
+        return self._detect_classical(image, color_order)
+
+    def _detect_with_ml(self, image: np.ndarray, color_order: str) -> Optional[list]:
+        ## INFERENCE
+        mask = self.segment(image, color_order)
+        if mask is None:
+            return None
+
+        # the low resolution mask is scaled to the full resolution image
+        return quadrilateral_from_mask(mask, image.shape)
+
+    def _detect_classical(self, image: np.ndarray, color_order: str) -> Optional[list]:
+        self.classical_frames += 1
+        detection = detect_document(image, color_order=color_order)
+        if (
+            detection is not None
+            and detection.confidence >= self.config.classical_min_confidence
+        ):
+            return detection.points
+
+        if not self.config.ml_fallback or not self._segmentation_configured():
+            return None
+        self.ml_fallbacks += 1
+        logger.debug(
+            f"Classical detection confidence "
+            f"{0 if detection is None else detection.confidence:.2f}, falling back to "
+            f"segmentation ({self.ml_fallbacks}/{self.classical_frames} frames)"
+        )
+        return self._detect_with_ml(image, color_order)
+
+    def _rectify(self, quadrilateral_points: list, image: np.ndarray) -> np.ndarray:
+        if self.config.rectification == "perspective":
+            return warp_quadrilateral(image, quadrilateral_points, self.config.rectified_size)
+        return extract_printjob_from_quadrilateral(quadrilateral_points, image)
@@ -0,0 +1,120 @@
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+from ors.common import logger
+from ors.common.color import to_grey
+from ors.preprocessing.config import PreprocessingConfig
+
+logger = logger.get_logger(__name__)
+
+
+class CornerTracker:
+    # Follows the corners of the last detected printjob with pyramidal
+    # Lucas-Kanade optical flow on downsized grey frames. A track is only
+    # accepted if every corner flows back to where it started (forward-backward
+    # check) and the quadrilateral stays convex with about the detected area,
+    # otherwise and every redetect_interval frames the sheet is detected again.
+    def __init__(self, config: PreprocessingConfig) -> None:
+        self.config = config
+        self.frames = 0
+        self.tracked = 0
+        self.lost = 0
+        self._grey: Optional[np.ndarray] = None
+        self._scale = 1.0
+        self._previous_grey: Optional[np.ndarray] = None
+        self._corners: Optional[np.ndarray] = None
+        self._detected_area = 0.0
+        self._frames_since_detection = 0
+
+    @property
+    def skip_rate(self) -> float:
+        # fraction of the frames that did not need a detection
+        return self.tracked / self.frames if self.frames else 0.0
+
+    def track(self, image: np.ndarray, color_order: str) -> Optional[List[List[int]]]:
+        # corner points in image coordinates, None if the sheet has to be detected
+        self.frames += 1
+        self._scale = min(1.0, self.config.tracking_size / min(image.shape[:2]))
+        grey = to_grey(image, color_order)
+        if self._scale < 1:
+            # INTER_AREA costs several times more at non-integer ratios, the
+            # flow pyramid doesn't need it
+            grey = cv2.resize(
+                grey,
+                (round(grey.shape[1] * self._scale), round(grey.shape[0] * self._scale)),
+                interpolation=cv2.INTER_LINEAR,
+            )
+        self._grey = grey
+
+        corners = None
+        if (
+            self._corners is not None
+            and self._frames_since_detection < self.config.tracking_redetect_interval
+        ):
+            corners = self._flow(self._previous_grey, grey, self._corners)
+            if corners is None:
+                self.lost += 1
+                self._corners = None
+
+        if corners is not None:
+            self.tracked += 1
+            self._frames_since_detection += 1
+            self._previous_grey = grey
+            self._corners = corners
+
+        if self.frames % self.config.tracking_log_interval == 0:
+            logger.info(
+                f"Corner tracking: segmentation skipped for {self.tracked}/{self.frames} "
+                f"frames (skip rate {self.skip_rate:.2f}), {self.lost} tracks lost"
+            )
+        if corners is None:
+            return None
+        return np.round(corners / self._scale).astype(np.int32).tolist()
+
+    def detected(self, points: Optional[list]) -> None:
+        # the detection of the frame passed to the last track call, None if
+        # nothing was found
+        if points is None:
+            self._corners = None
+            return
+        self._corners = np.asarray(points, dtype=np.float32) * self._scale
+        self._detected_area = abs(cv2.contourArea(self._corners))
+        self._previous_grey = self._grey
+        self._frames_since_detection = 0
+
+    def _flow(
+        self, previous_grey: np.ndarray, grey: np.ndarray, corners: np.ndarray
+    ) -> Optional[np.ndarray]:
+        window = (self.config.tracking_window, self.config.tracking_window)
+        points = corners.reshape(-1, 1, 2)
+        forward, status, _ = cv2.calcOpticalFlowPyrLK(
+            previous_grey, grey, points, None, winSize=window, maxLevel=3
+        )
+        if forward is None or not status.all():
+            return None
+        backward, status, _ = cv2.calcOpticalFlowPyrLK(
+            grey, previous_grey, forward, None, winSize=window, maxLevel=3
+        )
+        if backward is None or not status.all():
+            return None
+        if np.linalg.norm(backward - points, axis=2).max() > self.config.tracking_max_error:
+            return None
+
+        tracked = forward.reshape(-1, 2)
+        height, width = grey.shape[:2]
+        if (
+            (tracked < 0).any()
+            or (tracked[:, 0] > width - 1).any()
+            or (tracked[:, 1] > height - 1).any()
+        ):
+            return None
+        if not cv2.isContourConvex(tracked):
+            return None
+        area_ratio = abs(cv2.contourArea(tracked)) / max(self._detected_area, 1.0)
+        if not 1 / self.config.tracking_max_area_change <= area_ratio <= (
+            self.config.tracking_max_area_change
+        ):
+            return None
+        return tracked
@@ -1,4 +1,5 @@
 import math
+from typing import List, Optional, Tuple
 
 import cv2
 import numpy as np
@@ -79,4 +80,64 @@ def crop_quadrilateral_with_padding(image, points, padding=1):
     # Crop the image
     crop = image[y_min:y_max, x_min:x_max]
 
-    return crop
\ No newline at end of file
+    return crop
+
+
+def extract_printjob_from_quadrilateral(
+    quadrilateral_points: list, image: np.ndarray
+) -> np.ndarray:
+
+    angle = angle_of_quadrilateral(quadrilateral_points)
+    rotated_image, rotated_points = rotate_image_and_points(
+        image, angle, quadrilateral_points
+    )
+    cropped_printjob = crop_quadrilateral_with_padding(rotated_image, rotated_points)
+
+    return cropped_printjob
+
+
+def order_corners(points: np.ndarray) -> List[List[int]]:
+    # top-left, top-right, bottom-right, bottom-left: clockwise by the angle
+    # around the centroid, which keeps four distinct corners for any rotation,
+    # starting at the corner closest to the top-left
+    points = np.asarray(points, dtype=np.float32)
+    center = points.mean(axis=0)
+    clockwise = points[
+        np.argsort(np.arctan2(points[:, 1] - center[1], points[:, 0] - center[0]), kind="stable")
+    ]
+    start = int(np.argmin(clockwise.sum(axis=1)))
+    ordered = np.roll(clockwise, -start, axis=0)
+    return [[int(x), int(y)] for x, y in np.round(ordered)]
+
+
+def warp_quadrilateral(
+    image: np.ndarray, points, size: Optional[Tuple[int, int]] = None
+) -> Optional[np.ndarray]:
+    # One perspective warp from the four corners to an upright image of the
+    # given (width, height), e.g. the input size of the feature extractor.
+    # Without a size the sheet keeps its resolution in the frame. None if the
+    # corners don't span a quadrilateral, the transform would be garbage.
+    corners = np.array(order_corners(points), dtype=np.float32)
+    if len(corners) != 4 or abs(cv2.contourArea(corners)) < 1:
+        return None
+    if size is None:
+        top_left, top_right, bottom_right, bottom_left = corners
+        width = max(
+            np.linalg.norm(top_right - top_left), np.linalg.norm(bottom_right - bottom_left)
+        )
+        height = max(
+            np.linalg.norm(bottom_left - top_left), np.linalg.norm(bottom_right - top_right)
+        )
+        size = (max(int(round(width)), 1), max(int(round(height)), 1))
+    width, height = size
+    target = np.array(
+        [[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype=np.float32
+    )
+    transform = cv2.getPerspectiveTransform(corners, target)
+    return cv2.warpPerspective(
+        image,
+        transform,
+        (width, height),
+        flags=cv2.INTER_LINEAR,
+        borderValue=(255, 255, 255),
+    )
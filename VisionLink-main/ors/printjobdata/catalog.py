@@ -0,0 +1,216 @@
+import threading
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Set
+
+import cv2
+import numpy as np
+
+from ors.common import logger
+from ors.common.color import BGR, RGB, convert_color
+from ors.common.concurrency import threaded_map
+from ors.feature_extraction.cache import FeatureCache
+from ors.feature_extraction.datatypes import FeatureExtractor
+from ors.feature_extraction.projection import FeatureProjection
+from ors.printjobdata.datatypes import (
+    ExternalPrintjob,
+    Printjob,
+    PrintjobChanges,
+    PrintjobRepository,
+)
+from ors.printjobdata.images import PrintjobImageStore
+
+logger = logger.get_logger(__name__)
+
+
+@dataclass
+class _LoadedPrintjob:
+    printjob: Printjob
+    image_file: bytes
+    image_rgb: Optional[np.ndarray]
+
+
+class PrintjobFeatureLoader:
+    # Reading, cache lookups and decoding run on num_threads threads and stream
+    # into batched feature extraction, so I/O, decoding and inference overlap
+    def __init__(
+        self,
+        feature_extractor: FeatureExtractor,
+        feature_cache: Optional[FeatureCache] = None,
+        image_store: Optional[PrintjobImageStore] = None,
+        num_threads: int = 4,
+        batch_size: int = 16,
+        projection: Optional[FeatureProjection] = None,
+    ) -> None:
+        self.feature_extractor = feature_extractor
+        # the cache holds unprojected features, a new projection reuses them
+        self.feature_cache = feature_cache
+        self.projection = projection
+        self.image_store = image_store
+        self.num_threads = num_threads
+        self.batch_size = batch_size
+        self.cache_hits = 0
+
+    def load(self, external_printjobs: Iterable[ExternalPrintjob]) -> List[Printjob]:
+        printjobs = []
+        batch: List[_LoadedPrintjob] = []
+        for loaded in threaded_map(self._read, external_printjobs, self.num_threads):
+            printjobs.append(loaded.printjob)
+            if loaded.printjob.features is not None:
+                self.cache_hits += 1
+                continue
+            batch.append(loaded)
+            if len(batch) >= self.batch_size:
+                self._extract(batch)
+                batch = []
+        if batch:
+            self._extract(batch)
+        self.apply_projection(printjobs)
+        return printjobs
+
+    def apply_projection(self, printjobs: List[Printjob]) -> None:
+        if self.projection is None or not printjobs:
+            return
+        projected = self.projection.apply(np.stack([job.features for job in printjobs]))
+        for job, job_features in zip(printjobs, projected):
+            job.features = job_features
+
+    def _extract(self, batch: List[_LoadedPrintjob]) -> None:
+        features = self.feature_extractor.extract_features_batch(
+            [loaded.image_rgb for loaded in batch]
+        )
+        for loaded, job_features in zip(batch, features):
+            loaded.printjob.features = job_features
+            if self.feature_cache is not None:
+                self.feature_cache.put(loaded.image_file, job_features)
+
+    def _read(self, ext_job: ExternalPrintjob) -> _LoadedPrintjob:
+        pj = Printjob(
+            ext_job.printjob_number,
+            image_file=None,
+            file_type=ext_job.file_type,
+            features=None,
+            image_path=ext_job.image_path,
+        )
+        # the image bytes are only held while the features are computed
+        image_file = ext_job.image_file or pj.load_image_file()
+        if self.feature_cache is not None:
+            pj.features = self.feature_cache.get(image_file)
+        if pj.features is not None:
+            return _LoadedPrintjob(pj, image_file, None)
+
+        image_bgr = cv2.imdecode(
+            np.frombuffer(image_file, dtype=np.uint8), cv2.IMREAD_COLOR
+        )
+        if self.image_store is not None:
+            self.image_store.precompute_thumbnail(pj, image_bgr)
+        image_rgb = convert_color(image_bgr, BGR, RGB)
+        return _LoadedPrintjob(pj, image_file, image_rgb)
+
+
+class PrintjobCatalogUpdater:
+    # Applies directory changes to a repository that is in use. Features are
+    # extracted without holding the catalog lock, the repository and its index
+    # are then updated under the lock, which the pipeline also holds between
+    # matching and fetching the matched printjob.
+    def __init__(
+        self,
+        repository: PrintjobRepository,
+        feature_loader: PrintjobFeatureLoader,
+        catalog_lock: threading.RLock,
+        on_updated: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.repository = repository
+        self.feature_loader = feature_loader
+        self.catalog_lock = catalog_lock
+        self.on_updated = on_updated
+        self._rejected: Set[int] = set()
+
+    def apply(self, changes: PrintjobChanges) -> PrintjobChanges:
+        # returns the changes that were not applied, the watcher reports them again
+        failed = PrintjobChanges()
+        if changes.is_empty():
+            return failed
+        added = self._load(changes.added, failed.added)
+        changed = self._load(changes.changed, failed.changed)
+        ext_jobs = {
+            ext_job.printjob_number: ext_job for ext_job in changes.added + changes.changed
+        }
+        applied = 0
+        with self.catalog_lock:
+            # additions are applied even if the repository rejects some of the
+            # changes and removals
+            try:
+                self.repository.add_all(added)
+                applied += len(added)
+                self._rejected.difference_update(job.printjob_number for job in added)
+            except (NotImplementedError, ValueError):
+                for printjob in added:
+                    if self._apply_job(
+                        "add", printjob.printjob_number, self.repository.add, printjob
+                    ):
+                        applied += 1
+                    else:
+                        failed.added.append(ext_jobs[printjob.printjob_number])
+            for printjob in changed:
+                if self._apply_job(
+                    "replace", printjob.printjob_number, self.repository.add, printjob
+                ):
+                    applied += 1
+                else:
+                    failed.changed.append(ext_jobs[printjob.printjob_number])
+            for printjob_id in changes.removed:
+                if self._apply_job("remove", printjob_id, self.repository.remove, printjob_id):
+                    applied += 1
+                else:
+                    failed.removed.append(printjob_id)
+        if not applied:
+            return failed
+        image_store = self.feature_loader.image_store
+        if image_store is not None:
+            # the display would otherwise keep showing the cached old images
+            failed_numbers = {ext_job.printjob_number for ext_job in failed.changed}
+            failed_numbers.update(failed.removed)
+            for printjob_number in [job.printjob_number for job in changed] + changes.removed:
+                if printjob_number not in failed_numbers:
+                    image_store.invalidate(printjob_number)
+        logger.info(
+            f"Catalog updated: {len(added) - len(failed.added)} added, "
+            f"{len(changed) - len(failed.changed)} changed, "
+            f"{len(changes.removed) - len(failed.removed)} removed"
+        )
+        if self.on_updated is not None:
+            self.on_updated()
+        return failed
+
+    def _load(
+        self, ext_jobs: List[ExternalPrintjob], failed: List[ExternalPrintjob]
+    ) -> List[Printjob]:
+        if not ext_jobs:
+            return []
+        try:
+            return self.feature_loader.load(ext_jobs)
+        except Exception:
+            if len(ext_jobs) == 1:
+                printjob_id = ext_jobs[0].printjob_number
+                if printjob_id not in self._rejected:
+                    logger.exception(f"Couldn't load printjob {printjob_id}")
+                    self._rejected.add(printjob_id)
+                failed.append(ext_jobs[0])
+                return []
+        # one unreadable file fails the whole batch, the others are loaded one by one
+        printjobs = []
+        for ext_job in ext_jobs:
+            printjobs.extend(self._load([ext_job], failed))
+        return printjobs
+
+    def _apply_job(self, action: str, printjob_id: int, function, *args) -> bool:
+        try:
+            function(*args)
+        except (NotImplementedError, ValueError, KeyError) as e:
+            # logged once, the watcher keeps reporting the job until it is applied
+            if printjob_id not in self._rejected:
+                logger.warning(f"Couldn't {action} printjob {printjob_id}: {e}")
+                self._rejected.add(printjob_id)
+            return False
+        self._rejected.discard(printjob_id)
+        return True
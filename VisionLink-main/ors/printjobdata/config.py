@@ -1,10 +1,32 @@
-from pydantic import BaseSettings
+from typing import Optional
+
+from pydantic import BaseSettings, validator
 
 
 class PrintjobLoaderConfig(BaseSettings):
     printjobs_directory: str
     printjobs_filetype: str
+    # threads reading and decoding printjob images while the catalog is loaded
+    loader_threads: int = 4
 
 
 class PrintjobdataConfig(BaseSettings):
     printjobloader: PrintjobLoaderConfig
+    repository: str = "memory"  # "memory", "memmap" or "sqlite"
+    # directory of the persisted catalog, required for memmap and sqlite
+    repository_directory: Optional[str] = None
+    # decoded printjob images kept in memory for display
+    image_cache_bytes: int = 64 * 2**20
+    # precomputed display thumbnails, disabled if not set
+    thumbnail_directory: Optional[str] = None
+    thumbnail_size: int = 540
+    # polling interval for new, changed and removed printjobs, disabled if not set
+    watch_interval_s: Optional[float] = None
+
+    @validator("repository_directory", always=True)
+    def _require_repository_directory(cls, value, values):
+        if value is None and values.get("repository") in ("memmap", "sqlite"):
+            raise ValueError(
+                f"the {values['repository']} repository needs a repository_directory"
+            )
+        return value
@@ -1,15 +1,18 @@
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from typing import Dict, List, Optional
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
 
 import numpy as np
 
+from ors.similarity.datatypes import FeatureIndex
+
 
 @dataclass
 class ExternalPrintjob:
     printjob_number: int
     image_file: Optional[bytes]
     file_type: Optional[str]
+    image_path: Optional[str] = None
 
 
 @dataclass
@@ -18,6 +21,26 @@ class Printjob:
     image_file: Optional[bytes]
     file_type: Optional[str]
     features: Optional[np.ndarray]
+    # image_file may be left empty, the bytes are then read from image_path on demand
+    image_path: Optional[str] = None
+
+    def load_image_file(self) -> Optional[bytes]:
+        if self.image_file is not None:
+            return self.image_file
+        if self.image_path is None:
+            return None
+        with open(self.image_path, "rb") as image_file:
+            return image_file.read()
+
+
+@dataclass
+class PrintjobChanges:
+    added: List[ExternalPrintjob] = field(default_factory=list)
+    changed: List[ExternalPrintjob] = field(default_factory=list)
+    removed: List[int] = field(default_factory=list)
+
+    def is_empty(self) -> bool:
+        return not (self.added or self.changed or self.removed)
 
 
 class PrintjobRepository(ABC):
@@ -29,10 +52,26 @@ class PrintjobRepository(ABC):
     def add(self, printjob: Printjob) -> Printjob:
         pass
 
+    @abstractmethod
+    def remove(self, printjob_id: int) -> None:
+        pass
+
+    def add_all(self, printjobs: Iterable[Printjob]) -> None:
+        for printjob in printjobs:
+            self.add(printjob)
+
     @abstractmethod
     def get_all(self) -> List[Printjob]:
         pass
 
+    @abstractmethod
+    def get_all_printjob_numbers(self) -> List[int]:
+        pass
+
     @abstractmethod
     def get_all_printjob_features(self) -> Dict[int, np.ndarray]:
         pass
+
+    @abstractmethod
+    def get_feature_index(self) -> FeatureIndex:
+        pass
@@ -0,0 +1,135 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+import cv2
+import numpy as np
+
+from ors.common import logger
+from ors.printjobdata.datatypes import Printjob
+
+logger = logger.get_logger(__name__)
+
+
+class DecodedImageCache:
+    # LRU cache of decoded images bounded by the total number of pixel bytes
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._images: "OrderedDict[Hashable, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+            return image
+
+    def put(self, key: Hashable, image: np.ndarray) -> None:
+        if image.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._images.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous.nbytes
+            self._images[key] = image
+            self.current_bytes += image.nbytes
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._images.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+
+    def remove(self, key: Hashable) -> None:
+        with self._lock:
+            image = self._images.pop(key, None)
+            if image is not None:
+                self.current_bytes -= image.nbytes
+
+
+class PrintjobImageStore:
+    # Loads printjob images for display. Full resolution images are decoded on
+    # demand and kept in a size bounded LRU cache. If a thumbnail directory is
+    # configured, downscaled copies are written there once and reused later on.
+    def __init__(
+        self,
+        max_cache_bytes: int = 64 * 2**20,
+        thumbnail_directory: Optional[str] = None,
+        thumbnail_size: int = 540,
+    ) -> None:
+        self.cache = DecodedImageCache(max_cache_bytes)
+        self.thumbnail_directory = thumbnail_directory
+        self.thumbnail_size = thumbnail_size
+        if thumbnail_directory is not None:
+            os.makedirs(thumbnail_directory, exist_ok=True)
+
+    def get_image(self, printjob: Printjob) -> Optional[np.ndarray]:
+        key = ("image", printjob.printjob_number)
+        image = self.cache.get(key)
+        if image is None:
+            image = self._decode(printjob)
+            if image is not None:
+                self.cache.put(key, image)
+        return image
+
+    def get_thumbnail(self, printjob: Printjob) -> Optional[np.ndarray]:
+        key = ("thumbnail", printjob.printjob_number)
+        thumbnail = self.cache.get(key)
+        if thumbnail is not None:
+            return thumbnail
+
+        thumbnail_path = self._thumbnail_path(printjob)
+        if thumbnail_path is not None and self._is_up_to_date(thumbnail_path, printjob):
+            thumbnail = cv2.imread(thumbnail_path, cv2.IMREAD_COLOR)
+        if thumbnail is None:
+            image = self._decode(printjob)
+            if image is None:
+                return None
+            thumbnail = self._downscale(image)
+            if thumbnail_path is not None:
+                cv2.imwrite(thumbnail_path, thumbnail)
+        self.cache.put(key, thumbnail)
+        return thumbnail
+
+    def invalidate(self, printjob_number: int) -> None:
+        # for changed and removed printjobs, the thumbnail file is checked
+        # against the image modification time when it is loaded again
+        self.cache.remove(("image", printjob_number))
+        self.cache.remove(("thumbnail", printjob_number))
+
+    def precompute_thumbnail(self, printjob: Printjob, image: np.ndarray) -> None:
+        # used while loading the catalog, where the image is decoded anyway
+        thumbnail_path = self._thumbnail_path(printjob)
+        if thumbnail_path is None or self._is_up_to_date(thumbnail_path, printjob):
+            return
+        cv2.imwrite(thumbnail_path, self._downscale(image))
+
+    def _decode(self, printjob: Printjob) -> Optional[np.ndarray]:
+        image_file = printjob.load_image_file()
+        if image_file is None:
+            logger.warning(f"No image available for printjob {printjob.printjob_number}")
+            return None
+        return cv2.imdecode(np.frombuffer(image_file, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+    def _downscale(self, image: np.ndarray) -> np.ndarray:
+        scale = self.thumbnail_size / max(image.shape[:2])
+        if scale >= 1:
+            return image
+        size = (round(image.shape[1] * scale), round(image.shape[0] * scale))
+        return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+    def _thumbnail_path(self, printjob: Printjob) -> Optional[str]:
+        if self.thumbnail_directory is None:
+            return None
+        return os.path.join(
+            self.thumbnail_directory,
+            f"{printjob.printjob_number}_{self.thumbnail_size}.jpg",
+        )
+
+    @staticmethod
+    def _is_up_to_date(thumbnail_path: str, printjob: Printjob) -> bool:
+        if not os.path.exists(thumbnail_path):
+            return False
+        if printjob.image_path is None or not os.path.exists(printjob.image_path):
+            return True
+        return os.path.getmtime(thumbnail_path) >= os.path.getmtime(printjob.image_path)
@@ -1,7 +1,8 @@
 import glob
 import os
 from abc import ABC
-from typing import List, Optional
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
 
 from ors.printjobdata.config import PrintjobLoaderConfig
 from ors.printjobdata.datatypes import ExternalPrintjob
@@ -11,67 +12,99 @@ from ors.common import logger
 logger = logger.get_logger(__name__)
 
 
+@dataclass
+class PrintjobDirectoryScan:
+    # image file of every printjob directory, the first one by name if several exist
+    image_files: Dict[int, os.DirEntry] = field(default_factory=dict)
+    unknown_paths: List[str] = field(default_factory=list)
+    empty_printjob_dirs: List[str] = field(default_factory=list)
+
+
+def scan_printjob_directory(
+    printjobs_directory: str, printjobs_filetype: str
+) -> PrintjobDirectoryScan:
+    # one os.scandir pass over the printjob directory and every printjob directory
+    scan = PrintjobDirectoryScan()
+    suffix = f".{printjobs_filetype}"
+    with os.scandir(printjobs_directory) as entries:
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if not (entry.name.isnumeric() and entry.is_dir()):
+                scan.unknown_paths.append(entry.path)
+                continue
+            with os.scandir(entry.path) as files:
+                images = [file for file in files if file.name.endswith(suffix)]
+            if not images:
+                scan.empty_printjob_dirs.append(entry.path)
+                continue
+            scan.image_files[int(entry.name)] = min(images, key=lambda file: file.name)
+    return scan
+
+
 class FileSystemPrintjobProvider(ABC):
     def __init__(self, config: PrintjobLoaderConfig) -> None:
         super().__init__()
         self.printjobs_directory = config.printjobs_directory
         self.printjobs_filetype = config.printjobs_filetype
-        self.printjob_directory_filter = (
-            lambda path: os.path.isdir(path) and os.path.basename(path).isnumeric()
-        )
+        self._last_scan: Optional[PrintjobDirectoryScan] = None
         self.validate_directory_structure()
 
+    def scan(self) -> PrintjobDirectoryScan:
+        return scan_printjob_directory(self.printjobs_directory, self.printjobs_filetype)
+
     def validate_directory_structure(self):
         if not os.path.exists(self.printjobs_directory):
             raise Exception(
-                "Given printjob directory '{self.printjobs_directory}' does not exist"
+                f"Given printjob directory '{self.printjobs_directory}' does not exist"
             )
-        paths = glob.glob(os.path.join(self.printjobs_directory, "*"))
-        if len(paths) == 0:
+        scan = self.scan()
+        if not (scan.image_files or scan.unknown_paths or scan.empty_printjob_dirs):
             raise Exception(f"Printjob directory '{self.printjobs_directory}' is empty")
-        unknown_paths = [
-            path for path in paths if not self.printjob_directory_filter(path)
-        ]
-        if unknown_paths:
+        if scan.unknown_paths:
             raise Exception(
-                f"The following files/directories are skipped when reading printjob directory: {unknown_paths}"
+                f"The following files/directories are skipped when reading printjob directory: {scan.unknown_paths}"
             )
-        empty_printjob_dirs = [
-            path
-            for path in paths
-            if self.printjob_directory_filter(path)
-            and len(glob.glob(os.path.join(path, f"*.{self.printjobs_filetype}"))) == 0
-        ]
-        if empty_printjob_dirs:
+        if scan.empty_printjob_dirs:
             raise Exception(
-                f"No files of type '{self.printjobs_filetype}' found in the following printjob dirs: {empty_printjob_dirs}"
+                f"No files of type '{self.printjobs_filetype}' found in the following printjob dirs: {scan.empty_printjob_dirs}"
             )
+        # the next get_all_printjobs call reuses this scan instead of walking the tree again
+        self._last_scan = scan
 
     def get_all_printjobs(self, load_files=True) -> List[ExternalPrintjob]:
-        paths = glob.glob(os.path.join(self.printjobs_directory, "*"))
+        scan, self._last_scan = self._last_scan or self.scan(), None
 
-        logger.info(f"Found {len(paths)} external printjobs:")
-        logger.info(paths)
+        logger.info(f"Found {len(scan.image_files)} external printjobs")
 
-        printjob_dirs = [path for path in paths if self.printjob_directory_filter(path)]
         printjobs = []
-        for path in printjob_dirs:
-            printjob_number = os.path.basename(path)
-            image_file_paths = glob.glob(
-                os.path.join(path, f"*.{self.printjobs_filetype}")
-            )
-            image_file_path = image_file_paths[0]
+        for printjob_number, image_file_entry in scan.image_files.items():
             image_file_content = None
             if load_files:
-                with open(image_file_path, "rb") as image_file:
+                with open(image_file_entry.path, "rb") as image_file:
                     image_file_content = image_file.read()
             printjobs.append(
                 ExternalPrintjob(
-                    printjob_number, image_file_content, self.printjobs_filetype
+                    printjob_number,
+                    image_file_content,
+                    self.printjobs_filetype,
+                    image_path=image_file_entry.path,
                 )
             )
         return printjobs
 
+    def get_image_path_by_printjobnumber(self, printjob_number: int) -> Optional[str]:
+        paths = glob.glob(
+            os.path.join(
+                self.printjobs_directory,
+                str(printjob_number),
+                f"*.{self.printjobs_filetype}",
+            )
+        )
+        if len(paths) == 0:
+            return None
+        return min(paths)
+
     def load_pdf_by_printjobnumber(
         self, printjob_number: int
     ) -> Optional[ExternalPrintjob]:
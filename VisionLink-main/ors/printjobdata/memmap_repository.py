@@ -0,0 +1,236 @@
+import json
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from ors.common import logger
+from ors.printjobdata.datatypes import Printjob, PrintjobRepository
+from ors.similarity.datatypes import FeatureIndex
+from ors.similarity.exact import ExactFeatureIndex
+
+logger = logger.get_logger(__name__)
+
+META_FILE = "meta.json"
+FEATURES_FILE = "features.f32"
+SQ_NORMS_FILE = "sq_norms.f32"
+IDS_FILE = "ids.i64"
+# one byte per row, 0 once the row was removed or replaced
+VALID_FILE = "valid.u8"
+
+
+class MemmapPrintjobRepository(PrintjobRepository):
+    # Keeps the catalog feature matrix in raw row-major files that are opened
+    # with np.memmap, opening the repository does not read the features and
+    # processes on the same host share the pages through the OS page cache.
+    #
+    # New rows are appended to the data files first, afterwards meta.json is
+    # atomically replaced with the new row count. Rows beyond the count in
+    # meta.json are leftovers of an interrupted append and get truncated by the
+    # next append. Any number of processes may read, only one may append.
+    #
+    # Removed and replaced rows stay in the files and are marked invalid, a
+    # replacement is appended as a new row. The in-place search needs a
+    # contiguous matrix, once rows were removed the valid rows are copied into
+    # the index.
+    def __init__(
+        self,
+        directory: str,
+        model_identity: str = "",
+        file_type: Optional[str] = None,
+        image_path_resolver: Optional[Callable[[int], Optional[str]]] = None,
+        index: Optional[FeatureIndex] = None,
+    ) -> None:
+        super().__init__()
+        self.directory = directory
+        self.model_identity = model_identity
+        self.file_type = file_type
+        self.image_path_resolver = image_path_resolver
+        # without an explicit index the memory maps are searched in place
+        self.index = index if index is not None else ExactFeatureIndex()
+        self._zero_copy = index is None
+        self._lock = threading.Lock()
+        self._rows: Optional[Dict[int, int]] = None
+        os.makedirs(directory, exist_ok=True)
+        self._open()
+
+    def get(self, printjob_id: int) -> Printjob:
+        row = self._row_lookup()[printjob_id]
+        image_path = None
+        if self.image_path_resolver is not None:
+            image_path = self.image_path_resolver(printjob_id)
+        return Printjob(
+            printjob_id,
+            image_file=None,
+            file_type=self.file_type,
+            features=self.features[row],
+            image_path=image_path,
+        )
+
+    def add(self, printjob: Printjob) -> Printjob:
+        self.add_all([printjob])
+        return printjob
+
+    def add_all(self, printjobs: Iterable[Printjob]) -> None:
+        printjobs = [job for job in printjobs if job.features is not None]
+        if not printjobs:
+            return
+        ids = np.array([job.printjob_number for job in printjobs], dtype=np.int64)
+        features = np.stack([job.features for job in printjobs]).astype(np.float32)
+        if self.dimension is None:
+            self.dimension = features.shape[1]
+        elif features.shape[1] != self.dimension:
+            raise ValueError(
+                f"Feature dimension {features.shape[1]} does not match repository dimension {self.dimension}"
+            )
+        sq_norms = np.einsum("ij,ij->i", features, features).astype(np.float32)
+
+        with self._lock:
+            self._truncate_to_count()
+            replaced = [
+                self._row_lookup()[printjob_id]
+                for printjob_id in ids.tolist()
+                if printjob_id in self._row_lookup()
+            ]
+            for name, rows in (
+                (FEATURES_FILE, features),
+                (SQ_NORMS_FILE, sq_norms),
+                (IDS_FILE, ids),
+                (VALID_FILE, np.ones(len(ids), dtype=np.uint8)),
+            ):
+                with open(self._path(name), "ab") as data_file:
+                    data_file.write(np.ascontiguousarray(rows).tobytes())
+                    data_file.flush()
+                    os.fsync(data_file.fileno())
+            self._write_meta(self.count + len(ids))
+            # the new rows are valid before the replaced ones are invalidated
+            self._invalidate(replaced)
+            self._map()
+        if not self._zero_copy:
+            self.index.add(ids, features)
+        logger.info(f"Appended {len(ids)} printjobs to '{self.directory}'")
+
+    def remove(self, printjob_id: int) -> None:
+        self.index.remove([printjob_id])
+        with self._lock:
+            row = self._row_lookup().get(printjob_id)
+            if row is None:
+                return
+            self._invalidate([row])
+            self._map()
+
+    def get_all(self) -> List[Printjob]:
+        return [self.get(printjob_id) for printjob_id in self._row_lookup()]
+
+    def get_all_printjob_numbers(self) -> List[int]:
+        return list(self._row_lookup())
+
+    def get_all_printjob_features(self) -> Dict[int, np.ndarray]:
+        return {
+            printjob_id: self.features[row]
+            for printjob_id, row in self._row_lookup().items()
+        }
+
+    def get_feature_index(self) -> FeatureIndex:
+        return self.index
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _open(self) -> None:
+        meta = {}
+        if os.path.exists(self._path(META_FILE)):
+            with open(self._path(META_FILE), "r") as meta_file:
+                meta = json.load(meta_file)
+        if meta and meta.get("model_identity") != self.model_identity:
+            logger.warning(
+                f"Feature matrix in '{self.directory}' was built by another model, discarding it"
+            )
+            meta = {}
+        self.count = meta.get("count", 0)
+        self.dimension = meta.get("dimension")
+        self._add_valid_file()
+        self._map()
+        if not self._zero_copy and self.count:
+            rows = np.flatnonzero(self.valid)
+            self.index.add(self.ids[rows], self.features[rows])
+
+    def _add_valid_file(self) -> None:
+        # directories written before rows could be removed have no valid file
+        if self.count and not os.path.exists(self._path(VALID_FILE)):
+            with open(self._path(VALID_FILE), "wb") as valid_file:
+                valid_file.write(np.ones(self.count, dtype=np.uint8).tobytes())
+                valid_file.flush()
+                os.fsync(valid_file.fileno())
+
+    def _invalidate(self, rows: List[int]) -> None:
+        if not rows:
+            return
+        with open(self._path(VALID_FILE), "r+b") as valid_file:
+            for row in rows:
+                valid_file.seek(row)
+                valid_file.write(b"\0")
+            valid_file.flush()
+            os.fsync(valid_file.fileno())
+
+    def _truncate_to_count(self) -> None:
+        row_sizes = {
+            FEATURES_FILE: 4 * self.dimension,
+            SQ_NORMS_FILE: 4,
+            IDS_FILE: 8,
+            VALID_FILE: 1,
+        }
+        for name, row_size in row_sizes.items():
+            with open(self._path(name), "ab") as data_file:
+                data_file.truncate(self.count * row_size)
+
+    def _map(self) -> None:
+        if self.count == 0:
+            self.features = np.empty((0, self.dimension or 0), dtype=np.float32)
+            self.sq_norms = np.empty(0, dtype=np.float32)
+            self.ids = np.empty(0, dtype=np.int64)
+            self.valid = np.empty(0, dtype=np.uint8)
+        else:
+            self.features = np.memmap(
+                self._path(FEATURES_FILE),
+                dtype=np.float32,
+                mode="r",
+                shape=(self.count, self.dimension),
+            )
+            self.sq_norms = np.memmap(
+                self._path(SQ_NORMS_FILE), dtype=np.float32, mode="r", shape=(self.count,)
+            )
+            self.ids = np.memmap(
+                self._path(IDS_FILE), dtype=np.int64, mode="r", shape=(self.count,)
+            )
+            self.valid = np.memmap(
+                self._path(VALID_FILE), dtype=np.uint8, mode="r", shape=(self.count,)
+            )
+        self._rows = None
+        if self._zero_copy and self.count:
+            if self.valid.all():
+                self.index.attach(self.ids, self.features, self.sq_norms)
+            else:
+                rows = np.flatnonzero(self.valid)
+                self.index.attach(self.ids[rows], self.features[rows], self.sq_norms[rows])
+
+    def _row_lookup(self) -> Dict[int, int]:
+        if self._rows is None:
+            rows = np.flatnonzero(self.valid)
+            self._rows = dict(zip(self.ids[rows].tolist(), rows.tolist()))
+        return self._rows
+
+    def _write_meta(self, count: int) -> None:
+        meta = {
+            "count": count,
+            "dimension": self.dimension,
+            "model_identity": self.model_identity,
+        }
+        tmp_path = self._path(META_FILE + ".tmp")
+        with open(tmp_path, "w") as meta_file:
+            json.dump(meta, meta_file)
+            meta_file.flush()
+            os.fsync(meta_file.fileno())
+        os.replace(tmp_path, self._path(META_FILE))
+        self.count = count
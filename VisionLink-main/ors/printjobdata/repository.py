@@ -1,23 +1,70 @@
-from typing import Dict, List
+import dataclasses
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import numpy as np
 
 from ors.printjobdata.datatypes import Printjob, PrintjobRepository
+from ors.similarity.datatypes import FeatureIndex
+from ors.similarity.exact import ExactFeatureIndex
 
 
 class InMemoryPrintjobRepository(PrintjobRepository):
-    def __init__(self, *args, **kwargs) -> None:
+    def __init__(
+        self,
+        index: Optional[FeatureIndex] = None,
+        keep_features: bool = True,
+        *args,
+        **kwargs,
+    ) -> None:
         super().__init__(*args, **kwargs)
         self.store = {}
+        self.index = index if index is not None else ExactFeatureIndex()
+        # if False the features only live (possibly compressed) in the index
+        self.keep_features = keep_features
 
     def get(self, printjob_id: int) -> Printjob:
         return self.store[printjob_id]
 
     def add(self, printjob: Printjob) -> Printjob:
-        self.store[printjob.printjob_number] = printjob
+        printjob, features = self._store_printjob(printjob)
+        if features is not None:
+            self.index.add([printjob.printjob_number], features[np.newaxis])
+        return printjob
+
+    def add_all(self, printjobs: Iterable[Printjob]) -> None:
+        # one index batch, e.g. a quantising index trains on the first features
+        stored = [self._store_printjob(printjob) for printjob in printjobs]
+        stored = [(job, features) for job, features in stored if features is not None]
+        if stored:
+            self.index.add(
+                [job.printjob_number for job, _ in stored],
+                np.stack([features for _, features in stored]),
+            )
+
+    def remove(self, printjob_id: int) -> None:
+        self.index.remove([printjob_id])
+        self.store.pop(printjob_id, None)
 
     def get_all(self) -> List[Printjob]:
         return list(self.store.values())
 
+    def get_all_printjob_numbers(self) -> List[int]:
+        return list(self.store.keys())
+
     def get_all_printjob_features(self) -> Dict[int, np.ndarray]:
-        return {job_id: job.features for job_id, job in self.store.items()}
+        return {
+            job_id: job.features
+            for job_id, job in self.store.items()
+            if job.features is not None
+        }
+
+    def get_feature_index(self) -> FeatureIndex:
+        return self.index
+
+    def _store_printjob(self, printjob: Printjob) -> Tuple[Printjob, Optional[np.ndarray]]:
+        features = printjob.features
+        if features is not None and not self.keep_features:
+            printjob = dataclasses.replace(printjob, features=None)
+        # the store first, so that matches always refer to a stored printjob
+        self.store[printjob.printjob_number] = printjob
+        return printjob, features
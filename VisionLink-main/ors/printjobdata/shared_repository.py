@@ -0,0 +1,59 @@
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from ors.printjobdata.datatypes import Printjob, PrintjobRepository
+from ors.similarity.datatypes import FeatureIndex
+from ors.similarity.shared import SharedFeatureIndex
+
+
+class SharedMemoryPrintjobRepository(PrintjobRepository):
+    # Read-only view on a catalog published by another process, see
+    # SharedFeatureIndexPublisher. Printjobs are resolved from the published
+    # ids, images are loaded lazily through the path resolver.
+    def __init__(
+        self,
+        index: SharedFeatureIndex,
+        file_type: Optional[str] = None,
+        image_path_resolver: Optional[Callable[[int], Optional[str]]] = None,
+    ) -> None:
+        super().__init__()
+        self.index = index
+        self.file_type = file_type
+        self.image_path_resolver = image_path_resolver
+
+    def get(self, printjob_id: int) -> Printjob:
+        if printjob_id not in self.index:
+            raise KeyError(printjob_id)
+        image_path = None
+        if self.image_path_resolver is not None:
+            image_path = self.image_path_resolver(printjob_id)
+        return Printjob(
+            printjob_id,
+            image_file=None,
+            file_type=self.file_type,
+            features=None,
+            image_path=image_path,
+        )
+
+    def add(self, printjob: Printjob) -> Printjob:
+        raise NotImplementedError("The shared printjob repository is read-only")
+
+    def add_all(self, printjobs: Iterable[Printjob]) -> None:
+        raise NotImplementedError("The shared printjob repository is read-only")
+
+    def remove(self, printjob_id: int) -> None:
+        raise NotImplementedError("The shared printjob repository is read-only")
+
+    def get_all(self) -> List[Printjob]:
+        return [self.get(printjob_id) for printjob_id in self.get_all_printjob_numbers()]
+
+    def get_all_printjob_numbers(self) -> List[int]:
+        return self.index.ids.tolist()
+
+    def get_all_printjob_features(self) -> Dict[int, np.ndarray]:
+        ids, features = self.index.ids, self.index.matrix
+        return {printjob_id: features[row] for row, printjob_id in enumerate(ids.tolist())}
+
+    def get_feature_index(self) -> FeatureIndex:
+        return self.index
@@ -0,0 +1,174 @@
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ors.common import logger
+from ors.printjobdata.datatypes import Printjob, PrintjobRepository
+from ors.similarity.datatypes import FeatureIndex
+from ors.similarity.exact import ExactFeatureIndex
+
+logger = logger.get_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS printjobs (
+    printjob_number INTEGER PRIMARY KEY,
+    file_type TEXT,
+    image_path TEXT,
+    features BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class SQLitePrintjobRepository(PrintjobRepository):
+    # Printjob metadata, image file references and float32 feature blobs in a
+    # SQLite database. On open the features are streamed in batches into the
+    # feature index, all other columns are only read on demand.
+    def __init__(
+        self,
+        database_path: str,
+        model_identity: str = "",
+        index: Optional[FeatureIndex] = None,
+        export_batch_size: int = 10000,
+    ) -> None:
+        super().__init__()
+        self.database_path = database_path
+        self.model_identity = model_identity
+        self.export_batch_size = export_batch_size
+        self._lock = threading.RLock()
+        self.connection = sqlite3.connect(database_path, check_same_thread=False)
+        # WAL allows offline tools to read while the recognition system writes
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self._check_model_identity()
+
+        if index is None:
+            count = self.connection.execute("SELECT COUNT(*) FROM printjobs").fetchone()[0]
+            index = ExactFeatureIndex(initial_capacity=max(count, 1024))
+        self.index = index
+        for printjob_ids, features in self.iter_feature_batches():
+            self.index.add(printjob_ids, features)
+
+    def get(self, printjob_id: int) -> Printjob:
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT printjob_number, file_type, image_path, features "
+                "FROM printjobs WHERE printjob_number = ?",
+                (printjob_id,),
+            ).fetchone()
+        if row is None:
+            raise KeyError(printjob_id)
+        return self._to_printjob(row)
+
+    def add(self, printjob: Printjob) -> Printjob:
+        self.add_all([printjob])
+        return printjob
+
+    def add_all(self, printjobs: Iterable[Printjob]) -> None:
+        printjobs = [job for job in printjobs if job.features is not None]
+        if not printjobs:
+            return
+        features = np.stack([job.features for job in printjobs]).astype(np.float32)
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO printjobs "
+                "(printjob_number, file_type, image_path, features) VALUES (?, ?, ?, ?)",
+                (
+                    (job.printjob_number, job.file_type, job.image_path, row.tobytes())
+                    for job, row in zip(printjobs, features)
+                ),
+            )
+        self.index.add([job.printjob_number for job in printjobs], features)
+
+    def remove(self, printjob_id: int) -> None:
+        self.index.remove([printjob_id])
+        with self._lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM printjobs WHERE printjob_number = ?", (printjob_id,)
+            )
+
+    def get_all(self) -> List[Printjob]:
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT printjob_number, file_type, image_path, features FROM printjobs"
+            ).fetchall()
+        return [self._to_printjob(row) for row in rows]
+
+    def get_all_printjob_numbers(self) -> List[int]:
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT printjob_number FROM printjobs"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_all_printjob_features(self) -> Dict[int, np.ndarray]:
+        features = {}
+        for printjob_ids, matrix in self.iter_feature_batches():
+            features.update(zip(printjob_ids.tolist(), matrix))
+        return features
+
+    def get_feature_index(self) -> FeatureIndex:
+        return self.index
+
+    def iter_feature_batches(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        # streams (ids, features) batches, the whole matrix is never held twice;
+        # each batch is its own query so the lock isn't held while the caller
+        # works on a batch
+        last_printjob_id = None
+        while True:
+            with self._lock:
+                if last_printjob_id is None:
+                    rows = self.connection.execute(
+                        "SELECT printjob_number, features FROM printjobs "
+                        "ORDER BY printjob_number LIMIT ?",
+                        (self.export_batch_size,),
+                    ).fetchall()
+                else:
+                    rows = self.connection.execute(
+                        "SELECT printjob_number, features FROM printjobs "
+                        "WHERE printjob_number > ? ORDER BY printjob_number LIMIT ?",
+                        (last_printjob_id, self.export_batch_size),
+                    ).fetchall()
+            if not rows:
+                break
+            printjob_ids = np.fromiter(
+                (row[0] for row in rows), dtype=np.int64, count=len(rows)
+            )
+            features = np.frombuffer(
+                b"".join(row[1] for row in rows), dtype=np.float32
+            ).reshape(len(rows), -1)
+            last_printjob_id = int(printjob_ids[-1])
+            yield printjob_ids, features
+
+    def _to_printjob(self, row: Tuple) -> Printjob:
+        printjob_number, file_type, image_path, features = row
+        return Printjob(
+            printjob_number,
+            image_file=None,
+            file_type=file_type,
+            features=np.frombuffer(features, dtype=np.float32),
+            image_path=image_path,
+        )
+
+    def _check_model_identity(self) -> None:
+        row = self.connection.execute(
+            "SELECT value FROM metadata WHERE key = 'model_identity'"
+        ).fetchone()
+        if row is not None and row[0] == self.model_identity:
+            return
+        with self.connection:
+            if row is not None:
+                logger.warning(
+                    f"Features in '{self.database_path}' were built by another model, discarding them"
+                )
+                self.connection.execute("DELETE FROM printjobs")
+            self.connection.execute(
+                "INSERT OR REPLACE INTO metadata (key, value) VALUES ('model_identity', ?)",
+                (self.model_identity,),
+            )
@@ -0,0 +1,120 @@
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from ors.common import logger
+from ors.printjobdata.datatypes import ExternalPrintjob, PrintjobChanges
+from ors.printjobdata.loader import scan_printjob_directory
+
+logger = logger.get_logger(__name__)
+
+# (image path, modification time in ns, size in bytes)
+FileState = Tuple[str, int, int]
+# state of a catalog job without an image file, it is reported as removed
+MISSING: FileState = ("", -1, -1)
+
+
+class PrintjobDirectoryWatcher:
+    # Polls the printjob directory with os.scandir and reports added, changed
+    # and removed numeric printjob directories. A new or modified file is only
+    # reported once it was unchanged for one polling interval, so files that
+    # are still being copied are not picked up half written.
+    def __init__(
+        self, printjobs_directory: str, printjobs_filetype: str, interval_s: float
+    ) -> None:
+        self.printjobs_directory = printjobs_directory
+        self.printjobs_filetype = printjobs_filetype
+        self.interval_s = interval_s
+        self._known: Dict[int, FileState] = {}
+        self._pending: Dict[int, FileState] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def initialize(self, printjob_numbers: Optional[Iterable[int]] = None) -> None:
+        # baseline, taken after the catalog is loaded from the printjob numbers
+        # it holds; files of other jobs are reported as added by the next polls
+        current = self.scan()
+        if printjob_numbers is None:
+            self._known = current
+            return
+        self._known = {
+            printjob_number: current.get(printjob_number, MISSING)
+            for printjob_number in printjob_numbers
+        }
+
+    def scan(self) -> Dict[int, FileState]:
+        scan = scan_printjob_directory(self.printjobs_directory, self.printjobs_filetype)
+        states = {}
+        for printjob_number, image_file in scan.image_files.items():
+            stat = image_file.stat()
+            states[printjob_number] = (image_file.path, stat.st_mtime_ns, stat.st_size)
+        return states
+
+    def poll(self) -> PrintjobChanges:
+        current = self.scan()
+        changes = PrintjobChanges()
+        for printjob_number, state in current.items():
+            if self._known.get(printjob_number) == state:
+                self._pending.pop(printjob_number, None)
+                continue
+            if self._pending.get(printjob_number) != state:
+                # first sighting of this state, wait until it is stable
+                self._pending[printjob_number] = state
+                continue
+            del self._pending[printjob_number]
+            ext_job = ExternalPrintjob(
+                printjob_number, None, self.printjobs_filetype, image_path=state[0]
+            )
+            if printjob_number in self._known:
+                changes.changed.append(ext_job)
+            else:
+                changes.added.append(ext_job)
+            self._known[printjob_number] = state
+        for printjob_number in list(self._known):
+            if printjob_number not in current:
+                changes.removed.append(printjob_number)
+                del self._known[printjob_number]
+                self._pending.pop(printjob_number, None)
+        return changes
+
+    def start(
+        self, on_changes: Callable[[PrintjobChanges], Optional[PrintjobChanges]]
+    ) -> None:
+        self._thread = threading.Thread(
+            target=self._watch_loop,
+            args=(on_changes,),
+            name="printjob-watcher-thread",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def rollback(self, previous: Dict[int, FileState], failed: PrintjobChanges) -> None:
+        # the jobs that were not applied get their state from before the poll
+        # back, so the next polls report them again
+        printjob_numbers = [
+            ext_job.printjob_number for ext_job in failed.added + failed.changed
+        ] + failed.removed
+        for printjob_number in printjob_numbers:
+            if printjob_number in previous:
+                self._known[printjob_number] = previous[printjob_number]
+            else:
+                self._known.pop(printjob_number, None)
+
+    def _watch_loop(
+        self, on_changes: Callable[[PrintjobChanges], Optional[PrintjobChanges]]
+    ) -> None:
+        while not self._stop.wait(self.interval_s):
+            previous = dict(self._known)
+            try:
+                changes = self.poll()
+                if not changes.is_empty():
+                    failed = on_changes(changes)
+                    if failed is not None:
+                        self.rollback(previous, failed)
+            except Exception:
+                logger.exception("Polling the printjob directory failed")
+                # everything of this poll is reported again
+                self._known = previous
@@ -0,0 +1,17 @@
+from typing import Optional
+
+from pydantic import BaseSettings
+
+
+class SceneChangeConfig(BaseSettings):
+    # "difference" (mean absolute difference of downsampled grey frames, 0..1)
+    # or "dhash" (fraction of differing difference-hash bits, 0..1)
+    method: str = "difference"
+    # frames closer than this to the last recognised frame reuse its result,
+    # around 0.03 for "difference" and 0.1 for "dhash"
+    threshold: float = 0.03
+    downsample_size: int = 32
+    # recognise at least this often even if the scene looks unchanged
+    max_reuse_s: Optional[float] = 10.0
+    # log the hit rate every this many frames
+    log_interval: int = 100
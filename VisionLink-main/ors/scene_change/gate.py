@@ -0,0 +1,76 @@
+import time
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from ors.common import logger
+from ors.common.color import BGR, to_grey
+from ors.scene_change.config import SceneChangeConfig
+
+logger = logger.get_logger(__name__)
+
+
+class SceneChangeDetector:
+    def __init__(self, method: str = "difference", size: int = 32) -> None:
+        if method not in ("difference", "dhash"):
+            raise ValueError(f"Unknown scene change method '{method}'")
+        self.method = method
+        self.size = size
+
+    def signature(self, frame: np.ndarray, color_order: str = BGR) -> np.ndarray:
+        grey = to_grey(frame, color_order)
+        if self.method == "dhash":
+            small = cv2.resize(grey, (self.size + 1, self.size), interpolation=cv2.INTER_AREA)
+            return np.packbits(small[:, 1:] > small[:, :-1])
+        small = cv2.resize(grey, (self.size, self.size), interpolation=cv2.INTER_AREA)
+        return small.astype(np.float32) / 255
+
+    def distance(self, a: np.ndarray, b: np.ndarray) -> float:
+        if self.method == "dhash":
+            return float(np.unpackbits(a ^ b).mean())
+        return float(np.abs(a - b).mean())
+
+
+class SceneChangeGate:
+    # Compares every frame with the last recognised one, frames of an
+    # unchanged scene can reuse the previous result. The reference is only
+    # replaced by recognised frames, so slow drift still triggers recognition.
+    def __init__(self, config: SceneChangeConfig) -> None:
+        self.config = config
+        self.detector = SceneChangeDetector(config.method, config.downsample_size)
+        self.frames = 0
+        self.skipped = 0
+        self._reference: Optional[np.ndarray] = None
+        self._reference_time = 0.0
+        self._candidate: Optional[np.ndarray] = None
+
+    @property
+    def hit_rate(self) -> float:
+        return self.skipped / self.frames if self.frames else 0.0
+
+    def should_recognise(self, frame: np.ndarray, color_order: str = BGR) -> bool:
+        self.frames += 1
+        self._candidate = self.detector.signature(frame, color_order)
+        unchanged = (
+            self._reference is not None
+            and self.detector.distance(self._candidate, self._reference)
+            <= self.config.threshold
+            and (
+                self.config.max_reuse_s is None
+                or time.monotonic() - self._reference_time < self.config.max_reuse_s
+            )
+        )
+        if unchanged:
+            self.skipped += 1
+        if self.frames % self.config.log_interval == 0:
+            logger.info(
+                f"Scene change gate: {self.skipped}/{self.frames} frames reused "
+                f"(hit rate {self.hit_rate:.2f})"
+            )
+        return not unchanged
+
+    def recognised(self) -> None:
+        # the frame passed to the last should_recognise call is the new reference
+        self._reference = self._candidate
+        self._reference_time = time.monotonic()
@@ -0,0 +1,228 @@
+import argparse
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from ors.feature_extraction.projection import FeatureProjection
+from ors.similarity.compressed import CompressedFeatureIndex
+from ors.similarity.datatypes import FeatureIndex
+from ors.similarity.exact import ExactFeatureIndex
+from ors.similarity.ivf import IVFFeatureIndex
+from ors.similarity.quantization import create_codec
+from ors.similarity.sharded import ShardedFeatureIndex
+
+
+def normalize(features: np.ndarray) -> np.ndarray:
+    return features / np.linalg.norm(features, axis=-1, keepdims=True)
+
+
+def synthetic_catalog(
+    size: int, dimension: int, num_clusters: int = 512, seed: int = 0
+) -> np.ndarray:
+    # ResNet features of printjobs are far from uniform on the sphere, so the
+    # synthetic catalog is drawn around a set of random cluster centres
+    rng = np.random.default_rng(seed)
+    centres = normalize(rng.normal(size=(num_clusters, dimension)))
+    labels = rng.integers(0, num_clusters, size)
+    catalog = centres[labels] + 0.5 / np.sqrt(dimension) * rng.normal(
+        size=(size, dimension)
+    )
+    return normalize(catalog).astype(np.float32)
+
+
+def catalog_around(
+    features: np.ndarray, size: int, noise: float = 0.3, seed: int = 0
+) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    rows = np.concatenate([np.arange(len(features)), rng.integers(0, len(features), size)])[:size]
+    catalog = features[rows] + noise / np.sqrt(features.shape[1]) * rng.normal(
+        size=(len(rows), features.shape[1])
+    )
+    return normalize(catalog).astype(np.float32)
+
+
+def make_queries(
+    catalog: np.ndarray, num_queries: int, noise: float = 0.5, seed: int = 1
+) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(catalog), num_queries)
+    queries = catalog[rows] + noise / np.sqrt(catalog.shape[1]) * rng.normal(
+        size=(num_queries, catalog.shape[1])
+    )
+    return normalize(queries).astype(np.float32)
+
+
+def load_printjob_features(printjobs_directory: str, printjobs_filetype: str) -> np.ndarray:
+    from ors.feature_extraction.config import FeatureExtractorConfig
+    from ors.feature_extraction.factory import create_feature_extractor
+    from ors.printjobdata.catalog import PrintjobFeatureLoader
+    from ors.printjobdata.config import PrintjobLoaderConfig
+    from ors.printjobdata.loader import FileSystemPrintjobProvider
+
+    provider = FileSystemPrintjobProvider(
+        PrintjobLoaderConfig(
+            printjobs_directory=printjobs_directory,
+            printjobs_filetype=printjobs_filetype,
+        )
+    )
+    loader = PrintjobFeatureLoader(create_feature_extractor(FeatureExtractorConfig()))
+    printjobs = loader.load(provider.get_all_printjobs(load_files=False))
+    return np.stack([job.features for job in printjobs]).astype(np.float32)
+
+
+def build_index(index: FeatureIndex, catalog: np.ndarray) -> Tuple[FeatureIndex, float]:
+    start_time = time.perf_counter()
+    index.add(np.arange(len(catalog)), catalog)
+    return index, time.perf_counter() - start_time
+
+
+def measure(index: FeatureIndex, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    results = np.empty(len(queries), dtype=np.int64)
+    latencies = np.empty(len(queries))
+    for i, query in enumerate(queries):
+        start_time = time.perf_counter()
+        results[i], _ = index.find_best_match(query)
+        latencies[i] = time.perf_counter() - start_time
+    return results, latencies * 1000
+
+
+def report(name: str, build_s: float, latencies_ms: np.ndarray, recall: float) -> None:
+    print(
+        f"{name:<28} build {build_s:8.2f}s  "
+        f"mean {latencies_ms.mean():8.3f}ms  p99 {np.percentile(latencies_ms, 99):8.3f}ms  "
+        f"recall@1 {recall:6.3f}"
+    )
+
+
+def run(
+    catalog: np.ndarray,
+    queries: np.ndarray,
+    nlists: List[int],
+    nprobes: List[int],
+) -> None:
+    print(f"catalog {catalog.shape[0]} x {catalog.shape[1]}, {len(queries)} queries")
+    exact, build_s = build_index(ExactFeatureIndex(), catalog)
+    expected, latencies = measure(exact, queries)
+    report("exact", build_s, latencies, 1.0)
+
+    for nlist in nlists:
+        if nlist > len(catalog):
+            continue
+        ivf, build_s = build_index(IVFFeatureIndex(nlist=nlist, min_train_size=0), catalog)
+        for nprobe in nprobes:
+            if nprobe > nlist:
+                continue
+            ivf.nprobe = nprobe
+            found, latencies = measure(ivf, queries)
+            report(f"ivf nlist={nlist} nprobe={nprobe}", build_s, latencies, float(np.mean(found == expected)))
+
+
+def run_compression(
+    catalog: np.ndarray, queries: np.ndarray, encodings: List[str], pq_subvectors: int
+) -> None:
+    print(f"catalog {catalog.shape[0]} x {catalog.shape[1]}, {len(queries)} queries")
+    exact, _ = build_index(ExactFeatureIndex(), catalog)
+    expected, _ = measure(exact, queries)
+
+    for encoding in encodings:
+        codec = create_codec(encoding, pq_subvectors=pq_subvectors)
+        index, build_s = build_index(
+            CompressedFeatureIndex(codec, train_size=len(catalog)), catalog
+        )
+        found, latencies = measure(index, queries)
+        bytes_per_job = index.bytes_per_feature()
+        report(encoding, build_s, latencies, float(np.mean(found == expected)))
+        print(
+            f"{'':<28} {bytes_per_job} bytes/job, "
+            f"{bytes_per_job * 1e6 / 2 ** 30:.2f} GiB per million jobs"
+        )
+
+
+def run_shards(catalog: np.ndarray, queries: np.ndarray, shard_counts: List[int]) -> None:
+    print(f"catalog {catalog.shape[0]} x {catalog.shape[1]}, {len(queries)} queries")
+    exact, build_s = build_index(ExactFeatureIndex(), catalog)
+    expected, latencies = measure(exact, queries)
+    report("in-process", build_s, latencies, 1.0)
+
+    for num_shards in shard_counts:
+        index, build_s = build_index(ShardedFeatureIndex(num_shards), catalog)
+        try:
+            found, latencies = measure(index, queries)
+            report(f"shards={num_shards}", build_s, latencies, float(np.mean(found == expected)))
+        finally:
+            index.close()
+
+
+def run_projection(
+    catalog: np.ndarray, queries: np.ndarray, dimensions: List[int], whiten: bool
+) -> None:
+    print(f"catalog {catalog.shape[0]} x {catalog.shape[1]}, {len(queries)} queries")
+    exact, build_s = build_index(ExactFeatureIndex(), catalog)
+    expected, latencies = measure(exact, queries)
+    report(f"d={catalog.shape[1]}", build_s, latencies, 1.0)
+
+    for dimension in dimensions:
+        if dimension >= catalog.shape[1]:
+            continue
+        projection = FeatureProjection.fit(catalog, dimension, "benchmark", whiten=whiten)
+        index, build_s = build_index(ExactFeatureIndex(), projection.apply(catalog))
+        found, latencies = measure(index, projection.apply(queries))
+        report(f"pca d={dimension}", build_s, latencies, float(np.mean(found == expected)))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Recall vs. latency of approximate and compressed feature indices against exact search"
+    )
+    parser.add_argument("source", choices=["synthetic", "real"])
+    parser.add_argument(
+        "--report",
+        choices=["ann", "compression", "shards", "projection"],
+        default="ann",
+        help="'ann' compares IVF settings, 'compression' compares feature encodings, "
+        "'shards' compares the number of worker processes, "
+        "'projection' compares PCA dimensions",
+    )
+    parser.add_argument("--catalog-sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dimension", type=int, default=2048)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nlist", type=int, nargs="+", default=[64, 256, 1024])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument(
+        "--encodings", nargs="+", default=["float32", "float16", "int8", "pq"]
+    )
+    parser.add_argument("--pq-subvectors", type=int, default=64)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[64, 128, 256, 512])
+    parser.add_argument("--whiten", action="store_true")
+    parser.add_argument("--printjobs-directory", default="testdata/printjobs_png")
+    parser.add_argument("--printjobs-filetype", default="png")
+    args = parser.parse_args()
+
+    real_features = None
+    if args.source == "real":
+        real_features = load_printjob_features(
+            args.printjobs_directory, args.printjobs_filetype
+        )
+        print(f"Extracted {len(real_features)} real printjob features")
+
+    for size in args.catalog_sizes:
+        if real_features is None:
+            catalog = synthetic_catalog(size, args.dimension)
+        else:
+            # the real catalog is small, grow it around the real features
+            catalog = catalog_around(real_features, size)
+        queries = make_queries(catalog, args.queries)
+        if args.report == "ann":
+            run(catalog, queries, args.nlist, args.nprobe)
+        elif args.report == "compression":
+            run_compression(catalog, queries, args.encodings, args.pq_subvectors)
+        elif args.report == "shards":
+            run_shards(catalog, queries, args.shards)
+        else:
+            run_projection(catalog, queries, args.dimensions, args.whiten)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import threading
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from ors.common import logger
+from ors.similarity.datatypes import FeatureCodec, FeatureIndex, TopKMatches
+from ors.similarity.exact import ExactFeatureIndex
+
+logger = logger.get_logger(__name__)
+
+
+class CompressedFeatureIndex(FeatureIndex):
+    # Stores the catalog as codec codes. Scalar quantisation is trained on the
+    # first features added. Product quantisation needs a sample for its
+    # codebooks and keeps float32 features until train_size features were
+    # added, then trains on them and re-encodes the whole catalog once.
+    def __init__(self, codec: FeatureCodec, train_size: int = 10000) -> None:
+        self.codec = codec
+        self.train_size = train_size
+        self._lock = threading.RLock()
+        self._warned = False
+        if codec.is_trained:
+            self._store = ExactFeatureIndex(codec=codec)
+        else:
+            self._store = ExactFeatureIndex()
+
+    @property
+    def is_trained(self) -> bool:
+        return self._store.codec is self.codec
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def train(self) -> None:
+        with self._lock:
+            pending = self._store
+            if self.is_trained or len(pending) == 0:
+                return
+            self.codec.train(pending.matrix)
+            store = ExactFeatureIndex(codec=self.codec)
+            store.add(pending.ids, pending.matrix)
+            self._store = store
+        logger.info(
+            f"Trained {type(self.codec).__name__} on {len(pending)} features"
+        )
+
+    def add(self, printjob_ids: Sequence[int], features: np.ndarray) -> None:
+        with self._lock:
+            self._store.add(printjob_ids, features)
+            if self.is_trained:
+                return
+            if not self.codec.needs_train_sample or len(self._store) >= self.train_size:
+                self.train()
+            elif not self._warned:
+                self._warned = True
+                logger.warning(
+                    f"{type(self.codec).__name__} is trained once {self.train_size} features "
+                    f"were added, until then the {len(self._store)} features stay float32"
+                )
+
+    def remove(self, printjob_ids: Sequence[int]) -> None:
+        with self._lock:
+            self._store.remove(printjob_ids)
+
+    def export_features(self) -> Tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            return self._store.export_features()
+
+    def find_best_match(self, feature_vector: np.ndarray) -> Tuple[int, float]:
+        with self._lock:
+            return self._store.find_best_match(feature_vector)
+
+    def find_top_k(self, queries: np.ndarray, k: int) -> TopKMatches:
+        with self._lock:
+            return self._store.find_top_k(queries, k)
+
+    def bytes_per_feature(self) -> int:
+        # code + float32 squared norm + int64 id
+        matrix = self._store.matrix
+        return matrix.itemsize * matrix.shape[1] + 4 + 8
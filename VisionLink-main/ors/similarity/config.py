@@ -0,0 +1,41 @@
+from typing import Optional
+
+from pydantic import BaseSettings, validator
+
+
+class SimilarityConfig(BaseSettings):
+    index_type: str = "exact"  # "exact", "ivf" or "sharded"
+    # IVF: number of k-means cells, cells scanned per query and training settings
+    ivf_nlist: int = 256
+    ivf_nprobe: int = 8
+    ivf_min_train_size: int = 10000
+    ivf_kmeans_iterations: int = 20
+    # sharded: exact search split over worker processes. On one host the
+    # in-process exact index has been faster in every measurement, e.g. 0.66 ms
+    # per query against 1.35 ms with 1 and 1.74 ms with 2 shards, so the number
+    # of shards has to be chosen explicitly after measuring it on the target
+    # machine with "python -m ors.similarity.benchmark synthetic --report shards"
+    num_shards: Optional[int] = None
+    shard_timeout_s: float = 10
+    # "float32", "float16", "int8" (scalar quantisation) or "pq" (product quantisation);
+    # float16 only saves memory, NumPy widens it to float32 for every search which
+    # makes it several times slower than float32
+    encoding: str = "float32"
+    # product quantisation trains its codebooks once this many features were
+    # added, int8 is trained on the first features
+    encoding_train_size: int = 10000
+    pq_subvectors: int = 64
+    # Shares the catalog between processes on one host: one "publisher" extracts
+    # the features and publishes them under this name, "subscriber" processes
+    # attach read-only
+    shared_memory_name: Optional[str] = None
+    shared_memory_role: str = "publisher"
+    # subscribers started before the publisher wait this long for its catalog
+    # and feature projection
+    shared_memory_timeout_s: float = 60
+
+    @validator("num_shards", always=True)
+    def _require_num_shards(cls, value, values):
+        if value is None and values.get("index_type") == "sharded":
+            raise ValueError("the sharded index needs num_shards")
+        return value
@@ -0,0 +1,84 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Sequence, Tuple
+
+import numpy as np
+
+
+@dataclass
+class TopKMatches:
+    # ids and distances have shape (N, k) and are sorted by ascending distance,
+    # slots without a match hold id -1 and distance inf
+    ids: np.ndarray
+    distances: np.ndarray
+
+    @property
+    def margins(self) -> np.ndarray:
+        # distance gap between best and second best match, inf if there is no second
+        if self.distances.shape[1] < 2:
+            return np.full(len(self.distances), np.inf)
+        return self.distances[:, 1] - self.distances[:, 0]
+
+
+class FeatureCodec(ABC):
+    # Encodes float32 feature rows into compact codes and scores queries
+    # directly against these codes
+    dtype: np.dtype
+    # codecs that learn from a sample of the catalog, e.g. k-means codebooks,
+    # are only trained once enough features were added
+    needs_train_sample = False
+
+    @property
+    @abstractmethod
+    def is_trained(self) -> bool:
+        pass
+
+    @abstractmethod
+    def code_size(self, dimension: int) -> int:
+        pass
+
+    def train(self, features: np.ndarray) -> None:
+        pass
+
+    @abstractmethod
+    def encode(self, features: np.ndarray) -> np.ndarray:
+        pass
+
+    @abstractmethod
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        pass
+
+    @abstractmethod
+    def sq_distances(
+        self, queries: np.ndarray, codes: np.ndarray, sq_norms: np.ndarray
+    ) -> np.ndarray:
+        # (N, D) float32 queries against (M, code_size) codes -> (N, M) squared
+        # distances, sq_norms holds the squared norms of the decoded codes
+        pass
+
+
+class FeatureIndex(ABC):
+    @abstractmethod
+    def add(self, printjob_ids: Sequence[int], features: np.ndarray) -> None:
+        pass
+
+    @abstractmethod
+    def remove(self, printjob_ids: Sequence[int]) -> None:
+        pass
+
+    @abstractmethod
+    def find_best_match(self, feature_vector: np.ndarray) -> Tuple[int, float]:
+        pass
+
+    @abstractmethod
+    def find_top_k(self, queries: np.ndarray, k: int) -> TopKMatches:
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    def export_features(self) -> Tuple[np.ndarray, np.ndarray]:
+        # (ids, float32 features) of the whole catalog, encoded features are
+        # decoded; the arrays may be views into the index
+        raise NotImplementedError(f"{type(self).__name__} can't export its features")
@@ -0,0 +1,204 @@
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ors.similarity.datatypes import FeatureCodec, FeatureIndex, TopKMatches
+from ors.similarity.quantization import Float32Codec
+from ors.similarity.topk import select_top_k
+
+# |q|^2 + |x|^2 - 2 q.x loses precision through cancellation in float32, e.g. a
+# feature queried against itself isn't at distance 0. Rows within this fraction
+# of |q|^2 + |x|^2 of the best row are scored again directly.
+RESCORE_TOLERANCE = 1e-5
+
+
+class ExactFeatureIndex(FeatureIndex):
+    # Rows [0, size) of the matrix hold the (encoded) catalog features, the id
+    # array holds the printjob number of every row.
+    def __init__(
+        self,
+        dimension: Optional[int] = None,
+        initial_capacity: int = 1024,
+        max_block_elements: int = 1 << 24,
+        codec: Optional[FeatureCodec] = None,
+    ) -> None:
+        self.codec = codec if codec is not None else Float32Codec()
+        if not self.codec.is_trained:
+            raise ValueError("The feature codec has to be trained before use")
+        self.dimension = dimension
+        self.initial_capacity = initial_capacity
+        # upper bound for the (queries x catalog) distance block of find_top_k
+        self.max_block_elements = max_block_elements
+        self._matrix = np.empty(
+            (0, self.codec.code_size(dimension or 0)), dtype=self.codec.dtype
+        )
+        self._sq_norms = np.empty(0, dtype=np.float32)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._rows: Optional[Dict[int, int]] = {}
+        self._size = 0
+        self._attached = False
+        self._lock = threading.Lock()
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._ids[: self._size]
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._matrix[: self._size]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, printjob_id: int) -> bool:
+        with self._lock:
+            return int(printjob_id) in self._row_lookup()
+
+    def export_features(self) -> Tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            return self.ids, self.codec.decode(self.matrix)
+
+    def attach(
+        self, printjob_ids: np.ndarray, matrix: np.ndarray, sq_norms: np.ndarray
+    ) -> None:
+        # Use the given arrays, e.g. memory maps, as storage without copying them.
+        # They are only copied if rows are added or removed later on.
+        with self._lock:
+            self._check_dimension(matrix.shape[1])
+            self._ids, self._matrix, self._sq_norms = printjob_ids, matrix, sq_norms
+            self._size = len(printjob_ids)
+            self._rows = None
+            self._attached = True
+
+    def _row_lookup(self) -> Dict[int, int]:
+        if self._rows is None:
+            self._rows = {
+                printjob_id: row
+                for row, printjob_id in enumerate(self._ids[: self._size].tolist())
+            }
+        return self._rows
+
+    def add(self, printjob_ids: Sequence[int], features: np.ndarray) -> None:
+        # e.g. the shards of ShardedFeatureIndex that get none of the new jobs
+        if len(printjob_ids) == 0:
+            return
+        features = np.ascontiguousarray(features, dtype=np.float32).reshape(
+            len(printjob_ids), -1
+        )
+        with self._lock:
+            self._check_dimension(features.shape[1])
+            rows = np.empty(len(printjob_ids), dtype=np.int64)
+            new_ids = []
+            row_lookup = self._row_lookup()
+            for i, printjob_id in enumerate(printjob_ids):
+                row = row_lookup.get(int(printjob_id))
+                if row is None:
+                    row = self._size + len(new_ids)
+                    row_lookup[int(printjob_id)] = row
+                    new_ids.append(int(printjob_id))
+                rows[i] = row
+            self._reserve(self._size + len(new_ids))
+            self._ids[self._size : self._size + len(new_ids)] = new_ids
+            codes = self.codec.encode(features)
+            decoded = self.codec.decode(codes)
+            self._matrix[rows] = codes
+            self._sq_norms[rows] = np.einsum("ij,ij->i", decoded, decoded)
+            self._size += len(new_ids)
+
+    def remove(self, printjob_ids: Sequence[int]) -> None:
+        with self._lock:
+            row_lookup = self._row_lookup()
+            self._reserve(self._size)
+            for printjob_id in printjob_ids:
+                row = row_lookup.pop(int(printjob_id), None)
+                if row is None:
+                    continue
+                last = self._size - 1
+                if row != last:
+                    # keep the matrix dense by moving the last row into the gap
+                    self._matrix[row] = self._matrix[last]
+                    self._sq_norms[row] = self._sq_norms[last]
+                    self._ids[row] = self._ids[last]
+                    row_lookup[int(self._ids[row])] = row
+                self._size = last
+
+    def find_best_match(self, feature_vector: np.ndarray) -> Tuple[int, float]:
+        query = np.asarray(feature_vector, dtype=np.float32).ravel()
+        with self._lock:
+            if self._size == 0:
+                return -1, float("inf")
+            size = self._size
+            # |q - x|^2 = |q|^2 + |x|^2 - 2 q.x, the only O(N * D) work is one GEMV
+            sq_distances = self.codec.sq_distances(
+                query[np.newaxis], self._matrix[:size], self._sq_norms[:size]
+            )[0]
+            best_row = int(np.argmin(sq_distances))
+            tolerance = RESCORE_TOLERANCE * (
+                float(query @ query) + float(self._sq_norms[best_row])
+            )
+            rows = np.flatnonzero(sq_distances <= sq_distances[best_row] + tolerance)
+            exact_sq_distances = self._exact_sq_distances(query[np.newaxis], rows[np.newaxis])[0]
+            # the first row of exact ties, like a scan in insertion order
+            best = int(np.argmin(exact_sq_distances))
+            best_id = int(self._ids[rows[best]])
+            sq_distance = float(exact_sq_distances[best])
+        return best_id, float(np.sqrt(sq_distance))
+
+    def find_top_k(self, queries: np.ndarray, k: int) -> TopKMatches:
+        queries = np.asarray(queries, dtype=np.float32)
+        queries = queries.reshape(len(queries), -1)
+        with self._lock:
+            size = self._size
+            if size == 0:
+                empty = np.empty((len(queries), 0))
+                return select_top_k(empty.astype(np.int64), empty, k)
+            ids = np.empty((len(queries), min(k, size)), dtype=np.int64)
+            distances = np.empty((len(queries), min(k, size)), dtype=np.float32)
+            block = max(1, self.max_block_elements // size)
+            for start in range(0, len(queries), block):
+                chunk = queries[start : start + block]
+                # one GEMM for the whole chunk of queries
+                sq_distances = self.codec.sq_distances(
+                    chunk, self._matrix[:size], self._sq_norms[:size]
+                )
+                rows = np.broadcast_to(np.arange(size), sq_distances.shape)
+                # in row order, so that exact ties keep the insertion order
+                selected = np.sort(select_top_k(rows, sq_distances, min(k, size)).ids, axis=1)
+                ids[start : start + block] = self._ids[selected]
+                distances[start : start + block] = self._exact_sq_distances(chunk, selected)
+        np.sqrt(distances, out=distances)
+        return select_top_k(ids, distances, k)
+
+    def _exact_sq_distances(self, queries: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        # (N, D) queries against their (N, M) selected rows, from the decoded rows
+        decoded = self.codec.decode(self._matrix[rows.ravel()]).reshape(*rows.shape, -1)
+        difference = decoded - queries[:, np.newaxis]
+        return np.einsum("ijk,ijk->ij", difference, difference)
+
+    def _check_dimension(self, dimension: int) -> None:
+        if self.dimension is None:
+            self.dimension = dimension
+            self._matrix = np.empty(
+                (0, self.codec.code_size(dimension)), dtype=self.codec.dtype
+            )
+        elif self.dimension != dimension:
+            raise ValueError(
+                f"Feature dimension {dimension} does not match index dimension {self.dimension}"
+            )
+
+    def _reserve(self, capacity: int) -> None:
+        # attached storage is copied before it is modified
+        if capacity <= len(self._matrix) and not self._attached:
+            return
+        new_capacity = max(capacity, 2 * len(self._matrix), self.initial_capacity)
+        matrix = np.empty(
+            (new_capacity, self._matrix.shape[1]), dtype=self.codec.dtype
+        )
+        matrix[: self._size] = self._matrix[: self._size]
+        sq_norms = np.empty(new_capacity, dtype=np.float32)
+        sq_norms[: self._size] = self._sq_norms[: self._size]
+        ids = np.empty(new_capacity, dtype=np.int64)
+        ids[: self._size] = self._ids[: self._size]
+        self._matrix, self._sq_norms, self._ids = matrix, sq_norms, ids
+        self._attached = False
@@ -0,0 +1,165 @@
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ors.common import logger
+from ors.similarity.datatypes import FeatureCodec, FeatureIndex, TopKMatches
+from ors.similarity.exact import ExactFeatureIndex
+from ors.similarity.kmeans import assign_to_centroids, kmeans
+from ors.similarity.topk import select_top_k
+
+logger = logger.get_logger(__name__)
+
+
+class IVFFeatureIndex(FeatureIndex):
+    # Inverted file index: a k-means coarse quantiser splits the catalog into
+    # nlist cells and a query only scans the nprobe cells closest to it.
+    # Until min_train_size features were added the index searches exhaustively
+    # and keeps float32 features, a codec is only used from training on.
+    def __init__(
+        self,
+        nlist: int = 256,
+        nprobe: int = 8,
+        min_train_size: int = 10000,
+        kmeans_iterations: int = 20,
+        seed: int = 0,
+        codec: Optional[FeatureCodec] = None,
+    ) -> None:
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = max(min_train_size, nlist)
+        self.kmeans_iterations = kmeans_iterations
+        self.seed = seed
+        # optional compact encoding of the vectors stored in the cells
+        self.codec = codec
+        self.centroids: Optional[np.ndarray] = None
+        self._centroid_sq_norms: Optional[np.ndarray] = None
+        self._flat = ExactFeatureIndex()
+        self._cells: List[ExactFeatureIndex] = []
+        self._assignments: Dict[int, int] = {}
+        self._lock = threading.RLock()
+        self._warned = False
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            if not self.is_trained:
+                return len(self._flat)
+            return len(self._assignments)
+
+    def train(self, features: np.ndarray) -> None:
+        centroids = kmeans(
+            features,
+            self.nlist,
+            iterations=self.kmeans_iterations,
+            max_samples=self.nlist * 256,
+            seed=self.seed,
+        )
+        if self.codec is not None and not self.codec.is_trained:
+            self.codec.train(features)
+        with self._lock:
+            self.centroids = centroids
+            self._centroid_sq_norms = np.einsum("ij,ij->i", centroids, centroids)
+            self._cells = [
+                ExactFeatureIndex(dimension=centroids.shape[1], codec=self.codec)
+                for _ in range(self.nlist)
+            ]
+            self._assignments = {}
+            ids, matrix = self._flat.ids.copy(), self._flat.matrix.copy()
+            self._flat = ExactFeatureIndex()
+            if len(ids):
+                self._add_to_cells(ids, matrix)
+        logger.info(f"Trained IVF index with {self.nlist} cells on {len(features)} features")
+
+    def add(self, printjob_ids: Sequence[int], features: np.ndarray) -> None:
+        features = np.asarray(features, dtype=np.float32).reshape(len(printjob_ids), -1)
+        with self._lock:
+            if self.is_trained:
+                self.remove(printjob_ids)
+                self._add_to_cells(printjob_ids, features)
+                return
+            self._flat.add(printjob_ids, features)
+            if len(self._flat) >= self.min_train_size:
+                self.train(self._flat.matrix)
+            elif self.codec is not None and not self._warned:
+                self._warned = True
+                logger.warning(
+                    f"The IVF index is trained once {self.min_train_size} features were "
+                    f"added, until then the {len(self._flat)} features are searched "
+                    f"exhaustively and stay float32 instead of {type(self.codec).__name__}"
+                )
+
+    def remove(self, printjob_ids: Sequence[int]) -> None:
+        with self._lock:
+            if not self.is_trained:
+                self._flat.remove(printjob_ids)
+                return
+            for printjob_id in printjob_ids:
+                cell = self._assignments.pop(int(printjob_id), None)
+                if cell is not None:
+                    self._cells[cell].remove([printjob_id])
+
+    def export_features(self) -> Tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            if not self.is_trained:
+                return self._flat.export_features()
+            exported = [cell.export_features() for cell in self._cells]
+        return (
+            np.concatenate([ids for ids, _ in exported]),
+            np.concatenate([features for _, features in exported]),
+        )
+
+    def find_best_match(self, feature_vector: np.ndarray) -> Tuple[int, float]:
+        query = np.asarray(feature_vector, dtype=np.float32).ravel()
+        with self._lock:
+            if not self.is_trained:
+                return self._flat.find_best_match(query)
+            probes = self._closest_cells(query[np.newaxis])[0]
+            best_id, best_distance = -1, float("inf")
+            for cell in probes:
+                job_id, distance = self._cells[cell].find_best_match(query)
+                if distance < best_distance:
+                    best_id, best_distance = job_id, distance
+        return best_id, best_distance
+
+    def find_top_k(self, queries: np.ndarray, k: int) -> TopKMatches:
+        queries = np.asarray(queries, dtype=np.float32)
+        queries = queries.reshape(len(queries), -1)
+        with self._lock:
+            if not self.is_trained:
+                return self._flat.find_top_k(queries, k)
+            probes = self._closest_cells(queries)
+            nprobe = probes.shape[1]
+            candidate_ids = np.full((len(queries), nprobe, k), -1, dtype=np.int64)
+            candidate_distances = np.full((len(queries), nprobe, k), np.inf, dtype=np.float32)
+            # group the queries by probed cell so that every cell is scanned once
+            for cell in np.unique(probes):
+                query_rows, slots = np.nonzero(probes == cell)
+                matches = self._cells[cell].find_top_k(queries[query_rows], k)
+                candidate_ids[query_rows, slots] = matches.ids
+                candidate_distances[query_rows, slots] = matches.distances
+        return select_top_k(
+            candidate_ids.reshape(len(queries), -1),
+            candidate_distances.reshape(len(queries), -1),
+            k,
+        )
+
+    def _closest_cells(self, queries: np.ndarray) -> np.ndarray:
+        # returns the indices of the nprobe closest cells for every query
+        nprobe = min(self.nprobe, self.nlist)
+        sq_distances = self._centroid_sq_norms - 2 * (queries @ self.centroids.T)
+        probes = np.argpartition(sq_distances, nprobe - 1, axis=1)[:, :nprobe]
+        order = np.argsort(np.take_along_axis(sq_distances, probes, axis=1), axis=1)
+        return np.take_along_axis(probes, order, axis=1)
+
+    def _add_to_cells(self, printjob_ids: Sequence[int], features: np.ndarray) -> None:
+        printjob_ids = np.asarray(printjob_ids, dtype=np.int64)
+        assignments = assign_to_centroids(features, self.centroids)
+        for cell in np.unique(assignments):
+            members = assignments == cell
+            self._cells[cell].add(printjob_ids[members], features[members])
+        self._assignments.update(zip(printjob_ids.tolist(), assignments.tolist()))
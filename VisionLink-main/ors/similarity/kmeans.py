@@ -0,0 +1,50 @@
+from typing import Optional
+
+import numpy as np
+
+
+def assign_to_centroids(
+    data: np.ndarray, centroids: np.ndarray, chunk_size: int = 4096
+) -> np.ndarray:
+    centroid_sq_norms = np.einsum("ij,ij->i", centroids, centroids)
+    assignments = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), chunk_size):
+        chunk = data[start : start + chunk_size]
+        # |x|^2 is constant per row and does not change the argmin
+        sq_distances = centroid_sq_norms - 2 * (chunk @ centroids.T)
+        assignments[start : start + chunk_size] = np.argmin(sq_distances, axis=1)
+    return assignments
+
+
+def kmeans(
+    data: np.ndarray,
+    k: int,
+    iterations: int = 20,
+    max_samples: Optional[int] = None,
+    seed: int = 0,
+) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    data = np.asarray(data, dtype=np.float32)
+    if max_samples is not None and len(data) > max_samples:
+        data = data[rng.choice(len(data), max_samples, replace=False)]
+    if len(data) < k:
+        raise ValueError(f"Need at least {k} samples to train {k} centroids")
+
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = assign_to_centroids(data, centroids)
+        counts = np.bincount(assignments, minlength=k)
+        order = np.argsort(assignments, kind="stable")
+        sorted_assignments = assignments[order]
+        starts = np.flatnonzero(
+            np.r_[True, sorted_assignments[1:] != sorted_assignments[:-1]]
+        )
+        sums = np.zeros_like(centroids)
+        sums[sorted_assignments[starts]] = np.add.reduceat(data[order], starts, axis=0)
+        non_empty = counts > 0
+        centroids[non_empty] = sums[non_empty] / counts[non_empty, np.newaxis]
+        # re-seed empty cells with random samples so that every cell stays in use
+        empty = np.flatnonzero(~non_empty)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+    return centroids
@@ -0,0 +1,201 @@
+import numpy as np
+
+from ors.similarity.datatypes import FeatureCodec
+from ors.similarity.kmeans import assign_to_centroids, kmeans
+
+# catalog rows that are decoded to float32 at once while scoring
+BLOCK_ROWS = 16384
+
+
+def _gemm_sq_distances(
+    queries: np.ndarray, matrix: np.ndarray, sq_norms: np.ndarray
+) -> np.ndarray:
+    sq_distances = sq_norms - 2 * (queries @ matrix.T)
+    sq_distances += np.einsum("ij,ij->i", queries, queries)[:, np.newaxis]
+    return sq_distances
+
+
+class Float32Codec(FeatureCodec):
+    dtype = np.dtype(np.float32)
+
+    @property
+    def is_trained(self) -> bool:
+        return True
+
+    def code_size(self, dimension: int) -> int:
+        return dimension
+
+    def encode(self, features: np.ndarray) -> np.ndarray:
+        return np.asarray(features, dtype=np.float32)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes
+
+    def sq_distances(
+        self, queries: np.ndarray, codes: np.ndarray, sq_norms: np.ndarray
+    ) -> np.ndarray:
+        return _gemm_sq_distances(queries, codes, sq_norms)
+
+
+class Float16Codec(FeatureCodec):
+    dtype = np.dtype(np.float16)
+
+    @property
+    def is_trained(self) -> bool:
+        return True
+
+    def code_size(self, dimension: int) -> int:
+        return dimension
+
+    def encode(self, features: np.ndarray) -> np.ndarray:
+        return np.asarray(features, dtype=np.float16)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32)
+
+    def sq_distances(
+        self, queries: np.ndarray, codes: np.ndarray, sq_norms: np.ndarray
+    ) -> np.ndarray:
+        # NumPy has no float16 BLAS, so blocks of rows are widened before the GEMM
+        sq_distances = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            end = start + BLOCK_ROWS
+            sq_distances[:, start:end] = _gemm_sq_distances(
+                queries, codes[start:end].astype(np.float32), sq_norms[start:end]
+            )
+        return sq_distances
+
+
+class ScalarQuantizationCodec(FeatureCodec):
+    # Per-dimension 8 bit quantisation: x ~ minimum + step * (code + 0.5)
+    dtype = np.dtype(np.uint8)
+
+    def __init__(self) -> None:
+        self.minimum = None
+        self.step = None
+
+    @property
+    def is_trained(self) -> bool:
+        return self.minimum is not None
+
+    def code_size(self, dimension: int) -> int:
+        return dimension
+
+    def train(self, features: np.ndarray) -> None:
+        self.minimum = features.min(axis=0).astype(np.float32)
+        value_range = features.max(axis=0) - self.minimum
+        self.step = (np.maximum(value_range, 1e-12) / 256).astype(np.float32)
+
+    def encode(self, features: np.ndarray) -> np.ndarray:
+        codes = np.floor((features - self.minimum) / self.step)
+        return np.clip(codes, 0, 255).astype(np.uint8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return self.minimum + self.step * (codes.astype(np.float32) + 0.5)
+
+    def sq_distances(
+        self, queries: np.ndarray, codes: np.ndarray, sq_norms: np.ndarray
+    ) -> np.ndarray:
+        # q.x = q.(minimum + step / 2) + (q * step).code, so the GEMM runs on the
+        # raw codes and the affine part is a per-query constant
+        offsets = queries @ (self.minimum + 0.5 * self.step)
+        scaled_queries = queries * self.step
+        query_sq_norms = np.einsum("ij,ij->i", queries, queries)
+        sq_distances = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            end = start + BLOCK_ROWS
+            scores = scaled_queries @ codes[start:end].astype(np.float32).T
+            scores += offsets[:, np.newaxis]
+            sq_distances[:, start:end] = sq_norms[start:end] - 2 * scores
+        sq_distances += query_sq_norms[:, np.newaxis]
+        return sq_distances
+
+
+class ProductQuantizationCodec(FeatureCodec):
+    # Splits every vector into num_subvectors parts and stores the index of the
+    # closest of 256 k-means centroids per part. Queries are scored with
+    # asymmetric distance tables, the query itself is never quantised.
+    dtype = np.dtype(np.uint8)
+    needs_train_sample = True
+
+    def __init__(
+        self, num_subvectors: int = 64, kmeans_iterations: int = 20, seed: int = 0
+    ) -> None:
+        self.num_subvectors = num_subvectors
+        self.kmeans_iterations = kmeans_iterations
+        self.seed = seed
+        self.codebooks = None  # (num_subvectors, 256, subvector dimension)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.codebooks is not None
+
+    def code_size(self, dimension: int) -> int:
+        return self.num_subvectors
+
+    def _split(self, features: np.ndarray) -> np.ndarray:
+        num_rows, dimension = features.shape
+        if dimension % self.num_subvectors != 0:
+            raise ValueError(
+                f"Feature dimension {dimension} is not divisible by {self.num_subvectors} subvectors"
+            )
+        return features.reshape(num_rows, self.num_subvectors, -1)
+
+    def train(self, features: np.ndarray) -> None:
+        subvectors = self._split(np.asarray(features, dtype=np.float32))
+        self.codebooks = np.stack(
+            [
+                kmeans(
+                    subvectors[:, m],
+                    256,
+                    iterations=self.kmeans_iterations,
+                    max_samples=256 * 256,
+                    seed=self.seed + m,
+                )
+                for m in range(self.num_subvectors)
+            ]
+        )
+
+    def encode(self, features: np.ndarray) -> np.ndarray:
+        subvectors = self._split(np.asarray(features, dtype=np.float32))
+        codes = np.empty((len(features), self.num_subvectors), dtype=np.uint8)
+        for m in range(self.num_subvectors):
+            codes[:, m] = assign_to_centroids(subvectors[:, m], self.codebooks[m])
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        subvectors = self.codebooks[np.arange(self.num_subvectors), codes]
+        return subvectors.reshape(len(codes), -1)
+
+    def distance_tables(self, queries: np.ndarray) -> np.ndarray:
+        # (N, num_subvectors, 256) squared distances of every query subvector
+        # to every centroid of the matching codebook
+        subvectors = self._split(queries)
+        tables = np.einsum("msd,msd->ms", self.codebooks, self.codebooks)[np.newaxis]
+        tables = tables - 2 * np.einsum("nmd,msd->nms", subvectors, self.codebooks)
+        return tables + np.einsum("nmd,nmd->nm", subvectors, subvectors)[..., np.newaxis]
+
+    def sq_distances(
+        self, queries: np.ndarray, codes: np.ndarray, sq_norms: np.ndarray
+    ) -> np.ndarray:
+        tables = self.distance_tables(queries).reshape(len(queries), -1)
+        offsets = np.arange(self.num_subvectors) * 256
+        sq_distances = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            end = start + BLOCK_ROWS
+            lookup = codes[start:end] + offsets
+            for i, table in enumerate(tables):
+                sq_distances[i, start:end] = table[lookup].sum(axis=1)
+        return sq_distances
+
+
+def create_codec(encoding: str, pq_subvectors: int = 64) -> FeatureCodec:
+    if encoding == "float32":
+        return Float32Codec()
+    elif encoding == "float16":
+        return Float16Codec()
+    elif encoding == "int8":
+        return ScalarQuantizationCodec()
+    elif encoding == "pq":
+        return ProductQuantizationCodec(num_subvectors=pq_subvectors)
+    raise ValueError(f"Unknown feature encoding '{encoding}'")
@@ -0,0 +1,260 @@
+import multiprocessing
+import threading
+from multiprocessing.connection import Connection
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ors.common import logger
+from ors.similarity.datatypes import FeatureIndex, TopKMatches
+from ors.similarity.exact import ExactFeatureIndex
+from ors.similarity.topk import select_top_k
+
+logger = logger.get_logger(__name__)
+
+
+def _serve_shard(connection: Connection) -> None:
+    index = ExactFeatureIndex()
+    while True:
+        try:
+            command, *args = connection.recv()
+        except EOFError:
+            return
+        if command == "stop":
+            return
+        try:
+            if command == "add":
+                index.add(*args)
+                result = len(index)
+            elif command == "remove":
+                index.remove(*args)
+                result = len(index)
+            elif command == "top_k":
+                result = index.find_top_k(*args)
+            elif command == "export":
+                result = index.export_features()
+            else:
+                raise ValueError(f"Unknown shard command '{command}'")
+        except Exception as e:
+            result = e
+        connection.send(result)
+
+
+class _ShardWorker:
+    def __init__(self, shard: int, context) -> None:
+        self.shard = shard
+        self.context = context
+        self.restarts = 0
+        self.healthy = True
+        self.start()
+
+    def start(self) -> None:
+        self.connection, worker_connection = self.context.Pipe()
+        self.process = self.context.Process(
+            target=_serve_shard,
+            args=(worker_connection,),
+            name=f"similarity-shard-{self.shard}",
+            daemon=True,
+        )
+        self.process.start()
+        worker_connection.close()
+
+    def stop(self) -> None:
+        try:
+            self.connection.send(("stop",))
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.connection.close()
+
+    def send(self, *message) -> None:
+        self.connection.send(message)
+
+    def receive(self, timeout_s: float):
+        if not self.connection.poll(timeout_s):
+            raise TimeoutError(f"Shard {self.shard} did not answer within {timeout_s}s")
+        return self.connection.recv()
+
+
+class ShardedFeatureIndex(FeatureIndex):
+    # Splits the catalog by printjob id over worker processes, each scanning
+    # its shard with an ExactFeatureIndex. Queries are sent to all shards and
+    # the local top-k lists are merged.
+    #
+    # The features only live in the workers, the coordinator keeps the shard
+    # sizes. A crashed or hanging worker is restarted with its shard read from
+    # feature_source, usually the repository, and the request is repeated on
+    # the new worker. Without a feature source only empty shards can be
+    # restarted.
+    def __init__(
+        self,
+        num_shards: int,
+        timeout_s: float = 10,
+        start_method: str = "spawn",
+        feature_source: Optional[Callable[[], Dict[int, np.ndarray]]] = None,
+    ) -> None:
+        super().__init__()
+        self.num_shards = num_shards
+        self.timeout_s = timeout_s
+        self.feature_source = feature_source
+        self._context = multiprocessing.get_context(start_method)
+        self._sizes = [0] * num_shards
+        self._workers = [_ShardWorker(shard, self._context) for shard in range(num_shards)]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(self._sizes)
+
+    @property
+    def restarts(self) -> int:
+        return sum(worker.restarts for worker in self._workers)
+
+    def add(self, printjob_ids: Sequence[int], features: np.ndarray) -> None:
+        printjob_ids = np.asarray(printjob_ids, dtype=np.int64)
+        features = np.asarray(features, dtype=np.float32).reshape(len(printjob_ids), -1)
+        with self._lock:
+            self._scatter(
+                "add",
+                [
+                    (printjob_ids[mask], features[mask])
+                    for mask in self._shard_masks(printjob_ids)
+                ],
+            )
+
+    def remove(self, printjob_ids: Sequence[int]) -> None:
+        printjob_ids = np.asarray(printjob_ids, dtype=np.int64)
+        with self._lock:
+            self._scatter(
+                "remove",
+                [(printjob_ids[mask],) for mask in self._shard_masks(printjob_ids)],
+            )
+
+    def export_features(self) -> Tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            exported = self._scatter("export", [()] * self.num_shards)
+        # empty shards don't know the dimension
+        exported = [(ids, features) for ids, features in exported if len(ids)]
+        if not exported:
+            return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+        return (
+            np.concatenate([ids for ids, _ in exported]),
+            np.concatenate([features for _, features in exported]),
+        )
+
+    def find_best_match(self, feature_vector: np.ndarray) -> Tuple[int, float]:
+        matches = self.find_top_k(np.asarray(feature_vector).reshape(1, -1), 1)
+        if matches.ids[0, 0] < 0:
+            return -1, float("inf")
+        return int(matches.ids[0, 0]), float(matches.distances[0, 0])
+
+    def find_top_k(self, queries: np.ndarray, k: int) -> TopKMatches:
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        with self._lock:
+            matches = self._scatter("top_k", [(queries, k)] * self.num_shards)
+        return select_top_k(
+            np.concatenate([match.ids for match in matches], axis=1),
+            np.concatenate([match.distances for match in matches], axis=1),
+            k,
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            for worker in self._workers:
+                worker.stop()
+
+    def _shard_masks(self, printjob_ids: np.ndarray) -> List[np.ndarray]:
+        shard_of = printjob_ids % self.num_shards
+        return [shard_of == shard for shard in range(self.num_shards)]
+
+    def _scatter(self, command: str, shard_args: List[tuple]) -> list:
+        # a worker that could not be restarted last time is retried before sending
+        for worker in self._workers:
+            if not worker.healthy:
+                self._restart(worker)
+        for worker, args in zip(self._workers, shard_args):
+            self._send(worker, command, args)
+        # every worker is read or restarted before raising, otherwise the
+        # unread replies would answer the next request
+        results, failure = [], None
+        for worker, args in zip(self._workers, shard_args):
+            try:
+                result = self._receive(worker, command, args)
+            except Exception as e:
+                failure = failure or e
+                result = e
+            results.append(result)
+        if command in ("add", "remove"):
+            for shard, result in enumerate(results):
+                if not isinstance(result, Exception):
+                    self._sizes[shard] = result
+        if failure is not None:
+            raise failure
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    def _send(self, worker: _ShardWorker, command: str, args: tuple) -> None:
+        try:
+            worker.send(command, *args)
+        except (BrokenPipeError, OSError):
+            # picked up as failure when receiving
+            pass
+
+    def _receive(self, worker: _ShardWorker, command: str, args: tuple):
+        try:
+            return worker.receive(self.timeout_s)
+        except (EOFError, OSError, TimeoutError) as e:
+            logger.warning(f"Shard {worker.shard} failed ({e!r}), restarting it")
+        self._restart(worker)
+        self._send(worker, command, args)
+        try:
+            return worker.receive(self.timeout_s)
+        except (EOFError, OSError, TimeoutError):
+            # a late reply would answer the next request, the worker is
+            # started again before it
+            worker.healthy = False
+            raise
+
+    def _restart(self, worker: _ShardWorker) -> None:
+        # the worker stays unhealthy until it holds its whole shard again
+        worker.healthy = False
+        if worker.process.is_alive():
+            worker.process.terminate()
+        worker.process.join()
+        worker.connection.close()
+        worker.start()
+        worker.restarts += 1
+        if self.feature_source is None:
+            if self._sizes[worker.shard]:
+                raise RuntimeError(
+                    f"Shard {worker.shard} can't be restored without a feature source"
+                )
+        else:
+            printjob_ids, features = self._shard_features(worker.shard)
+            if len(printjob_ids):
+                worker.send("add", printjob_ids, features)
+                reply = worker.receive(self.timeout_s)
+                if isinstance(reply, Exception):
+                    raise reply
+            self._sizes[worker.shard] = len(printjob_ids)
+        worker.healthy = True
+
+    def _shard_features(self, shard: int) -> Tuple[np.ndarray, np.ndarray]:
+        features = self.feature_source()
+        printjob_ids = np.fromiter(
+            (
+                printjob_id
+                for printjob_id in features
+                if printjob_id % self.num_shards == shard
+            ),
+            dtype=np.int64,
+        )
+        if not len(printjob_ids):
+            return printjob_ids, np.empty((0, 0), dtype=np.float32)
+        return printjob_ids, np.stack(
+            [features[printjob_id] for printjob_id in printjob_ids.tolist()]
+        ).astype(np.float32)
@@ -0,0 +1,230 @@
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from ors.common import logger
+from ors.similarity.datatypes import FeatureIndex, TopKMatches
+from ors.similarity.exact import ExactFeatureIndex
+
+logger = logger.get_logger(__name__)
+
+# control segment: [sequence, version, count, dimension] as int64. The sequence
+# is odd while the publisher updates the other fields (seqlock).
+CONTROL_FIELDS = 4
+ALIGNMENT = 64
+
+_attach_lock = threading.Lock()
+
+
+def _segment_name(name: str, version: int) -> str:
+    return f"{name}-v{version}"
+
+
+def _layout(count: int, dimension: int) -> Tuple[int, int, int]:
+    # byte offsets of the sq_norms and features arrays and the total size
+    ids_bytes = 8 * count
+    sq_norms_offset = ids_bytes
+    features_offset = -(-(sq_norms_offset + 4 * count) // ALIGNMENT) * ALIGNMENT
+    return sq_norms_offset, features_offset, features_offset + 4 * count * dimension
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # Attached segments must not be registered with the resource tracker, which
+    # would unlink them when this reader exits. Unregistering afterwards is not
+    # an option as forked workers share the publisher's tracker.
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Before 3.13 the registration is suppressed while attaching. The lock keeps
+    # concurrent attaches from restoring each other's no-op; readers create no
+    # other segments that would go unregistered meanwhile.
+    with _attach_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def _views(
+    segment: shared_memory.SharedMemory, count: int, dimension: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    sq_norms_offset, features_offset, _ = _layout(count, dimension)
+    ids = np.ndarray((count,), dtype=np.int64, buffer=segment.buf, offset=0)
+    sq_norms = np.ndarray(
+        (count,), dtype=np.float32, buffer=segment.buf, offset=sq_norms_offset
+    )
+    features = np.ndarray(
+        (count, dimension), dtype=np.float32, buffer=segment.buf, offset=features_offset
+    )
+    return ids, sq_norms, features
+
+
+class SharedFeatureIndexPublisher:
+    # Publishes the catalog feature matrix and id table in shared memory. Every
+    # publish writes a new versioned segment and then switches the control
+    # segment to it, readers therefore always see one complete version.
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.version = 0
+        self._segment: Optional[shared_memory.SharedMemory] = None
+        try:
+            self._control = shared_memory.SharedMemory(
+                name=name, create=True, size=8 * CONTROL_FIELDS
+            )
+        except FileExistsError:
+            # left over by a crashed publisher
+            self._control = shared_memory.SharedMemory(name=name)
+        self._control_fields = np.ndarray(
+            (CONTROL_FIELDS,), dtype=np.int64, buffer=self._control.buf
+        )
+        self.version = int(self._control_fields[1])
+        if self.version:
+            try:
+                # unlinked with the next publish
+                self._segment = shared_memory.SharedMemory(
+                    name=_segment_name(name, self.version)
+                )
+            except FileNotFoundError:
+                pass
+
+    def publish(self, printjob_ids: Sequence[int], features: np.ndarray) -> int:
+        printjob_ids = np.asarray(printjob_ids, dtype=np.int64)
+        features = np.asarray(features, dtype=np.float32)
+        if features.ndim != 2:
+            features = features.reshape(len(printjob_ids), -1)
+        count, dimension = features.shape
+        version = self.version + 1
+        _, _, size = _layout(count, dimension)
+        segment = shared_memory.SharedMemory(
+            name=_segment_name(self.name, version), create=True, size=max(size, 1)
+        )
+        ids_view, sq_norms_view, features_view = _views(segment, count, dimension)
+        ids_view[:] = printjob_ids
+        sq_norms_view[:] = np.einsum("ij,ij->i", features, features)
+        features_view[:] = features
+        del ids_view, sq_norms_view, features_view
+
+        fields = self._control_fields
+        fields[0] += 1
+        fields[1:] = (version, count, dimension)
+        fields[0] += 1
+
+        # readers that are still attached keep their mapping after the unlink
+        previous = self._segment
+        self._segment, self.version = segment, version
+        if previous is not None:
+            previous.close()
+            previous.unlink()
+        logger.info(f"Published {count} features as version {version} in '{self.name}'")
+        return version
+
+    def close(self) -> None:
+        del self._control_fields
+        for segment in (self._segment, self._control):
+            if segment is not None:
+                segment.close()
+                segment.unlink()
+
+
+class SharedFeatureIndex(FeatureIndex):
+    # Read-only index over the published segment, searched in place without a
+    # copy. Before every query the control segment is checked and a newer
+    # version is attached.
+    def __init__(self, name: str, timeout_s: float = 60) -> None:
+        self.name = name
+        self.version = 0
+        self._index = ExactFeatureIndex()
+        self._segment: Optional[shared_memory.SharedMemory] = None
+        self._retired = []
+        self._lock = threading.Lock()
+        deadline = time.monotonic() + timeout_s
+        while True:
+            try:
+                self._control = _attach(name)
+                break
+            except FileNotFoundError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+        self._control_fields = np.ndarray(
+            (CONTROL_FIELDS,), dtype=np.int64, buffer=self._control.buf
+        )
+        self.refresh()
+
+    @property
+    def ids(self) -> np.ndarray:
+        self.refresh()
+        return self._index.ids
+
+    @property
+    def matrix(self) -> np.ndarray:
+        self.refresh()
+        return self._index.matrix
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self._index)
+
+    def __contains__(self, printjob_id: int) -> bool:
+        self.refresh()
+        return printjob_id in self._index
+
+    def export_features(self) -> Tuple[np.ndarray, np.ndarray]:
+        self.refresh()
+        return self._index.export_features()
+
+    def refresh(self) -> None:
+        if int(self._control_fields[1]) == self.version:
+            return
+        with self._lock:
+            while True:
+                sequence = int(self._control_fields[0])
+                version, count, dimension = (int(v) for v in self._control_fields[1:])
+                if sequence % 2 == 0 and sequence == int(self._control_fields[0]):
+                    break
+            if version == self.version:
+                return
+            try:
+                segment = _attach(_segment_name(self.name, version))
+            except FileNotFoundError:
+                # already replaced by an even newer version, pick it up next time
+                return
+            ids, sq_norms, features = _views(segment, count, dimension)
+            self._index = ExactFeatureIndex()
+            if count:
+                self._index.attach(ids, features, sq_norms)
+            self._retire(self._segment)
+            self._segment, self.version = segment, version
+        logger.info(f"Attached to version {version} of '{self.name}' with {count} features")
+
+    def add(self, printjob_ids: Sequence[int], features: np.ndarray) -> None:
+        raise NotImplementedError("The shared feature index is read-only")
+
+    def remove(self, printjob_ids: Sequence[int]) -> None:
+        raise NotImplementedError("The shared feature index is read-only")
+
+    def find_best_match(self, feature_vector: np.ndarray) -> Tuple[int, float]:
+        self.refresh()
+        return self._index.find_best_match(feature_vector)
+
+    def find_top_k(self, queries: np.ndarray, k: int) -> TopKMatches:
+        self.refresh()
+        return self._index.find_top_k(queries, k)
+
+    def _retire(self, segment: Optional[shared_memory.SharedMemory]) -> None:
+        # queries running on the previous version may still hold views into it,
+        # such segments are closed on a later swap
+        if segment is not None:
+            self._retired.append(segment)
+        still_used = []
+        for retired in self._retired:
+            try:
+                retired.close()
+            except BufferError:
+                still_used.append(retired)
+        self._retired = still_used
@@ -2,6 +2,9 @@ from typing import Dict, Iterable, Tuple
 
 import numpy as np
 
+from ors.similarity.datatypes import TopKMatches
+from ors.similarity.exact import ExactFeatureIndex
+
 
 def calc_distance(vector1: np.ndarray, vector2: np.ndarray) -> float:
     return np.sqrt(np.sum((vector1 - vector2) ** 2))
@@ -10,13 +13,20 @@ def calc_distance(vector1: np.ndarray, vector2: np.ndarray) -> float:
 def find_best_match(
     feature_vector: np.ndarray, feature_vector_set: Dict[int, np.ndarray]
 ) -> Tuple[int, float]:
+    return _build_index(feature_vector_set).find_best_match(feature_vector)
+
+
+def find_top_k(
+    queries: np.ndarray, feature_vector_set: Dict[int, np.ndarray], k: int
+) -> TopKMatches:
+    return _build_index(feature_vector_set).find_top_k(queries, k)
 
-    shortest_distance = float("inf")
-    best_match = 0
-    for jobnumber, features in feature_vector_set.items():
-        distance = calc_distance(feature_vector, features)
-        if distance < shortest_distance:
-            shortest_distance = distance
-            best_match = jobnumber
 
-    return best_match, shortest_distance
+def _build_index(feature_vector_set: Dict[int, np.ndarray]) -> ExactFeatureIndex:
+    index = ExactFeatureIndex()
+    if len(feature_vector_set) > 0:
+        index.add(
+            list(feature_vector_set.keys()),
+            np.stack(list(feature_vector_set.values())),
+        )
+    return index
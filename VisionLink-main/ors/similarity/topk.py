@@ -0,0 +1,20 @@
+import numpy as np
+
+from ors.similarity.datatypes import TopKMatches
+
+
+def select_top_k(ids: np.ndarray, distances: np.ndarray, k: int) -> TopKMatches:
+    # ids, distances: (N, M) candidates per query, M may be smaller than k
+    num_queries, num_candidates = distances.shape
+    if num_candidates > k:
+        candidates = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        distances = np.take_along_axis(distances, candidates, axis=1)
+        ids = np.take_along_axis(ids, candidates, axis=1)
+    order = np.argsort(distances, axis=1, kind="stable")
+    distances = np.take_along_axis(distances, order, axis=1)
+    ids = np.take_along_axis(ids, order, axis=1)
+    if num_candidates < k:
+        padding = k - num_candidates
+        ids = np.pad(ids, ((0, 0), (0, padding)), constant_values=-1)
+        distances = np.pad(distances, ((0, 0), (0, padding)), constant_values=np.inf)
+    return TopKMatches(ids=ids.astype(np.int64), distances=distances)
@@ -0,0 +1,22 @@
+import pytest
+
+from ors.benchmark import create_pipeline, measure_allocations, synthetic_frames
+
+
+@pytest.mark.parametrize(
+    "rectification, rectified_size, max_frame_copies",
+    [
+        # the rotation needs an image larger than the frame
+        ("rotate_crop", None, 2.5),
+        # no full frame copy, in particular no channel swap of the frame
+        ("perspective", None, 1.0),
+        ("perspective", (224, 224), 1.0),
+    ],
+)
+def test_allocations_per_frame(rectification, rectified_size, max_frame_copies):
+    frames = synthetic_frames(4)
+    pipeline, results = create_pipeline(rectification, rectified_size, frames)
+
+    frame_copies = measure_allocations(pipeline, results, frames)
+
+    assert frame_copies.max() <= max_frame_copies
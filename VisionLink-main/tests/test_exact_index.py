@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+from ors.similarity.exact import ExactFeatureIndex
+from ors.similarity.similarity import calc_distance
+
+
+def scan_best_match(feature_vector, feature_vector_set):
+    # the loop the index replaced
+    shortest_distance = float("inf")
+    best_match = -1
+    for jobnumber, features in feature_vector_set.items():
+        distance = calc_distance(feature_vector, features)
+        if distance < shortest_distance:
+            shortest_distance = distance
+            best_match = jobnumber
+    return best_match, shortest_distance
+
+
+def random_catalog(size=200, dimension=64, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = rng.permutation(10 * size)[:size]
+    return ids, rng.normal(size=(size, dimension)).astype(np.float32)
+
+
+def test_find_best_match_agrees_with_the_scan():
+    ids, features = random_catalog()
+    index = ExactFeatureIndex()
+    index.add(ids, features)
+    catalog = dict(zip(ids.tolist(), features))
+
+    queries = np.random.default_rng(1).normal(size=(50, features.shape[1])).astype(np.float32)
+    for query in queries:
+        best_id, distance = index.find_best_match(query)
+        expected_id, expected_distance = scan_best_match(query, catalog)
+        assert best_id == expected_id
+        assert distance == pytest.approx(expected_distance, rel=1e-5)
+
+
+def test_find_best_match_of_a_catalog_feature_is_exact():
+    ids, features = random_catalog()
+    index = ExactFeatureIndex()
+    index.add(ids, 10 * features)
+
+    for row in (0, 17, len(ids) - 1):
+        assert index.find_best_match(10 * features[row]) == (ids[row], 0.0)
+
+
+def test_find_best_match_takes_the_first_of_tied_features():
+    _, features = random_catalog(size=3)
+    index = ExactFeatureIndex()
+    # job 7 and 3 have the same features, the scan keeps the first one
+    index.add([5, 7, 3], features[[0, 1, 1]])
+    catalog = {5: features[0], 7: features[1], 3: features[1]}
+
+    assert index.find_best_match(features[1]) == scan_best_match(features[1], catalog)
+    assert index.find_best_match(features[1]) == (7, 0.0)
+
+
+def test_find_best_match_on_an_empty_index():
+    assert ExactFeatureIndex().find_best_match(np.ones(8, dtype=np.float32)) == (
+        -1,
+        float("inf"),
+    )
+
+
+def test_remove_and_add_again():
+    ids, features = random_catalog(size=5)
+    index = ExactFeatureIndex()
+    index.add(ids, features)
+
+    # not the last row, the last one moves into its place
+    index.remove([ids[1]])
+    assert len(index) == 4
+    assert ids[1] not in index
+    assert index.find_best_match(features[1])[0] != ids[1]
+    assert index.find_best_match(features[4]) == (ids[4], 0.0)
+    # unknown ids are ignored
+    index.remove([-5])
+    assert len(index) == 4
+
+    index.add([ids[1]], features[1:2])
+    assert len(index) == 5
+    assert index.find_best_match(features[1]) == (ids[1], 0.0)
+    exported_ids, exported_features = index.export_features()
+    assert sorted(exported_ids.tolist()) == sorted(ids.tolist())
+    order = np.argsort(exported_ids)
+    np.testing.assert_array_equal(exported_features[order], features[np.argsort(ids)])
+
+
+def test_add_replaces_the_features_of_known_ids():
+    ids, features = random_catalog(size=4)
+    index = ExactFeatureIndex()
+    index.add(ids, features)
+
+    index.add([ids[0]], features[3:4])
+    assert len(index) == 4
+    assert index.find_best_match(features[0])[0] != ids[0]
+
+
+def test_attach_searches_the_arrays_in_place_and_copies_them_on_change():
+    ids, features = random_catalog(size=6)
+    sq_norms = np.einsum("ij,ij->i", features, features)
+    attached_ids, attached_features = ids.copy(), features.copy()
+    index = ExactFeatureIndex()
+
+    index.attach(attached_ids, attached_features, sq_norms)
+    assert len(index) == 6
+    assert np.shares_memory(index.matrix, attached_features)
+    assert index.find_best_match(features[2]) == (ids[2], 0.0)
+    assert ids[2] in index
+
+    index.remove([ids[0]])
+    index.add([123], features[0:1])
+    assert not np.shares_memory(index.matrix, attached_features)
+    np.testing.assert_array_equal(attached_ids, ids)
+    np.testing.assert_array_equal(attached_features, features)
+    assert index.find_best_match(features[0]) == (123, 0.0)
+    assert ids[0] not in index
+
+
+def test_margins():
+    index = ExactFeatureIndex()
+    index.add([1, 2], np.array([[0, 0], [3, 4]], dtype=np.float32))
+
+    matches = index.find_top_k(np.array([[0, 0]], dtype=np.float32), k=2)
+    np.testing.assert_allclose(matches.margins, [5.0])
+    assert index.find_top_k(np.zeros((1, 2), dtype=np.float32), k=1).margins[0] == np.inf
@@ -0,0 +1,118 @@
+import numpy as np
+
+from ors.similarity.exact import ExactFeatureIndex
+from ors.similarity.ivf import IVFFeatureIndex
+from ors.similarity.quantization import ScalarQuantizationCodec
+
+
+def clustered_catalog(size=400, dimension=16, clusters=8, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = 10 * rng.normal(size=(clusters, dimension))
+    features = centers[rng.integers(clusters, size=size)] + rng.normal(size=(size, dimension))
+    return np.arange(1000, 1000 + size, dtype=np.int64), features.astype(np.float32)
+
+
+def noisy_queries(features, count=50, seed=1):
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(features), size=count, replace=False)
+    return features[rows] + 0.1 * rng.normal(size=(count, features.shape[1])).astype(np.float32)
+
+
+def test_untrained_index_searches_exhaustively():
+    ids, features = clustered_catalog(size=50)
+    index = IVFFeatureIndex(nlist=8, min_train_size=100)
+    exact = ExactFeatureIndex()
+    index.add(ids, features)
+    exact.add(ids, features)
+
+    assert not index.is_trained
+    assert len(index) == 50
+    queries = noisy_queries(features, count=10)
+    np.testing.assert_array_equal(
+        index.find_top_k(queries, k=3).ids, exact.find_top_k(queries, k=3).ids
+    )
+    assert index.find_best_match(features[7]) == (ids[7], 0.0)
+
+
+def test_index_trains_once_min_train_size_features_were_added():
+    ids, features = clustered_catalog()
+    index = IVFFeatureIndex(nlist=8, min_train_size=300)
+
+    index.add(ids[:200], features[:200])
+    assert not index.is_trained
+    index.add(ids[200:], features[200:])
+
+    assert index.is_trained
+    assert len(index) == len(ids)
+    exported_ids, exported_features = index.export_features()
+    order = np.argsort(exported_ids)
+    np.testing.assert_array_equal(exported_ids[order], ids)
+    np.testing.assert_array_equal(exported_features[order], features)
+
+
+def test_probing_every_cell_is_exact():
+    ids, features = clustered_catalog()
+    index = IVFFeatureIndex(nlist=8, nprobe=8, min_train_size=100)
+    exact = ExactFeatureIndex()
+    index.add(ids, features)
+    exact.add(ids, features)
+
+    queries = noisy_queries(features)
+    np.testing.assert_array_equal(
+        index.find_top_k(queries, k=5).ids, exact.find_top_k(queries, k=5).ids
+    )
+
+
+def test_probing_few_cells_keeps_the_recall():
+    ids, features = clustered_catalog(clusters=16)
+    index = IVFFeatureIndex(nlist=16, nprobe=2, min_train_size=100)
+    index.add(ids, features)
+
+    queries = noisy_queries(features)
+    exact = ExactFeatureIndex()
+    exact.add(ids, features)
+    expected = exact.find_top_k(queries, k=1).ids[:, 0]
+    found = np.array([index.find_best_match(query)[0] for query in queries])
+
+    assert np.mean(found == expected) >= 0.9
+    np.testing.assert_array_equal(index.find_top_k(queries, k=1).ids[:, 0], found)
+
+
+def test_add_replace_and_remove_after_training():
+    ids, features = clustered_catalog()
+    index = IVFFeatureIndex(nlist=8, nprobe=8, min_train_size=100)
+    index.add(ids, features)
+    assert index.is_trained
+
+    index.add([5], features[:1] + 100)
+    assert len(index) == len(ids) + 1
+    assert index.find_best_match(features[0] + 100) == (5, 0.0)
+
+    # the replaced features move to the cell of their new position
+    index.add([ids[0]], features[1:2] + 200)
+    assert len(index) == len(ids) + 1
+    assert index.find_best_match(features[1] + 200) == (ids[0], 0.0)
+    assert index.find_best_match(features[0])[0] != ids[0]
+    exported_ids, _ = index.export_features()
+    assert np.count_nonzero(exported_ids == ids[0]) == 1
+
+    index.remove([5, ids[0], -1])
+    assert len(index) == len(ids) - 1
+    assert 5 not in index.export_features()[0]
+    assert index.find_best_match(features[0] + 100)[0] != 5
+
+
+def test_codec_is_used_from_training_on():
+    ids, features = clustered_catalog()
+    index = IVFFeatureIndex(nlist=8, nprobe=8, min_train_size=300, codec=ScalarQuantizationCodec())
+
+    index.add(ids[:100], features[:100])
+    assert not index.codec.is_trained
+    index.add(ids[100:], features[100:])
+
+    assert index.codec.is_trained
+    queries = noisy_queries(features)
+    found = index.find_top_k(queries, k=1).ids[:, 0]
+    exact = ExactFeatureIndex()
+    exact.add(ids, features)
+    assert np.mean(found == exact.find_top_k(queries, k=1).ids[:, 0]) >= 0.9
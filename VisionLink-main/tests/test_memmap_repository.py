@@ -0,0 +1,122 @@
+import os
+
+import numpy as np
+import pytest
+
+from ors.printjobdata.datatypes import Printjob
+from ors.printjobdata.memmap_repository import VALID_FILE, MemmapPrintjobRepository
+from ors.similarity.exact import ExactFeatureIndex
+
+
+def printjobs(numbers, dimension=8, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        Printjob(
+            number,
+            image_file=None,
+            file_type=None,
+            features=rng.normal(size=dimension).astype(np.float32),
+        )
+        for number in numbers
+    ]
+
+
+@pytest.fixture(params=["in place", "explicit index"])
+def open_repository(request, tmp_path):
+    def open_repository(model_identity=""):
+        index = ExactFeatureIndex() if request.param == "explicit index" else None
+        return MemmapPrintjobRepository(
+            str(tmp_path),
+            model_identity=model_identity,
+            file_type="png",
+            image_path_resolver=lambda number: f"/printjobs/{number}/image.png",
+            index=index,
+        )
+
+    return open_repository
+
+
+def test_printjobs_survive_a_reopen(open_repository):
+    jobs = printjobs([3, 1, 2])
+    open_repository("model-a").add_all(jobs)
+
+    repository = open_repository("model-a")
+
+    assert sorted(repository.get_all_printjob_numbers()) == [1, 2, 3]
+    assert len(repository.get_feature_index()) == 3
+    for job in jobs:
+        stored = repository.get(job.printjob_number)
+        assert stored.file_type == "png"
+        assert stored.image_path == f"/printjobs/{job.printjob_number}/image.png"
+        np.testing.assert_array_equal(stored.features, job.features)
+        assert repository.get_feature_index().find_best_match(job.features) == (
+            job.printjob_number,
+            0.0,
+        )
+    with pytest.raises(KeyError):
+        repository.get(4)
+
+
+def test_remove_and_replace_survive_a_reopen(open_repository):
+    jobs = printjobs([1, 2, 3])
+    replacement = printjobs([2], seed=1)[0]
+    repository = open_repository()
+    repository.add_all(jobs)
+
+    repository.remove(1)
+    repository.add(replacement)
+    assert len(repository.get_feature_index()) == 2
+    assert repository.get_feature_index().find_best_match(jobs[1].features)[0] != 2
+
+    repository = open_repository()
+    # the removed and the replaced row stay in the files
+    assert repository.count == 4
+    assert sorted(repository.get_all_printjob_numbers()) == [2, 3]
+    np.testing.assert_array_equal(repository.get(2).features, replacement.features)
+    assert repository.get_feature_index().find_best_match(replacement.features) == (2, 0.0)
+    assert repository.get_feature_index().find_best_match(jobs[0].features)[0] != 1
+    features = repository.get_all_printjob_features()
+    assert sorted(features) == [2, 3]
+    np.testing.assert_array_equal(features[3], jobs[2].features)
+    with pytest.raises(KeyError):
+        repository.get(1)
+
+
+def test_features_of_another_model_are_discarded(open_repository):
+    open_repository("model-a").add_all(printjobs([1, 2]))
+
+    repository = open_repository("model-b")
+    assert repository.get_all_printjob_numbers() == []
+    assert len(repository.get_feature_index()) == 0
+    repository.add_all(printjobs([5]))
+
+    repository = open_repository("model-b")
+    assert repository.get_all_printjob_numbers() == [5]
+    assert repository.count == 1
+
+
+def test_rows_of_an_interrupted_append_are_dropped(open_repository):
+    repository = open_repository()
+    repository.add_all(printjobs([1, 2]))
+    # rows that were appended without updating meta.json
+    repository._write_meta(1)
+
+    repository = open_repository()
+    assert repository.get_all_printjob_numbers() == [1]
+    repository.add_all(printjobs([7], seed=2))
+
+    repository = open_repository()
+    assert sorted(repository.get_all_printjob_numbers()) == [1, 7]
+    assert repository.count == 2
+
+
+def test_directories_without_valid_file_are_all_valid(open_repository, tmp_path):
+    jobs = printjobs([1, 2])
+    open_repository().add_all(jobs)
+    os.remove(tmp_path / VALID_FILE)
+
+    repository = open_repository()
+    assert sorted(repository.get_all_printjob_numbers()) == [1, 2]
+    repository.remove(1)
+
+    assert open_repository().get_all_printjob_numbers() == [2]
@@ -0,0 +1,33 @@
+import pytest
+from pydantic import ValidationError
+
+from ors.preprocessing.config import PreprocessingConfig
+from ors.preprocessing.preprocessing import ImagePreprocessing
+
+
+def test_use_ml_with_detectron2_needs_a_cfg_file():
+    with pytest.raises(ValidationError, match="cfg_file"):
+        PreprocessingConfig(use_ml=True)
+
+    PreprocessingConfig(use_ml=True, cfg_file="models/mask_rcnn.yaml")
+    PreprocessingConfig(use_ml=True, segmentation_backend="torchscript")
+    PreprocessingConfig(use_ml=False)
+
+
+@pytest.mark.parametrize(
+    "settings, loaded",
+    [
+        ({"use_ml": True, "cfg_file": "models/mask_rcnn.yaml"}, True),
+        ({"use_ml": False, "cfg_file": "models/mask_rcnn.yaml"}, True),
+        ({"use_ml": False, "segmentation_backend": "torchscript"}, True),
+        ({"use_ml": False, "cfg_file": "models/mask_rcnn.yaml", "ml_fallback": False}, False),
+        ({"use_ml": False}, False),
+    ],
+)
+def test_segmentation_model_is_loaded_before_the_first_frame(monkeypatch, settings, loaded):
+    calls = []
+    monkeypatch.setattr(ImagePreprocessing, "_init_ml", lambda self: calls.append(self))
+
+    ImagePreprocessing(PreprocessingConfig(**settings))
+
+    assert len(calls) == int(loaded)
@@ -0,0 +1,104 @@
+import uuid
+
+import numpy as np
+import pytest
+
+from ors.printjobdata.datatypes import Printjob
+from ors.printjobdata.shared_repository import SharedMemoryPrintjobRepository
+from ors.similarity.shared import SharedFeatureIndex, SharedFeatureIndexPublisher
+
+
+def catalog(numbers, dimension=8, seed=0):
+    rng = np.random.default_rng(seed)
+    features = rng.normal(size=(len(numbers), dimension)).astype(np.float32)
+    return np.array(numbers, dtype=np.int64), features
+
+
+@pytest.fixture
+def publisher():
+    publisher = SharedFeatureIndexPublisher(f"ors-test-{uuid.uuid4().hex[:8]}")
+    yield publisher
+    publisher.close()
+
+
+def subscribe(name):
+    return SharedMemoryPrintjobRepository(
+        SharedFeatureIndex(name, timeout_s=1),
+        file_type="png",
+        image_path_resolver=lambda number: f"/printjobs/{number}/image.png",
+    )
+
+
+def test_subscriber_reads_the_published_catalog(publisher):
+    ids, features = catalog([3, 1, 2])
+    publisher.publish(ids, features)
+
+    repository = subscribe(publisher.name)
+
+    assert repository.get_all_printjob_numbers() == [3, 1, 2]
+    stored = repository.get(1)
+    assert stored.file_type == "png"
+    assert stored.image_path == "/printjobs/1/image.png"
+    with pytest.raises(KeyError):
+        repository.get(4)
+    published = repository.get_all_printjob_features()
+    for printjob_id, row in zip(ids.tolist(), features):
+        np.testing.assert_array_equal(published[printjob_id], row)
+        assert repository.get_feature_index().find_best_match(row) == (printjob_id, 0.0)
+
+
+def test_subscriber_follows_removed_and_replaced_printjobs(publisher):
+    ids, features = catalog([1, 2, 3])
+    publisher.publish(ids, features)
+    repository = subscribe(publisher.name)
+    assert len(repository.get_feature_index()) == 3
+
+    replacement = catalog([2], seed=1)[1]
+    publisher.publish([2, 3], np.concatenate([replacement, features[2:]]))
+
+    assert sorted(repository.get_all_printjob_numbers()) == [2, 3]
+    index = repository.get_feature_index()
+    assert index.find_best_match(replacement[0]) == (2, 0.0)
+    assert index.find_best_match(features[0])[0] != 1
+    with pytest.raises(KeyError):
+        repository.get(1)
+
+
+def test_a_restarted_publisher_continues_the_versions():
+    publisher = SharedFeatureIndexPublisher(f"ors-test-{uuid.uuid4().hex[:8]}")
+    publisher.publish(*catalog([1, 2]))
+    repository = subscribe(publisher.name)
+    # a crashed publisher leaves its segments behind
+    del publisher._control_fields
+    publisher._control.close()
+    publisher._segment.close()
+
+    restarted = SharedFeatureIndexPublisher(publisher.name)
+    try:
+        assert restarted.version == publisher.version
+        # features of another model, e.g. of another dimension, replace the old ones
+        ids, features = catalog([7], dimension=4)
+        restarted.publish(ids, features)
+
+        assert repository.get_all_printjob_numbers() == [7]
+        assert repository.get_feature_index().find_best_match(features[0]) == (7, 0.0)
+    finally:
+        restarted.close()
+
+
+def test_the_shared_repository_is_read_only(publisher):
+    publisher.publish(*catalog([1]))
+    repository = subscribe(publisher.name)
+    job = Printjob(2, image_file=None, file_type=None, features=np.zeros(8, dtype=np.float32))
+
+    with pytest.raises(NotImplementedError):
+        repository.add(job)
+    with pytest.raises(NotImplementedError):
+        repository.add_all([job])
+    with pytest.raises(NotImplementedError):
+        repository.remove(1)
+
+
+def test_subscribers_wait_for_the_publisher():
+    with pytest.raises(FileNotFoundError):
+        SharedFeatureIndex(f"ors-test-{uuid.uuid4().hex[:8]}", timeout_s=0.2)
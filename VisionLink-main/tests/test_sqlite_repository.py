@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from ors.printjobdata.datatypes import Printjob
+from ors.printjobdata.sqlite_repository import SQLitePrintjobRepository
+from ors.similarity.exact import ExactFeatureIndex
+
+
+def printjobs(numbers, dimension=8, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        Printjob(
+            number,
+            image_file=None,
+            file_type="png",
+            features=rng.normal(size=dimension).astype(np.float32),
+            image_path=f"/printjobs/{number}/image.png",
+        )
+        for number in numbers
+    ]
+
+
+@pytest.fixture
+def database_path(tmp_path):
+    return str(tmp_path / "printjobs.sqlite3")
+
+
+def test_printjobs_survive_a_reopen(database_path):
+    jobs = printjobs([3, 1, 2])
+    SQLitePrintjobRepository(database_path, model_identity="model-a").add_all(jobs)
+
+    repository = SQLitePrintjobRepository(database_path, model_identity="model-a")
+
+    assert sorted(repository.get_all_printjob_numbers()) == [1, 2, 3]
+    assert len(repository.get_feature_index()) == 3
+    for job in jobs:
+        stored = repository.get(job.printjob_number)
+        assert stored.file_type == "png"
+        assert stored.image_path == job.image_path
+        np.testing.assert_array_equal(stored.features, job.features)
+        assert repository.get_feature_index().find_best_match(job.features) == (
+            job.printjob_number,
+            0.0,
+        )
+    with pytest.raises(KeyError):
+        repository.get(4)
+
+
+def test_remove_and_replace_survive_a_reopen(database_path):
+    jobs = printjobs([1, 2, 3])
+    replacement = printjobs([2], seed=1)[0]
+    repository = SQLitePrintjobRepository(database_path)
+    repository.add_all(jobs)
+
+    repository.remove(1)
+    repository.add(replacement)
+    assert len(repository.get_feature_index()) == 2
+
+    repository = SQLitePrintjobRepository(database_path)
+    assert sorted(repository.get_all_printjob_numbers()) == [2, 3]
+    np.testing.assert_array_equal(repository.get(2).features, replacement.features)
+    assert repository.get_feature_index().find_best_match(replacement.features) == (2, 0.0)
+    assert repository.get_feature_index().find_best_match(jobs[0].features)[0] != 1
+    features = repository.get_all_printjob_features()
+    assert sorted(features) == [2, 3]
+    np.testing.assert_array_equal(features[3], jobs[2].features)
+
+
+def test_features_of_another_model_are_discarded(database_path):
+    SQLitePrintjobRepository(database_path, model_identity="model-a").add_all(printjobs([1, 2]))
+
+    repository = SQLitePrintjobRepository(database_path, model_identity="model-b")
+    assert repository.get_all_printjob_numbers() == []
+    assert len(repository.get_feature_index()) == 0
+    repository.add_all(printjobs([5]))
+
+    repository = SQLitePrintjobRepository(database_path, model_identity="model-b")
+    assert repository.get_all_printjob_numbers() == [5]
+
+
+def test_features_are_streamed_in_batches_into_the_given_index(database_path):
+    jobs = printjobs(range(10))
+    SQLitePrintjobRepository(database_path).add_all(jobs)
+    index = ExactFeatureIndex()
+
+    repository = SQLitePrintjobRepository(database_path, index=index, export_batch_size=3)
+
+    assert repository.get_feature_index() is index
+    assert [len(ids) for ids, _ in repository.iter_feature_batches()] == [3, 3, 3, 1]
+    exported_ids, _ = index.export_features()
+    assert sorted(exported_ids.tolist()) == list(range(10))
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from ors.similarity.exact import ExactFeatureIndex
+from ors.similarity.topk import select_top_k
+
+
+@pytest.fixture
+def catalog():
+    rng = np.random.default_rng(0)
+    ids = np.arange(100, 400, dtype=np.int64)
+    features = rng.normal(size=(len(ids), 32)).astype(np.float32)
+    queries = rng.normal(size=(20, 32)).astype(np.float32)
+    index = ExactFeatureIndex()
+    index.add(ids, features)
+    return index, ids, features, queries
+
+
+def test_select_top_k_sorts_and_pads():
+    ids = np.array([[10, 11, 12], [20, 21, 22]])
+    distances = np.array([[3.0, 1.0, 2.0], [0.5, 0.7, 0.1]])
+
+    matches = select_top_k(ids, distances, 2)
+    np.testing.assert_array_equal(matches.ids, [[11, 12], [22, 20]])
+    np.testing.assert_array_equal(matches.distances, [[1.0, 2.0], [0.1, 0.5]])
+
+    matches = select_top_k(ids, distances, 5)
+    np.testing.assert_array_equal(matches.ids[:, 3:], -1)
+    assert np.isinf(matches.distances[:, 3:]).all()
+
+
+def test_top_1_is_the_best_match(catalog):
+    index, _, _, queries = catalog
+
+    matches = index.find_top_k(queries, k=1)
+
+    assert matches.ids.shape == (len(queries), 1)
+    for query, best_id, distance in zip(queries, matches.ids[:, 0], matches.distances[:, 0]):
+        assert index.find_best_match(query) == pytest.approx((best_id, distance), rel=1e-6)
+
+
+def test_top_k_of_several_queries_is_ordered(catalog):
+    index, ids, features, queries = catalog
+    k = 5
+
+    matches = index.find_top_k(queries, k)
+
+    distances = np.linalg.norm(queries[:, np.newaxis] - features[np.newaxis], axis=2)
+    expected_rows = np.argsort(distances, axis=1)[:, :k]
+    np.testing.assert_array_equal(matches.ids, ids[expected_rows])
+    np.testing.assert_allclose(
+        matches.distances, np.take_along_axis(distances, expected_rows, axis=1), rtol=1e-5
+    )
+    assert (np.diff(matches.distances, axis=1) >= 0).all()
+
+
+def test_top_k_of_a_block_of_queries_matches_single_queries(catalog):
+    index, _, _, queries = catalog
+    index.max_block_elements = 3 * len(index)
+
+    matches = index.find_top_k(queries, k=3)
+
+    for row, query in enumerate(queries):
+        single = index.find_top_k(query[np.newaxis], k=3)
+        np.testing.assert_array_equal(matches.ids[row], single.ids[0])
+
+
+def test_k_larger_than_the_catalog_is_padded():
+    index = ExactFeatureIndex()
+    index.add([4, 9], np.array([[0, 0], [1, 0]], dtype=np.float32))
+
+    matches = index.find_top_k(np.array([[0.9, 0], [0, 0]], dtype=np.float32), k=4)
+
+    np.testing.assert_array_equal(matches.ids, [[9, 4, -1, -1], [4, 9, -1, -1]])
+    np.testing.assert_allclose(matches.distances[:, :2], [[0.1, 0.9], [0.0, 1.0]], rtol=1e-5)
+    assert np.isinf(matches.distances[:, 2:]).all()
+
+
+def test_top_k_on_an_empty_index():
+    matches = ExactFeatureIndex().find_top_k(np.zeros((2, 8), dtype=np.float32), k=2)
+
+    np.testing.assert_array_equal(matches.ids, -1)
+    assert np.isinf(matches.distances).all()
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from ors.common.color import RGB  # noqa: E402
+from ors.preprocessing.config import PreprocessingConfig  # noqa: E402
+from ors.preprocessing.ml.segmentation import (  # noqa: E402
+    INPUT_SIZE_FILE,
+    TorchScriptSegmenter,
+)
+
+
+class BrightRegion(torch.nn.Module):
+    # stands in for the traced Mask R-CNN: one instance whose box covers the
+    # non-black pixels of the input, with a full mask
+    def forward(self, image):
+        pixels = (image.sum(2) > 0).nonzero()
+        if pixels.shape[0] == 0:
+            return torch.zeros((0, 4)), torch.zeros((0,)), torch.zeros((0, 1, 28, 28))
+        y0, x0 = pixels[:, 0].min(), pixels[:, 1].min()
+        y1, x1 = pixels[:, 0].max() + 1, pixels[:, 1].max() + 1
+        boxes = torch.stack([x0, y0, x1, y1]).float().unsqueeze(0)
+        return boxes, torch.ones(1), torch.ones((1, 1, 28, 28))
+
+
+def export(path, input_size="80x60"):
+    model = torch.jit.freeze(torch.jit.script(BrightRegion()).eval())
+    torch.jit.save(model, str(path), _extra_files={INPUT_SIZE_FILE: input_size})
+
+
+def segmenter_config(path):
+    return PreprocessingConfig(
+        use_ml=True,
+        segmentation_backend="torchscript",
+        segmentation_model_path=str(path),
+        segmentation_input_size=(80, 60),
+    )
+
+
+def test_torchscript_segmenter_returns_the_mask_of_the_frame(tmp_path):
+    export(tmp_path / "segmentation.ts")
+    segmenter = TorchScriptSegmenter(segmenter_config(tmp_path / "segmentation.ts"))
+    # 160x120 frame, half the size in the 80x60 input
+    image = np.zeros((120, 160, 3), dtype=np.uint8)
+    image[40:80, 60:100] = 255
+
+    mask = segmenter.segment(image)
+
+    expected = np.zeros((60, 80), dtype=bool)
+    expected[20:40, 30:50] = True
+    assert (mask == expected).all()
+
+
+def test_torchscript_segmenter_crops_the_padding(tmp_path):
+    export(tmp_path / "segmentation.ts")
+    segmenter = TorchScriptSegmenter(segmenter_config(tmp_path / "segmentation.ts"))
+    # a portrait frame only covers the left of the input
+    image = np.full((120, 60, 3), 255, dtype=np.uint8)
+
+    mask = segmenter.segment(image, RGB)
+
+    assert mask.shape == (60, 30)
+    assert mask.all()
+    assert segmenter.segment(np.zeros((120, 160, 3), dtype=np.uint8)) is None
+
+
+def test_torchscript_segmenter_checks_the_exported_input_size(tmp_path):
+    export(tmp_path / "segmentation.ts", input_size="64x64")
+
+    with pytest.raises(ValueError, match="input size"):
+        TorchScriptSegmenter(segmenter_config(tmp_path / "segmentation.ts"))
+    with pytest.raises(FileNotFoundError):
+        TorchScriptSegmenter(segmenter_config(tmp_path / "missing.ts"))
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from ors.common.color import BGR, RGB
+from ors.preprocessing.ml.transforms import downscale_shorter_side, fit_to_input, paste_mask
+
+
+@pytest.mark.parametrize(
+    "image_shape, resized_shape",
+    [
+        # landscape frames fill the width, portrait frames the height
+        ((100, 200), (25, 50)),
+        ((200, 100), (50, 25)),
+        ((50, 50), (50, 50)),
+    ],
+)
+def test_fit_to_input_keeps_aspect_ratio_and_pads_black(image_shape, resized_shape):
+    image = np.full(image_shape + (3,), (10, 20, 30), dtype=np.uint8)
+    out = np.full((50, 50, 3), 255, dtype=np.uint8)
+
+    assert fit_to_input(image, (50, 50), BGR, out) == resized_shape
+
+    resized_height, resized_width = resized_shape
+    assert (out[:resized_height, :resized_width] == (10, 20, 30)).all()
+    assert (out[resized_height:] == 0).all()
+    assert (out[:, resized_width:] == 0).all()
+
+
+def test_fit_to_input_converts_rgb_frames_to_bgr():
+    image = np.full((40, 80, 3), (10, 20, 30), dtype=np.uint8)
+    out = np.zeros((20, 40, 3), dtype=np.uint8)
+
+    assert fit_to_input(image, (40, 20), RGB, out) == (20, 40)
+    assert (out == (30, 20, 10)).all()
+
+
+def test_paste_mask_fills_the_box():
+    box = np.array([10, 20, 50, 60])
+
+    mask = paste_mask(np.ones((28, 28)), box, (100, 80))
+
+    expected = np.zeros((100, 80), dtype=bool)
+    expected[20:60, 10:50] = True
+    assert (mask == expected).all()
+
+
+def test_paste_mask_scales_the_mask_into_the_box():
+    # the left half of the mask lands in the left half of the box
+    mask_probabilities = np.zeros((28, 28))
+    mask_probabilities[:, :14] = 0.9
+
+    mask = paste_mask(mask_probabilities, np.array([0, 0, 56, 28]), (28, 56))
+
+    assert mask[:, :28].all()
+    assert not mask[:, 28:].any()
+
+
+@pytest.mark.parametrize(
+    "image_shape, size, resized_shape",
+    [
+        ((1080, 1920), 540, (540, 960)),
+        ((1920, 1080), 540, (960, 540)),
+        # smaller frames are never scaled up
+        ((400, 600), 540, (400, 600)),
+        ((1080, 1920), None, (1080, 1920)),
+    ],
+)
+def test_downscale_shorter_side(image_shape, size, resized_shape):
+    image = np.zeros(image_shape + (3,), dtype=np.uint8)
+
+    assert downscale_shorter_side(image, size).shape == resized_shape + (3,)